@@ -0,0 +1,167 @@
+import numpy as np
+
+# Chromosome characters of an agi, by their code. Digits code as themselves
+CHROMOSOMES = "0123456789CM"
+
+# Codes are the chromosome code times GENE_LIMIT plus the gene number
+GENE_LIMIT = 100000
+CODE_LIMIT = len(CHROMOSOMES) * GENE_LIMIT
+
+# Code of any string which is not an agi
+MISSING = -1
+
+# Unicode value of each chromosome character, by its code
+CHROMOSOME_CHARS = np.array([ord(char) for char in CHROMOSOMES],
+                            dtype=np.uint32)
+
+# Code of each character as a chromosome, or -1
+CHROMOSOME_CODES = np.full(128, -1, dtype=np.int64)
+for code, char in enumerate(CHROMOSOMES):
+    CHROMOSOME_CODES[ord(char)] = code
+
+
+def encode_agi(agi, ignore_case=True):
+    """ (String, boolean) -> int
+
+    Return the integer code of an agi, such as 101010 for AT1G01010, or
+    MISSING if the string is not an agi.
+
+    Args:
+        agi (String): The agi to encode
+        ignore_case (boolean): Whether lower case agis are accepted
+    """
+    return int(encode_agis([agi], ignore_case)[0])
+
+
+def decode_agi(code):
+    """ (int) -> String
+
+    Return the agi of an integer code, or an empty string for MISSING.
+
+    Args:
+        code (Int): The code to decode
+    """
+    return str(decode_agis([code])[0])
+
+
+def encode_agis(agis, ignore_case=True):
+    """ (ndarray, boolean) -> ndarray
+
+    Return an int32 ndarray of the code of each agi in an ndarray, list or
+    pandas Series, with MISSING for anything which is not an agi. Integer
+    input is taken to be codes already, and returned as it is.
+
+    Args:
+        agis (ndarray): The agis to encode, as strings or bytes
+        ignore_case (boolean): Whether lower case agis are accepted
+    """
+    values = np.asarray(agis)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int32)
+
+    # Read one character past an agi, to reject longer strings
+    if values.dtype.kind == "S":
+        values = values.astype("S10")
+        chars = values.view(np.uint8).reshape(-1, 10).astype(np.int64)
+    else:
+        values = values.astype("U10")
+        chars = values.view(np.uint32).reshape(-1, 10).astype(np.int64)
+    if ignore_case:
+        # Lower case letters are 32 above their upper case
+        lower = (chars >= ord("a")) & (chars <= ord("z"))
+        chars[lower] -= 32
+
+    digits = chars[:, 4:9] - ord("0")
+    valid = ((chars[:, 0] == ord("A")) & (chars[:, 1] == ord("T")) &
+             (chars[:, 3] == ord("G")) & (chars[:, 9] == 0) &
+             ((digits >= 0) & (digits <= 9)).all(axis=1))
+    chromosomes = CHROMOSOME_CODES[np.clip(chars[:, 2], 0, 127)]
+    valid &= chromosomes >= 0
+
+    numbers = digits @ np.array([10000, 1000, 100, 10, 1])
+    codes = chromosomes * GENE_LIMIT + numbers
+    return np.where(valid, codes, MISSING).astype(np.int32)
+
+
+def decode_agis(codes):
+    """ (ndarray) -> ndarray
+
+    Return a string ndarray of the agi of each code, with an empty string
+    for MISSING.
+
+    Args:
+        codes (ndarray): The codes to decode
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    valid = (codes >= 0) & (codes < CODE_LIMIT)
+    codes = np.where(valid, codes, 0)
+
+    chars = np.zeros((len(codes), 9), dtype=np.uint32)
+    chars[:, 0] = ord("A")
+    chars[:, 1] = ord("T")
+    chars[:, 2] = CHROMOSOME_CHARS[codes // GENE_LIMIT]
+    chars[:, 3] = ord("G")
+    numbers = codes % GENE_LIMIT
+    for i, power in enumerate([10000, 1000, 100, 10, 1]):
+        chars[:, 4 + i] = ord("0") + numbers // power % 10
+    chars[~valid] = 0
+    return chars.view("U9").ravel()
+
+
+def strand_codes(strands):
+    """ (ndarray) -> ndarray
+
+    Return an ndarray of 1 for + strands, -1 for - strands and 0 for any
+    other strand value.
+
+    Args:
+        strands (ndarray): The strands to convert
+    """
+    codes = np.zeros(len(strands), dtype=np.int8)
+    codes[strands == '+'] = 1
+    codes[strands == '-'] = -1
+    return codes
+
+
+class AgiIndex:
+    """
+    The AgiIndex class finds the position of agis in an array of agis, by
+    looking their codes up in a table with an entry for every possible code,
+    rather than hashing strings. It has the get_indexer method of a pandas
+    Index, so it can be used in place of one.
+
+    Attributes:
+        positions (ndarray): The position of each code, or -1
+    """
+
+    def __init__(self, agis, ignore_case=False):
+        """ (AgiIndex, ndarray, boolean) -> None
+
+        Initialize the index of an array of agis or codes.
+
+        Args:
+            agis (ndarray): The agis or codes to index
+            ignore_case (boolean): Whether lower case agis are accepted
+        Raises:
+            ValueError: If any of the agis can not be encoded
+        """
+        codes = encode_agis(agis, ignore_case)
+        if (codes == MISSING).any():
+            raise ValueError("Not all values are agis")
+        self.ignore_case = ignore_case
+        self.positions = np.full(CODE_LIMIT, -1, dtype=np.int32)
+        # Assign in reverse so that the first of any repeated agi is kept
+        self.positions[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+
+    def get_indexer(self, agis):
+        """ (AgiIndex, ndarray) -> ndarray
+
+        Return the position of each agi or code in the index, or -1 for
+        those not in it.
+
+        Args:
+            agis (ndarray): The agis or codes to look up
+        """
+        codes = encode_agis(agis, self.ignore_case)
+        found = (codes >= 0) & (codes < CODE_LIMIT)
+        return np.where(found, self.positions[np.where(found, codes, 0)], -1)
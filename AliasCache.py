@@ -0,0 +1,144 @@
+import sqlite3
+import time
+
+# Default time to keep a result, in seconds
+DAY = 24 * 60 * 60
+
+
+class AliasCache:
+    """
+    The AliasCache class stores the results of alias to AGI conversions in
+    a SQLite database, so that aliases converted on an earlier run need not
+    be queried again. Aliases which had no AGI are stored with an empty AGI.
+
+    Results expire after a time to live, and once the cache holds more than
+    max_entries results, the least recently used ones are evicted.
+
+    Attributes:
+        connection (Connection): The connection to the SQLite database
+        ttl (Float): The seconds a result is kept for
+        negative_ttl (Float): The seconds a result with no AGI is kept for
+        max_entries (Int): The largest number of results kept
+    """
+
+    def __init__(self, file_name="alias_cache.sqlite", ttl=30 * DAY,
+                 negative_ttl=DAY, max_entries=100000):
+        """ (AliasCache, String, float, float, int) -> None
+
+        Initialize the cache by opening its database, creating it if needed.
+
+        Args:
+            file_name (String): The name of the SQLite database file
+            ttl (Float): The seconds a result is kept for
+            negative_ttl (Float): The seconds a result with no AGI is kept
+                for, so that aliases missing from the tool are retried
+                sooner
+            max_entries (Int): The largest number of results kept
+        """
+        self.connection = sqlite3.connect(file_name)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS aliases ("
+                "alias TEXT PRIMARY KEY, agi TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS aliases_accessed "
+                "ON aliases (accessed)")
+
+    def get(self, alias):
+        """ (AliasCache, String) -> String
+
+        Return the cached AGI of an alias, which is empty if the alias had
+        no AGI, or None if the alias is not cached.
+
+        Args:
+            alias (String): The alias to look up
+        """
+        return self.get_many([alias]).get(alias)
+
+    def get_many(self, aliases):
+        """ (AliasCache, List of String) -> Dict
+
+        Return a dictionary of the cached AGI of each alias which is cached
+        and has not expired.
+
+        Args:
+            aliases (List of String): The aliases to look up
+        """
+        now = time.time()
+        found = {}
+        aliases = list(dict.fromkeys(aliases))
+        # Stay under SQLite's limit on the number of query parameters
+        for i in range(0, len(aliases), 500):
+            batch = aliases[i:i + 500]
+            rows = self.connection.execute(
+                "SELECT alias, agi, created FROM aliases WHERE alias IN (" +
+                ",".join("?" * len(batch)) + ")", batch)
+            for alias, agi, created in rows:
+                ttl = self.ttl if agi else self.negative_ttl
+                if now - created <= ttl:
+                    found[alias] = agi
+
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE aliases SET accessed = ? WHERE alias = ?",
+                [(now, alias) for alias in found])
+        return found
+
+    def put(self, alias, agi):
+        """ (AliasCache, String, String) -> None
+
+        Store the AGI of an alias, which is empty if the alias has no AGI.
+
+        Args:
+            alias (String): The alias converted
+            agi (String): The AGI it was converted to
+        """
+        self.put_many({alias: agi})
+
+    def put_many(self, results):
+        """ (AliasCache, Dict) -> None
+
+        Store the AGI of each alias in a dictionary, then evict expired and
+        least recently used results.
+
+        Args:
+            results (Dict): The AGI of each alias converted
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?)",
+                [(alias, agi, now, now) for alias, agi in results.items()])
+        self.evict()
+
+    def evict(self):
+        """ (AliasCache) -> None
+
+        Delete expired results, then the least recently used results over
+        max_entries.
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM aliases WHERE (agi != '' AND created < ?) "
+                "OR (agi = '' AND created < ?)",
+                (now - self.ttl, now - self.negative_ttl))
+            self.connection.execute(
+                "DELETE FROM aliases WHERE alias IN (SELECT alias FROM "
+                "aliases ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM aliases").fetchone()[0]
+
+    def close(self):
+        """ (AliasCache) -> None
+
+        Close the connection to the database.
+        """
+        self.connection.close()
@@ -1,7 +1,5 @@
 __author__ = 'Ruian'
 
-from splinter import Browser
-
 
 def convert_alias_to_agi(alias):
     """(String) -> String
@@ -9,6 +7,9 @@ def convert_alias_to_agi(alias):
     Return an agi which corresponds to a given alias. Queries the BAR _at to
     Agi tool using splinter.
     """
+    # Imported here so that splinter is only needed for web lookups
+    from splinter import Browser
+
     with Browser() as browser:
         # at to agi tool url
         url = "http://bar.utoronto.ca/ntools/cgi-bin/ntools_agi_converter.cgi"
@@ -33,6 +34,29 @@ def convert_alias_to_agi(alias):
 
         return value.text
 
+
+def convert_aliases(aliases, cache=None):
+    """(List of String, AliasCache) -> Dict
+
+    Return a dictionary of the agi of each alias, which is empty if the
+    alias has no agi. Only aliases missing from the cache are queried with
+    convert_alias_to_agi, and their results are added to the cache.
+
+    Args:
+        aliases (List of String): The aliases to convert
+        cache (AliasCache): The cache of earlier conversions, if any
+    """
+    results = cache.get_many(aliases) if cache is not None else {}
+
+    for alias in dict.fromkeys(aliases):
+        if alias not in results:
+            results[alias] = convert_alias_to_agi(alias)
+            if cache is not None:
+                # Store each result as it comes, in case a later one fails
+                cache.put(alias, results[alias])
+
+    return {alias: results[alias] for alias in aliases}
+
 if __name__ == "__main__":
     user_input = input("Insert alias to query:\n")
     output = convert_alias_to_agi(user_input)
@@ -0,0 +1,183 @@
+import http.client
+import queue
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+# The BAR agi converter tool
+BAR_URL = "http://bar.utoronto.ca/ntools/cgi-bin/ntools_agi_converter.cgi"
+
+# Form fields selecting a gene alias to agi conversion, as the browser path
+# in AliasToAgiConverter does through the drop downs
+FORM_FIELDS = {"fromList": "Gene Alias", "toList": "AGI"}
+
+
+class BatchAliasResolver:
+    """
+    The BatchAliasResolver class converts aliases to AGIs by posting them to
+    the BAR agi converter form in batches, over a pool of kept-alive HTTP
+    connections rather than a browser per alias. Several batches are posted
+    at once by a pool of threads.
+
+    Attributes:
+        url (String): The url of the converter form
+        batch_size (Int): The number of aliases posted at a time
+        max_workers (Int): The number of batches posted at once
+        timeout (Float): The seconds to wait for a response
+        connections (Queue): The idle connections to the converter
+    """
+
+    def __init__(self, url=BAR_URL, batch_size=200, max_workers=4,
+                 timeout=60):
+        """ (BatchAliasResolver, String, int, int, float) -> None
+
+        Initialize the resolver for a converter url.
+
+        Args:
+            url (String): The url of the converter form
+            batch_size (Int): The number of aliases posted at a time
+            max_workers (Int): The number of batches posted at once
+            timeout (Float): The seconds to wait for a response
+        """
+        self.url = url
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.connections = queue.Queue()
+
+    def convert_aliases(self, aliases, cache=None):
+        """ (BatchAliasResolver, List of String, AliasCache) -> Dict
+
+        Return a dictionary of the agi of each alias, which is empty if the
+        alias has no agi. Only aliases missing from the cache are posted,
+        and their results are added to the cache.
+
+        Args:
+            aliases (List of String): The aliases to convert
+            cache (AliasCache): The cache of earlier conversions, if any
+        """
+        results = cache.get_many(aliases) if cache is not None else {}
+        missing = [alias for alias in dict.fromkeys(aliases)
+                   if alias not in results]
+        batches = [missing[i:i + self.batch_size]
+                   for i in range(0, len(missing), self.batch_size)]
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for batch_results in executor.map(self.convert_batch, batches):
+                results.update(batch_results)
+                if cache is not None:
+                    cache.put_many(batch_results)
+
+        return {alias: results[alias] for alias in aliases}
+
+    def convert_batch(self, aliases):
+        """ (BatchAliasResolver, List of String) -> Dict
+
+        Return a dictionary of the agi of each alias in a batch, posted to
+        the converter as a single form.
+
+        Args:
+            aliases (List of String): The aliases to convert
+        """
+        fields = dict(FORM_FIELDS, input="\n".join(aliases))
+        page = self.post(urllib.parse.urlencode(fields))
+
+        table = ResultTableParser()
+        table.feed(page)
+        # The converter may change the case of aliases
+        found = {}
+        for row in table.rows:
+            if len(row) >= 2:
+                found.setdefault(row[0].upper(), row[1])
+        return {alias: found.get(alias.upper(), "") for alias in aliases}
+
+    def post(self, body):
+        """ (BatchAliasResolver, String) -> String
+
+        Return the page given by posting a form body to the converter,
+        reusing an idle connection if there is one.
+
+        Args:
+            body (String): The url encoded form body
+        """
+        parts = urllib.parse.urlsplit(self.url)
+        try:
+            connection = self.connections.get_nowait()
+        except queue.Empty:
+            if parts.scheme == "https":
+                connection = http.client.HTTPSConnection(
+                    parts.netloc, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(
+                    parts.netloc, timeout=self.timeout)
+
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        try:
+            connection.request("POST", parts.path or "/", body, headers)
+            response = connection.getresponse()
+            page = response.read().decode("utf-8", "replace")
+        except (http.client.HTTPException, OSError):
+            # Kept-alive connections may have been closed by the server
+            connection.close()
+            connection.request("POST", parts.path or "/", body, headers)
+            response = connection.getresponse()
+            page = response.read().decode("utf-8", "replace")
+
+        if response.status != 200:
+            connection.close()
+            raise IOError("Converter returned status " +
+                          str(response.status))
+        self.connections.put(connection)
+        return page
+
+    def close(self):
+        """ (BatchAliasResolver) -> None
+
+        Close all idle connections to the converter.
+        """
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
+
+
+class ResultTableParser(HTMLParser):
+    """
+    The ResultTableParser class collects the text of each cell in the body
+    of the converter's result table, the table with the id table_id.
+
+    Attributes:
+        rows (List of List of String): The cells of each row of the table
+    """
+
+    def __init__(self):
+        """ (ResultTableParser) -> None
+
+        Initialize the parser with no rows.
+        """
+        HTMLParser.__init__(self)
+        self.rows = []
+        self.in_table = False
+        self.in_body = False
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table" and ("id", "table_id") in attrs:
+            self.in_table = True
+        elif self.in_table and tag == "tbody":
+            self.in_body = True
+        elif self.in_body and tag == "tr":
+            self.rows.append([])
+        elif self.in_body and tag == "td" and self.rows:
+            self.cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self.cell is not None:
+            self.rows[-1].append("".join(self.cell).strip())
+            self.cell = None
+        elif tag == "tbody":
+            self.in_body = False
+        elif tag == "table":
+            self.in_table = False
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
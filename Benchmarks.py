@@ -0,0 +1,789 @@
+import argparse
+import gc
+import gzip
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from BatchAliasResolver import BatchAliasResolver
+from BinaryPairPredictor import (PREDICTOR_COLUMNS, BinaryPairPredictor,
+                                 open_gff_file, open_motif_file)
+from ExcelParser import ExcelParser
+from FakeBarServer import FakeBarServer
+from GeneQueryService import GeneQueryService
+from JasAgiParser import Parser, parse_files
+from JasToAliasConverter import JasToAliasConverter
+from OfflineAliasResolver import OfflineAliasResolver
+from PairStore import PairStore
+from PfmStore import get_pfm_store
+from RegulatoryNetwork import (compare_networks, from_dictionary,
+                               load_network)
+
+# Most genes with distinct generated AGI, 99999 on each of five chromosomes
+MAX_GENES = 5 * 99999
+
+# Shape of the generated sheets and the columns scraped from them
+SHEET_COLUMNS = 20
+SHEET_TARGETS = [0, 4, 11]
+
+# The stages of the benchmark suite, in the order they run
+STAGE_NAMES = ['gff_load', 'motif_load', 'predict_vectorized',
+               'predict_loop', 'parse_data_set', 'parse_files',
+               'convert_jas_to_alias', 'scrape_columns',
+               'scrape_columns_fast']
+
+
+def make_pairs(count, repeats=2):
+    """ (Int, Int) -> List of Tuple
+
+    Return a list of count distinct (motif, gene) pairs, each repeated a
+    number of times, in the order a predictor would find them.
+
+    Args:
+        count (Int): The number of distinct pairs
+        repeats (Int): The number of times each pair appears
+    """
+    pairs = [("M%06d" % (i // 100), "AT%dG%05d" % (i % 5 + 1, i % 100000))
+             for i in range(count)]
+    return pairs * repeats
+
+
+def bench_pair_store(sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6),
+                     list_limit=10 ** 4):
+    """ (Tuple of Int, Int) -> List of Dict
+
+    Return the time taken to accumulate pairs without duplicates using
+    list membership scans, and using a PairStore, for each number of pairs.
+    The list scans are quadratic, so they are only timed up to list_limit.
+
+    Args:
+        sizes (Tuple of Int): The numbers of distinct pairs to accumulate
+        list_limit (Int): The largest size to time the list approach for
+    """
+    results = []
+    for size in sizes:
+        pairs = make_pairs(size)
+        result = {'pairs': size, 'list_seconds': None}
+
+        if size <= list_limit:
+            start = time.perf_counter()
+            binary_pairs = []
+            for pair in pairs:
+                if pair not in binary_pairs:
+                    binary_pairs.append(pair)
+            result['list_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = PairStore()
+        for pair in pairs:
+            store.add(pair)
+        result['store_seconds'] = time.perf_counter() - start
+
+        results.append(result)
+    return results
+
+
+def bench_alias_resolver(count=1000, latency=0.01, batch_size=200,
+                         max_workers=4):
+    """ (Int, float, int, int) -> Dict
+
+    Return the time taken to resolve aliases against a local fake converter
+    one alias per request, as the browser path does, and in concurrent
+    batches over kept-alive connections.
+
+    Args:
+        count (Int): The number of aliases to resolve
+        latency (Float): The seconds the fake converter takes per request
+        batch_size (Int): The number of aliases posted at a time
+        max_workers (Int): The number of batches posted at once
+    """
+    agis = {"ALIAS%d" % i: "AT1G%05d" % i for i in range(0, count, 2)}
+    aliases = ["ALIAS%d" % i for i in range(count)]
+    result = {'aliases': count}
+
+    with FakeBarServer(agis, latency) as server:
+        single = BatchAliasResolver(server.url, batch_size=1, max_workers=1)
+        start = time.perf_counter()
+        expected = single.convert_aliases(aliases)
+        result['single_seconds'] = time.perf_counter() - start
+        single.close()
+
+        batched = BatchAliasResolver(server.url, batch_size, max_workers)
+        start = time.perf_counter()
+        found = batched.convert_aliases(aliases)
+        result['batch_seconds'] = time.perf_counter() - start
+        batched.close()
+
+    result['same_results'] = found == expected
+    return result
+
+
+def bench_offline_resolver(loci=30000, lookups=100000):
+    """ (Int, int) -> Dict
+
+    Return the build time and lookup rate of an OfflineAliasResolver over
+    a generated gene alias table, with two aliases per locus.
+
+    Args:
+        loci (Int): The number of loci in the table
+        lookups (Int): The number of aliases to look up
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        alias_file_name = os.path.join(temp_dir, "gene_aliases.txt")
+        with open(alias_file_name, "w") as alias_file:
+            alias_file.write("locus_name\tsymbol\tfull_name\n")
+            for i in range(loci):
+                agi = "AT%dG%05d" % (i % 5 + 1, i)
+                alias_file.write("%s\tSYM%d\tsymbol %d\n" % (agi, i, i))
+                alias_file.write("%s\tatALT%d\talternative %d\n" % (
+                    agi, i, i))
+        resolver = OfflineAliasResolver(alias_file_name)
+
+    # Mix of exact, lower case, AT prefixed and missing aliases
+    forms = ["SYM%d", "sym%d", "AtSYM%d", "NONE%d"]
+    resolver.convert_aliases([forms[i % 4] % (i % loci)
+                              for i in range(lookups)])
+    return resolver.report()
+
+
+def bench_scrape_columns(rows=200000, columns=40, target_columns=(0, 3, 7)):
+    """ (Int, int, Tuple of int) -> Dict
+
+    Return the time taken to scrape target columns from a generated wide
+    tabs delimited sheet with scrape_columns, and with scrape_columns_fast
+    as lists and as ndarrays.
+
+    Args:
+        rows (Int): The number of rows in the sheet
+        columns (Int): The number of columns in the sheet
+        target_columns (Tuple of int): The columns to scrape
+    """
+    target_columns = list(target_columns)
+    result = {'rows': rows, 'columns': columns}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sheet_file_name = os.path.join(temp_dir, "sheet.txt")
+        with open(sheet_file_name, "w") as sheet_file:
+            sheet_file.write("\t".join("column%d" % i
+                                       for i in range(columns)) + "\n")
+            for i in range(rows):
+                sheet_file.write("\t".join(str(i * columns + j)
+                                           for j in range(columns)) + "\n")
+        parser = ExcelParser(sheet_file_name)
+
+        start = time.perf_counter()
+        expected = parser.scrape_columns(target_columns, 1)
+        result['scrape_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = parser.scrape_columns_fast(target_columns, 1)
+        result['fast_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parser.scrape_columns_fast(target_columns, 1, as_arrays=True)
+        result['arrays_seconds'] = time.perf_counter() - start
+
+    result['same_results'] = found == expected
+    return result
+
+
+def write_gff3(gff_file, genes, seed=0):
+    """ (File, Int, int) -> None
+
+    Write a gff3 annotation shaped like the TAIR release to an open text
+    file, with up to three mRNA isoforms per gene, each with exons, CDS
+    and UTRs.
+
+    Args:
+        gff_file (File): The file to write to
+        genes (Int): The number of genes
+        seed (Int): The seed of the random layout
+    """
+    layout = random.Random(seed)
+    gff_file.write("##gff-version 3\n")
+    for i in range(genes):
+        chromosome = "Chr%d" % (i % 5 + 1)
+        agi = "AT%dG%05d" % (i % 5 + 1, i // 5 * 10 + 10)
+        strand = layout.choice("+-")
+        start = i // 5 * 5000 + layout.randint(1, 2000)
+        isoforms = [(start + layout.randint(0, 200),
+                     start + layout.randint(1000, 3000))
+                    for isoform in range(layout.randint(1, 3))]
+
+        lines = [(chromosome, "gene", start, max(end for s, end in isoforms),
+                  strand, "ID=%s;Note=protein_coding_gene;Name=%s" % (
+                      agi, agi))]
+        for number, (mrna_start, mrna_end) in enumerate(isoforms, 1):
+            mrna = "%s.%d" % (agi, number)
+            lines.append((chromosome, "mRNA", mrna_start, mrna_end, strand,
+                          "ID=%s;Parent=%s;Name=%s;Index=1" % (
+                              mrna, agi, mrna)))
+            lines.append((chromosome, "five_prime_UTR", mrna_start,
+                          mrna_start + 99, strand, "Parent=" + mrna))
+            for feature in ["exon", "CDS"]:
+                lines.append((chromosome, feature, mrna_start, mrna_end,
+                              strand, "Parent=" + mrna))
+            lines.append((chromosome, "three_prime_UTR", mrna_end - 99,
+                          mrna_end, strand, "Parent=" + mrna))
+
+        for chromosome, feature, start_, end, strand_, attributes in lines:
+            gff_file.write("%s\tTAIR10\t%s\t%d\t%d\t.\t%s\t.\t%s\n" % (
+                chromosome, feature, start_, end, strand_, attributes))
+
+
+def bench_gff3(genes=28000):
+    """ (Int) -> Dict
+
+    Return the time taken to build the gene table from a generated gff3
+    annotation by preprocessing it into a gff table for read_csv, and by
+    reading the gff3 directly, plain and gzipped.
+
+    Args:
+        genes (Int): The number of genes in the annotation
+    """
+    result = {'genes': genes}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        gff3_file_name = os.path.join(temp_dir, "genes.gff3")
+        with open(gff3_file_name, "w") as gff3_file:
+            write_gff3(gff3_file, genes)
+        with open(gff3_file_name, "rb") as gff3_file:
+            with gzip.open(gff3_file_name + ".gz", "wb") as gzip_file:
+                gzip_file.write(gff3_file.read())
+
+        # The separate pass keeping the mRNA rows as a gff table
+        start = time.perf_counter()
+        gff_file_name = os.path.join(temp_dir, "gff.csv")
+        with open(gff3_file_name) as gff3_file:
+            with open(gff_file_name, "w") as gff_file:
+                gff_file.write("chr\tstart\tend\tstrand\tgeneid\n")
+                for line in gff3_file:
+                    fields = line.split("\t")
+                    if len(fields) == 9 and fields[2] == "mRNA":
+                        gff_file.write("\t".join([
+                            fields[0], fields[3], fields[4], fields[6],
+                            fields[8].split(";")[0]]) + "\n")
+        expected = open_gff_file(gff_file_name)
+        result['preprocess_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = open_gff_file(gff3_file_name)
+        result['gff3_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        open_gff_file(gff3_file_name + ".gz")
+        result['gzip_seconds'] = time.perf_counter() - start
+
+    result['table_bytes'] = int(expected.memory_usage(deep=True).sum())
+    result['gff3_table_bytes'] = int(found.memory_usage(deep=True).sum())
+    result['same_results'] = bool(
+        (expected.index == found.index).all() and all(
+            np.array_equal(np.asarray(expected[column]),
+                           np.asarray(found[column]))
+            for column in ['genestart', 'geneend', 'strand']))
+    return result
+
+
+def bench_motif_file(rows=1000000, motifs=800):
+    """ (Int, int) -> Dict
+
+    Return the load time and deep memory use of a generated motif data file
+    loaded by splitting its boundaries with two regex passes into object
+    columns, as open_motif_file used to, and by open_motif_file with all
+    columns and with the predictor columns.
+
+    Args:
+        rows (Int): The number of motif rows
+        motifs (Int): The number of distinct motif ids
+    """
+    result = {'rows': rows}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        motif_file_name = os.path.join(temp_dir, "motifs.txt")
+        with open(motif_file_name, "w") as motif_file:
+            motif_file.write("motif\tstrand\tstart\tend\tgene ids\n")
+            for i in range(rows):
+                chromosome = i % 5 + 1
+                gene = i * 7 % 99990
+                motif_file.write("M%04d\t%s\t%d\t%d\tAT%dG%05d-AT%dG%05d\n" % (
+                    i % motifs, "+-"[i % 2], i * 3, i * 3 + 8, chromosome,
+                    gene, chromosome, gene + 10))
+
+        start = time.perf_counter()
+        expected = pd.read_csv(motif_file_name, delimiter='\t')
+        expected['agi1'] = expected['gene ids'].str.extract('(.........-)')
+        expected['agi2'] = expected['gene ids'].str.extract('(-.........)')
+        del expected['gene ids']
+        expected['agi1'] = expected['agi1'].str[:9]
+        expected['agi2'] = expected['agi2'].str[1:]
+        expected.columns = ['motifid', 'strand', 'motifstart', 'motifend',
+                            'agi1', 'agi2']
+        result['regex_seconds'] = time.perf_counter() - start
+        result['regex_bytes'] = int(expected.memory_usage(deep=True).sum())
+
+        start = time.perf_counter()
+        found = open_motif_file(motif_file_name)
+        result['split_seconds'] = time.perf_counter() - start
+        result['split_bytes'] = int(found.memory_usage(deep=True).sum())
+
+        start = time.perf_counter()
+        used = open_motif_file(motif_file_name, PREDICTOR_COLUMNS)
+        result['usecols_seconds'] = time.perf_counter() - start
+        result['usecols_bytes'] = int(used.memory_usage(deep=True).sum())
+
+    result['same_results'] = bool(all(
+        np.array_equal(np.asarray(expected[column], dtype=object),
+                       np.asarray(found[column], dtype=object))
+        for column in expected.columns))
+    return result
+
+
+def bench_query_service(genes=28000, queries=1000, seed=0):
+    """ (Int, int, int) -> Dict
+
+    Return the time taken to load and index a generated gff table, as a
+    batch script does before each question, and the latency of single and
+    batch boundary queries to a GeneQueryService holding the index.
+
+    Args:
+        genes (Int): The number of genes in the gff table
+        queries (Int): The number of queries to make
+        seed (Int): The seed of the generated data
+    """
+    layout = random.Random(seed)
+    asked = []
+    for query in range(queries):
+        i = layout.randrange(genes - 5)
+        asked.append({'agi1': gene_agi(i, genes),
+                      'agi2': gene_agi(i + 5, genes),
+                      'motif_end': i // 5 * 5000 + layout.randint(0, 5000)})
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        gff_file_name = os.path.join(data_dir, "gff.csv")
+        with open(gff_file_name, "w") as gff_file:
+            write_gff_table(gff_file, genes, seed)
+
+        result = {'genes': genes, 'queries': queries}
+        with GeneQueryService(gff_file_name) as service:
+            result['load_seconds'] = service.load_seconds
+            start = time.perf_counter()
+            for query in asked:
+                with urllib.request.urlopen(
+                        service.url + "/query?" +
+                        urllib.parse.urlencode(query)) as response:
+                    response.read()
+            result['single_seconds'] = time.perf_counter() - start
+
+            request = urllib.request.Request(
+                service.url + "/query",
+                json.dumps({'queries': asked}).encode(),
+                {'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            result['batch_seconds'] = time.perf_counter() - start
+            result['latency'] = service.latency_report()
+    return result
+
+
+def bench_regulatory_network(relations=2000000, regulators=800,
+                             genes=28000, seed=0):
+    """ (Int, int, int, int) -> Dict
+
+    Return the time taken to find the relations shared by a predicted and a
+    curated set of regulator to target relations, with dictionaries of sets
+    of targets and with RegulatoryNetwork, and the time taken to build, save
+    and load the networks.
+
+    Args:
+        relations (Int): The number of relations in each set
+        regulators (Int): The number of distinct regulators
+        genes (Int): The number of distinct targets
+        seed (Int): The seed of the generated relations
+    """
+    layout = np.random.default_rng(seed)
+    names = np.array(["MA%04d.1" % i for i in range(regulators)])
+    agis = np.array([gene_agi(i, genes) for i in range(genes)])
+    dictionaries = []
+    for label in range(2):
+        rows = layout.integers(0, regulators, relations)
+        columns = layout.integers(0, genes, relations)
+        dictionary = {}
+        for name, agi in zip(names[rows].tolist(), agis[columns].tolist()):
+            dictionary.setdefault(name, []).append(agi)
+        dictionaries.append(dictionary)
+    result = {'relations': relations, 'regulators': regulators}
+
+    start = time.perf_counter()
+    predicted, curated = [{name: set(targets)
+                           for name, targets in dictionary.items()}
+                          for dictionary in dictionaries]
+    shared = sum(len(targets & curated[name])
+                 for name, targets in predicted.items() if name in curated)
+    result['dictionary_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    networks = [from_dictionary(dictionary) for dictionary in dictionaries]
+    result['build_seconds'] = time.perf_counter() - start
+    start = time.perf_counter()
+    summary, table = compare_networks(*networks)
+    result['network_seconds'] = time.perf_counter() - start
+    result['same_results'] = summary['shared_relations'] == shared
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        network_file = os.path.join(data_dir, "network.npz")
+        start = time.perf_counter()
+        networks[0].save(network_file)
+        result['save_seconds'] = time.perf_counter() - start
+        result['file_bytes'] = os.path.getsize(network_file)
+        start = time.perf_counter()
+        load_network(network_file)
+        result['load_seconds'] = time.perf_counter() - start
+    return result
+
+
+def gene_agi(i, genes):
+    """ (Int, Int) -> String
+
+    Return the AGI of the ith of a number of generated genes, spreading the
+    genes over the five chromosomes. Gene numbers step by ten, as in TAIR,
+    unless there are too many genes for that.
+
+    Args:
+        i (Int): The position of the gene
+        genes (Int): The number of genes
+    """
+    step = 10 if genes <= 5 * 9999 else 1
+    return "AT%dG%05d" % (i % 5 + 1, (i // 5 + 1) * step)
+
+
+def write_gff_table(gff_file, genes, seed=0):
+    """ (File, Int, int) -> None
+
+    Write a processed gff table, as read by open_gff_file, to an open text
+    file, with up to three isoforms per gene. Genes on a chromosome are
+    5000 bases apart.
+
+    Args:
+        gff_file (File): The file to write to
+        genes (Int): The number of genes, at most MAX_GENES
+        seed (Int): The seed of the random layout
+    """
+    layout = random.Random(seed)
+    gff_file.write("chr\tstart\tend\tstrand\tgeneid\n")
+    for i in range(genes):
+        agi = gene_agi(i, genes)
+        strand = layout.choice("+-")
+        start = i // 5 * 5000 + layout.randint(1, 2000)
+        for isoform in range(1, layout.randint(1, 3) + 1):
+            gff_file.write("Chr%d\t%d\t%d\t%s\tID=%s.%d\n" % (
+                i % 5 + 1, start + layout.randint(0, 200),
+                start + layout.randint(1000, 3000), strand, agi, isoform))
+
+
+def write_motif_file(motif_file, rows, genes, motifs=800, seed=0):
+    """ (File, Int, Int, int, int) -> None
+
+    Write a motif data file, as read by open_motif_file, to an open text
+    file. Each motif lies between two neighbouring genes of a generated gff
+    table with the same number of genes.
+
+    Args:
+        motif_file (File): The file to write to
+        rows (Int): The number of motifs
+        genes (Int): The number of genes in the gff table
+        motifs (Int): The number of distinct motif ids
+        seed (Int): The seed of the random motifs
+    """
+    layout = random.Random(seed)
+    motif_file.write("motif\tstrand\tstart\tend\tgene ids\n")
+    for row in range(rows):
+        # Gene i and the next gene on its chromosome
+        i = layout.randrange(max(genes - 5, 1))
+        start = i // 5 * 5000 + layout.randint(0, 5000)
+        motif_file.write("M%04d\t%s\t%d\t%d\t%s-%s\n" % (
+            layout.randrange(motifs), layout.choice("+-"), start,
+            start + 8, gene_agi(i, genes), gene_agi(i + 5, genes)))
+
+
+def write_interaction_file(text_file, rows, genes, jas_names, seed=0):
+    """ (File, Int, Int, List of String, int) -> None
+
+    Write a file of JASPAR names and AGI targets, as read by JasAgiParser,
+    to an open text file.
+
+    Args:
+        text_file (File): The file to write to
+        rows (Int): The number of interactions
+        genes (Int): The number of genes to draw targets from
+        jas_names (List of String): The JASPAR names to draw from
+        seed (Int): The seed of the random interactions
+    """
+    layout = random.Random(seed)
+    for row in range(rows):
+        text_file.write("%s\t%s\t%.3f\n" % (
+            layout.choice(jas_names), gene_agi(layout.randrange(genes), genes),
+            layout.random()))
+
+
+def write_sheet(sheet_file, rows, columns, seed=0):
+    """ (File, Int, Int, int) -> None
+
+    Write a wide tabs delimited sheet, as read by ExcelParser, to an open
+    text file, with a header line and a mix of text and number columns.
+
+    Args:
+        sheet_file (File): The file to write to
+        rows (Int): The number of rows after the header
+        columns (Int): The number of columns
+        seed (Int): The seed of the random values
+    """
+    layout = random.Random(seed)
+    sheet_file.write("\t".join("column%d" % i for i in range(columns)) + "\n")
+    for row in range(rows):
+        value = layout.randrange(10 ** 6)
+        sheet_file.write("\t".join(
+            "AT%dG%05d" % (j % 5 + 1, (value + j) % 100000) if j % 3 == 0
+            else str(value + j) for j in range(columns)) + "\n")
+
+
+def jaspar_names(count=100):
+    """ (Int) -> List of String
+
+    Return the JASPAR names of pfm_plants.txt when it is in the working
+    directory, so that they have aliases, or count made up names otherwise.
+
+    Args:
+        count (Int): The number of names to make up
+    """
+    if os.path.exists("pfm_plants.txt"):
+        return sorted(get_pfm_store("pfm_plants.txt").aliases)
+    return ["MA%04d.1" % i for i in range(count)]
+
+
+def measure(prepare, memory=True):
+    """ (Function, boolean) -> Dict
+
+    Return the seconds taken by a stage, and the peak bytes it allocates as
+    traced by tracemalloc. The stage runs once untraced for its time, and
+    once more traced for its memory, as tracing slows it down. Returns None
+    if the stage is skipped.
+
+    Args:
+        prepare (Function): Sets up the data of the stage, untimed, and
+            returns the function running the stage, or None to skip it.
+        memory (boolean): Whether to measure the peak memory
+    """
+    run = prepare()
+    if run is None:
+        return None
+    gc.collect()
+    start = time.perf_counter()
+    run()
+    result = {'seconds': time.perf_counter() - start, 'peak_bytes': None}
+
+    if memory:
+        run = prepare()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def make_stages(files, loop_limit):
+    """ (Dict, Int) -> Dict
+
+    Return the benchmark stages over a set of generated files, as functions
+    preparing each stage and returning the function running it. Stages too
+    slow for the number of rows return None instead.
+
+    Args:
+        files (Dict): The name of each generated file, by kind, and the
+            number of rows
+        loop_limit (Int): The most motif rows to run the loop engine on
+    """
+    def gff_load():
+        return lambda: open_gff_file(files['gff'])
+
+    def motif_load():
+        return lambda: open_motif_file(files['motif'], PREDICTOR_COLUMNS)
+
+    def predict(engine):
+        def prepare():
+            if engine == "loop" and files['rows'] > loop_limit:
+                return None
+            predictor = BinaryPairPredictor(files['gff'], files['motif'])
+            return lambda: predictor.execute(engine)
+        return prepare
+
+    def parse_data_set():
+        return lambda: Parser(files['interactions'])
+
+    def parse_interaction_files():
+        return lambda: parse_files([files['interactions']])
+
+    def convert_jas_to_alias():
+        # The converter reads pfm_plants.txt from the working directory
+        if not os.path.exists("pfm_plants.txt"):
+            return None
+        get_pfm_store("pfm_plants.txt")
+        dictionary = Parser(files['interactions']).interaction_dictionary
+        return lambda: JasToAliasConverter(dictionary)
+
+    def scrape(fast):
+        def prepare():
+            parser = ExcelParser(files['sheet'])
+            if fast:
+                return lambda: parser.scrape_columns_fast(SHEET_TARGETS, 1)
+            return lambda: parser.scrape_columns(SHEET_TARGETS, 1)
+        return prepare
+
+    return {'gff_load': gff_load,
+            'motif_load': motif_load,
+            'predict_vectorized': predict("vectorized"),
+            'predict_loop': predict("loop"),
+            'parse_data_set': parse_data_set,
+            'parse_files': parse_interaction_files,
+            'convert_jas_to_alias': convert_jas_to_alias,
+            'scrape_columns': scrape(False),
+            'scrape_columns_fast': scrape(True)}
+
+
+def run_suite(scale, seed=0, stages=None, memory=True,
+              loop_limit=10 ** 5):
+    """ (Int, int, List of String, boolean, int) -> Dict
+
+    Return the time and peak memory of each benchmark stage over generated
+    files of the given scale: that many motifs, interactions and sheet
+    rows, and a tenth as many genes, up to MAX_GENES.
+
+    Args:
+        scale (Int): The number of rows in the generated files
+        seed (Int): The seed of the generated files
+        stages (List of String): The stages to run, all if None
+        memory (boolean): Whether to measure the peak memory of each stage
+        loop_limit (Int): The most motif rows to run the loop engine on
+    """
+    genes = min(max(scale // 10, 100), MAX_GENES)
+    result = {'scale': scale, 'genes': genes, 'seed': seed, 'stages': {}}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        files = {'rows': scale}
+        for kind in ['gff', 'motif', 'interactions', 'sheet']:
+            files[kind] = os.path.join(temp_dir, kind + ".txt")
+
+        start = time.perf_counter()
+        with open(files['gff'], "w") as gff_file:
+            write_gff_table(gff_file, genes, seed)
+        with open(files['motif'], "w") as motif_file:
+            write_motif_file(motif_file, scale, genes, seed=seed)
+        with open(files['interactions'], "w") as text_file:
+            write_interaction_file(text_file, scale, genes, jaspar_names(),
+                                   seed)
+        with open(files['sheet'], "w") as sheet_file:
+            write_sheet(sheet_file, scale, SHEET_COLUMNS, seed)
+        result['generate_seconds'] = time.perf_counter() - start
+
+        for name, prepare in make_stages(files, loop_limit).items():
+            if stages is not None and name not in stages:
+                continue
+            stage = measure(prepare, memory)
+            if stage is None:
+                stage = {'skipped': True}
+            result['stages'][name] = stage
+    return result
+
+
+def run_micro_benchmarks():
+    """ () -> None
+
+    Print the results of the focused comparisons of old and new code paths.
+    """
+    for row in bench_pair_store():
+        list_time = row['list_seconds']
+        print("%8d pairs  list: %s  store: %.4fs" % (
+            row['pairs'],
+            "skipped" if list_time is None else "%.4fs" % list_time,
+            row['store_seconds']))
+    print(bench_alias_resolver())
+    print(bench_offline_resolver())
+    print(bench_scrape_columns())
+    print(bench_gff3())
+    print(bench_motif_file())
+    print(bench_query_service())
+    print(bench_regulatory_network())
+
+
+def main(argv=None):
+    """ (List of String) -> None
+
+    Run the benchmark suite at each requested scale, print a line per stage
+    and write all results, with the versions they were run on, to a JSON
+    file.
+
+    Args:
+        argv (List of String): The command line arguments, or None to use
+            sys.argv
+    """
+    argument_parser = argparse.ArgumentParser(
+        description="Time the hot paths over seeded synthetic data.")
+    argument_parser.add_argument(
+        "--scales", type=int, nargs="+", default=[10 ** 4],
+        help="numbers of rows to generate, from 10^3 to 10^7")
+    argument_parser.add_argument("--seed", type=int, default=0)
+    argument_parser.add_argument(
+        "--stages", nargs="+", choices=STAGE_NAMES,
+        help="stages to run, all by default")
+    argument_parser.add_argument(
+        "--output", default="benchmark_results.json",
+        help="JSON file to write the results to")
+    argument_parser.add_argument(
+        "--no-memory", action="store_true",
+        help="skip the traced run measuring peak memory")
+    argument_parser.add_argument(
+        "--loop-limit", type=int, default=10 ** 5,
+        help="most motif rows to run the loop engine on")
+    argument_parser.add_argument(
+        "--micro", action="store_true",
+        help="also print the focused old versus new comparisons")
+    arguments = argument_parser.parse_args(argv)
+
+    results = {'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'numpy': np.__version__,
+               'pandas': pd.__version__,
+               'runs': []}
+    for scale in arguments.scales:
+        run = run_suite(scale, arguments.seed, arguments.stages,
+                        not arguments.no_memory, arguments.loop_limit)
+        results['runs'].append(run)
+        for name, stage in run['stages'].items():
+            if stage.get('skipped'):
+                print("%9d  %-22s  skipped" % (scale, name))
+            elif stage['peak_bytes'] is None:
+                print("%9d  %-22s %9.3fs" % (scale, name, stage['seconds']))
+            else:
+                print("%9d  %-22s %9.3fs %9.1f MB" % (
+                    scale, name, stage['seconds'],
+                    stage['peak_bytes'] / 1e6))
+
+    with open(arguments.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+
+    if arguments.micro:
+        run_micro_benchmarks()
+
+
+if __name__ == "__main__":
+    main()
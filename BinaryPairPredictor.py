@@ -1,5 +1,35 @@
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
 import pandas as pd
 
+from AgiCodec import AgiIndex, encode_agis, strand_codes
+import ExcelParser
+from FileUtils import atomic_write, hash_file
+from GeneLocator import GeneLocator
+from GffParser import is_gff3, read_gff3
+from PairStore import PairStore, first_occurrences, interleave
+from PredictionState import PredictionState, hash_prefix, load_state
+from PredictorStats import MISSING_EXAMPLES, PredictorStats
+
+# Columns of a motif data file, named as in the processed motif data
+MOTIF_COLUMNS = ['motifid', 'strand', 'motifstart', 'motifend', 'gene ids']
+
+# Compact types of the motif data columns, motif ids and strands repeat
+MOTIF_DTYPES = {'motifid': 'category', 'strand': 'category',
+                'motifstart': np.int32, 'motifend': np.int32}
+
+# The columns of the processed motif data used to predict pairs
+PREDICTOR_COLUMNS = ['motifid', 'motifend', 'agi1', 'agi2']
+
+# Motif rows read at a time by execute_incremental without a chunksize
+INCREMENTAL_CHUNKSIZE = 1 << 20
+
 
 class BinaryPairPredictor:
     """
@@ -10,14 +40,34 @@ class BinaryPairPredictor:
 
     Attributes:
         self.indexed_gff (DataFrame): The pandas DataFrame containing
-            information about Arabidopsis gff which indexed by gene id.
+            information about Arabidopsis gff which indexed by gene id, with
+            one row holding the shortest isoform of each gene.
         motif_data (DataFrame): The pandas DataFrame containing motif
             information.
-        binary_pairs (List): The list of successfully matched binary pairs.
+        pair_store (PairStore): The successfully matched binary pairs,
+            without duplicates and in the order they were found.
+        gene_rows (Dict): The row of each gene id in self.indexed_gff.
+        gene_values (ndarray): The values of self.indexed_gff, for constant
+            time access to the row of a gene.
+        gene_index (AgiIndex): The index of integer agi codes used to join
+            motif data against self.indexed_gff, or a pandas Index if some
+            gene ids are not agis.
+        gene_locator (GeneLocator): The genes sorted by position on each
+            chromosome, built on demand by execute_by_coordinates.
+        gff_file_name (String): The name of the gff file.
+        motif_data_file_name (String): The name of the motif data file.
+        chunksize (Int): The number of motif rows to read at a time, or None
+            if the motif data is read at once into motif_data.
+        window (Int): The largest distance from a motif to the start of a
+            gene it is paired with.
+        stats (PredictorStats): The timings and counters of the run, or None
+            if the run is not instrumented.
     """
 
-    def __init__(self, gff_file_name, motif_data_file_name):
-        """(BinaryPairPredictor, String, String) -> None
+    def __init__(self, gff_file_name, motif_data_file_name, cache_dir=None,
+                 chunksize=None, window=3000, stats=None):
+        """(BinaryPairPredictor, String, String, String, int, int,
+        PredictorStats) -> None
 
         Initialize the binary pair predictor object, and open the required
         data files for analysis.
@@ -27,29 +77,147 @@ class BinaryPairPredictor:
                 information.
             motif_data_file_name (String): The name of the csv file
                 containing binding motif information.
+            cache_dir (String): The directory in which to cache the gene
+                index built from the gff file. No cache is used if None.
+            chunksize (Int): If given, the motif data is not loaded up
+                front, but streamed this many rows at a time when executing.
+            window (Int): The largest distance from a motif to the start of
+                a gene it is paired with.
+            stats (PredictorStats): If given, the time of each stage and
+                counters of rows and pairs are recorded in it.
         """
+        self.window = window
+        self.stats = stats
+        self.gff_file_name = gff_file_name
         # Open required data files
-        self.indexed_gff = open_gff_file(gff_file_name)
-        self.motif_data = open_motif_file(motif_data_file_name)
-        # Create list of results
-        self.binary_pairs = []
+        start = time.perf_counter()
+        self.indexed_gff = open_gff_file(gff_file_name, cache_dir)
+        if stats is not None:
+            stats.add_time("gff_load", time.perf_counter() - start)
+        self.motif_data_file_name = motif_data_file_name
+        self.chunksize = chunksize
+        self.motif_data = None
+        if chunksize is None:
+            start = time.perf_counter()
+            self.motif_data = open_motif_file(motif_data_file_name,
+                                              PREDICTOR_COLUMNS)
+            if stats is not None:
+                stats.add_time("motif_load", time.perf_counter() - start)
+        # Create store of results
+        self.pair_store = PairStore()
+        # Map each gene to its row for constant time lookups
+        self.gene_rows = dict(zip(self.indexed_gff.index,
+                                  range(len(self.indexed_gff))))
+        self.gene_values = self.indexed_gff.values
+        self.gene_index = make_gene_index(self.indexed_gff.index)
+        self.gene_locator = None
+
+    @property
+    def binary_pairs(self):
+        """ (BinaryPairPredictor) -> List of Tuple
+
+        Return the list of successfully matched binary pairs.
+        """
+        return self.pair_store.to_list()
+
+    def motif_chunks(self):
+        """ (BinaryPairPredictor) -> Iterator of DataFrame
+
+        Yield the motif data, either as a whole or in chunks of
+        self.chunksize rows read from the motif data file.
+        """
+        if self.motif_data is not None:
+            yield self.motif_data
+        elif self.stats is None:
+            yield from iter_motif_file(self.motif_data_file_name,
+                                       self.chunksize, PREDICTOR_COLUMNS)
+        else:
+            # Time the reading of each chunk, but not its prediction
+            chunks = iter_motif_file(self.motif_data_file_name,
+                                     self.chunksize, PREDICTOR_COLUMNS)
+            while True:
+                with self.stats.timer("motif_load"):
+                    motif_data = next(chunks, None)
+                if motif_data is None:
+                    return
+                yield motif_data
+
+    def count_pairs(self, emitted, new):
+        """ (BinaryPairPredictor, int, int) -> None
+
+        Record the number of pairs emitted by the rules, and how many of
+        them were new to the results, if the run is instrumented.
+
+        Args:
+            emitted (Int): The number of pairs emitted
+            new (Int): The number of those pairs not found before
+        """
+        if self.stats is not None:
+            self.stats.count("pairs_emitted", emitted)
+            self.stats.count("pairs_new", new)
+            self.stats.count("pairs_duplicate", emitted - new)
+            self.stats.progress()
+
+    def execute(self, engine="loop"):
+        """ (BinaryPairPredictor, String) -> None
+
+        Predicts binary pairs for the data files. Both engines produce the
+        same binary pairs in the same order.
 
-    def execute(self):
+        Args:
+            engine (String): Either "loop" to test each motif row in turn,
+                or "vectorized" to evaluate all motif rows at once.
+        """
+        if engine == "loop":
+            self.execute_loop()
+        elif engine == "vectorized":
+            self.execute_vectorized()
+        else:
+            raise ValueError("Unknown engine: " + str(engine))
+
+    def execute_loop(self):
         """ (BinaryPairPredictor) -> None
 
-        Predicts binary pairs for the data files.
+        Predicts binary pairs for the data files, one motif row at a time.
+        Rows with a gene missing from the gff are skipped, and counted when
+        the run is instrumented.
         """
+        stats = self.stats
+        # The total rows are only known when the motif data is loaded
+        total_rows = None
+        if self.motif_data is not None:
+            total_rows = len(self.motif_data)
 
-        for i in self.motif_data.index:
-            # Get gene ids
-            gene_1_agi = self.motif_data.agi1[i]
-            gene_2_agi = self.motif_data.agi2[i]
+        for motif_data in self.motif_chunks():
+            emitted = 0
+            skipped = 0
+            same = 0
+            pairs_before = len(self.pair_store)
+            for position, i in enumerate(motif_data.index):
+                if stats is not None:
+                    # Rows are counted per chunk, so report the row reached
+                    stats.progress(
+                        total_rows, stats.counters["rows"] + position,
+                        stats.counters["pairs_new"] + len(self.pair_store) -
+                        pairs_before)
+                    start = time.perf_counter()
 
-            # Ensures that genes are also in gff data set
-            try:
-                # Get gene information
-                gene_1_info = self.get_gene_info(gene_1_agi)
-                gene_2_info = self.get_gene_info(gene_2_agi)
+                # Get gene ids
+                gene_1_agi = motif_data.agi1[i]
+                gene_2_agi = motif_data.agi2[i]
+
+                # Ensures that genes are also in gff data set
+                try:
+                    # Get gene information
+                    gene_1_info = self.get_gene_info(gene_1_agi)
+                    gene_2_info = self.get_gene_info(gene_2_agi)
+                except KeyError:
+                    skipped += 1
+                    if stats is not None:
+                        stats.add_missing(
+                            gene for gene in [gene_1_agi, gene_2_agi]
+                            if gene not in self.gene_rows)
+                    continue
 
                 # Get the strand for genes
                 gene_1_strand = gene_1_info[3]
@@ -59,8 +227,12 @@ class BinaryPairPredictor:
                 gene_2_start = gene_2_info[1]
 
                 # Get motif id, end
-                motif = self.motif_data.motifid[i]
-                motif_end = int(self.motif_data.motifend[i])
+                motif = motif_data.motifid[i]
+                motif_end = int(motif_data.motifend[i])
+
+                if stats is not None:
+                    looked_up = time.perf_counter()
+                    stats.add_time("lookup", looked_up - start)
 
                 # Assign possible binary pair
                 bin_pair_1 = (motif, gene_1_agi)
@@ -68,18 +240,383 @@ class BinaryPairPredictor:
 
                 # Check if two genes are on the same strand
                 if gene_1_strand == gene_2_strand:
-                    self.process_same(bin_pair_1, bin_pair_2, gene_1_strand,
-                                      gene_1_start, gene_2_start, motif_end)
+                    same += 1
+                    emitted += self.process_same(bin_pair_1, bin_pair_2,
+                                                 gene_1_strand, gene_1_start,
+                                                 gene_2_start, motif_end)
 
                 elif gene_1_strand != gene_2_strand:
-                    self.process_diff(bin_pair_1, bin_pair_2, gene_1_strand,
-                                      gene_2_strand, gene_1_start,
-                                      gene_2_start, motif_end)
-            except KeyError:
-                continue
+                    emitted += self.process_diff(bin_pair_1, bin_pair_2,
+                                                 gene_1_strand, gene_2_strand,
+                                                 gene_1_start, gene_2_start,
+                                                 motif_end)
+
+                if stats is not None:
+                    stats.add_time("rules", time.perf_counter() - looked_up)
+
+            if stats is not None:
+                rows = len(motif_data)
+                stats.count("rows", rows)
+                stats.count("skipped_missing_gene", skipped)
+                stats.count("same_strand", same)
+                stats.count("opposite_strand", rows - skipped - same)
+                self.count_pairs(emitted,
+                                 len(self.pair_store) - pairs_before)
+
+    def execute_vectorized(self):
+        """ (BinaryPairPredictor) -> None
+
+        Predicts binary pairs for the data files by joining the motif data
+        against a table with one row per gene, and applying the strand and
+        distance rules of process_same and process_diff to all rows at once.
+        """
+        for motif_data in self.motif_chunks():
+            motifs, genes = predict_pairs(motif_data, self.indexed_gff,
+                                          self.window, self.gene_index,
+                                          self.stats)
+            new_pairs = self.pair_store.update(zip(motifs.tolist(),
+                                                   genes.tolist()))
+            self.count_pairs(len(motifs), len(new_pairs))
+
+    def execute_parallel(self, workers=None):
+        """ (BinaryPairPredictor, int) -> None
+
+        Predicts binary pairs like execute_vectorized, splitting the motif
+        rows into ranges which are predicted by a pool of worker processes.
+        The gene index and motif data are shared with the workers through
+        memory-mapped files, and their results are merged in row order, so
+        the binary pairs are the same as those of the other engines.
+
+        Falls back to execute_vectorized when only one worker is asked for,
+        or when worker processes can not be started.
+
+        Args:
+            workers (Int): The number of worker processes. Defaults to the
+                number of cores.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            self.execute_vectorized()
+            return
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            save_arrays(data_dir, {
+                'geneid': self.agi_array(self.indexed_gff.index),
+                'genestart': self.indexed_gff['genestart'].values.astype(
+                    np.int64),
+                'strand': strand_codes(self.indexed_gff['strand'].values)})
+            try:
+                with ProcessPoolExecutor(workers) as executor:
+                    for motif_data in self.motif_chunks():
+                        self.predict_chunk_parallel(motif_data, data_dir,
+                                                    executor, workers)
+            except (OSError, NotImplementedError, BrokenProcessPool):
+                # Pairs already found are kept, and found again in order
+                self.execute_vectorized()
+
+    def predict_chunk_parallel(self, motif_data, data_dir, executor,
+                               workers):
+        """ (BinaryPairPredictor, DataFrame, String, Executor, int) -> None
+
+        Predicts binary pairs for a chunk of motif data, split into row
+        ranges over the workers of an executor.
+
+        Args:
+            motif_data (DataFrame): The motif data to predict for
+            data_dir (String): The directory holding the shared npy files
+            executor (Executor): The pool of worker processes
+            workers (Int): The number of worker processes
+        """
+        # Motifs are shared as codes, and boundary genes as they are read,
+        # to be encoded by the workers
+        motif_codes, motif_ids = pd.factorize(motif_data['motifid'],
+                                              use_na_sentinel=False)
+        save_arrays(data_dir, {
+            'motifcode': motif_codes.astype(np.int64),
+            'agi1': np.asarray(motif_data['agi1'], dtype=str),
+            'agi2': np.asarray(motif_data['agi2'], dtype=str),
+            'motifend': motif_data['motifend'].values.astype(np.int64)})
+
+        # Several ranges per worker keeps the workers evenly loaded
+        bounds = np.linspace(0, len(motif_data), workers * 4 + 1).astype(int)
+        ranges = len(bounds) - 1
+        results = list(executor.map(predict_pair_range, [data_dir] * ranges,
+                                    bounds[:-1], bounds[1:],
+                                    [self.window] * ranges,
+                                    [self.stats is not None] * ranges))
+
+        # Pairs found by an earlier range are dropped from later ones
+        keys = np.concatenate([result[0] for result in results])
+        keys = keys[first_occurrences(keys)]
+
+        # The strings of each pair are only built once, when merged
+        gene_count = len(self.indexed_gff)
+        motifs = np.asarray(motif_ids)[keys // gene_count]
+        genes = self.indexed_gff.index.values[keys % gene_count]
+        new_pairs = self.pair_store.update(zip(motifs.tolist(),
+                                               genes.tolist()))
+        if self.stats is not None:
+            # Sum the row counters of the ranges, timings are left out as
+            # the ranges ran at the same time
+            for result in results:
+                for counter in ["rows", "skipped_missing_gene",
+                                "same_strand", "opposite_strand"]:
+                    self.stats.count(counter, result[2].counters[counter])
+                self.stats.add_missing(result[2].missing_genes)
+        self.count_pairs(sum(result[1] for result in results),
+                         len(new_pairs))
+
+    def agi_array(self, agis):
+        """ (BinaryPairPredictor, Series) -> ndarray
+
+        Return agis as an ndarray to share with worker processes: as integer
+        codes when genes are joined by code, and as strings otherwise.
+
+        Args:
+            agis (Series): The agis to convert
+        """
+        if isinstance(self.gene_index, AgiIndex):
+            return encode_agis(agis, ignore_case=False)
+        return np.asarray(agis, dtype=str)
+
+    def execute_streaming(self, output_file_name):
+        """ (BinaryPairPredictor, String) -> int
+
+        Predicts binary pairs like execute_vectorized, one chunk of motif
+        data at a time, and writes each new binary pair to a tabs delimited
+        file as soon as its chunk is done. When the predictor was created
+        with a chunksize, memory use is bounded by the chunk size and the
+        number of distinct pairs, rather than the size of the motif file.
+
+        Args:
+            output_file_name (String): The name of the file to write to.
+        Return:
+            The number of binary pairs written
+        """
+        written = 0
+        with open(output_file_name, "w") as output_file:
+            for motif_data in self.motif_chunks():
+                motifs, genes = predict_pairs(motif_data, self.indexed_gff,
+                                              self.window, self.gene_index,
+                                              self.stats)
+                new_pairs = self.pair_store.update(zip(motifs.tolist(),
+                                                       genes.tolist()))
+                self.count_pairs(len(motifs), len(new_pairs))
+                output_file.writelines("\t".join(pair) + "\n"
+                                       for pair in new_pairs)
+                written += len(new_pairs)
+        return written
+
+    def execute_incremental(self, state_file_name):
+        """ (BinaryPairPredictor, String) -> int
+
+        Predicts binary pairs like execute_vectorized, reusing the state
+        saved by the last incremental run so that only the work its inputs
+        call for is done again:
+
+        - motif rows appended to the motif file since the last run are
+          predicted, and the rows before them are not read at all;
+        - when the gff file changed, only the stored motif rows with a
+          boundary gene which was added, removed, moved or turned to another
+          strand are predicted again.
+
+        The binary pairs are the same, in the same order, as those of a
+        full run. A full run is done, and its state saved, when there is no
+        usable state: on the first run, when the window changed, or when the
+        motif file was changed other than by appending rows to it.
+
+        Create the predictor with a chunksize, so that the motif file is not
+        loaded up front only for most of it to be skipped.
+
+        Args:
+            state_file_name (String): The name of the npz file holding the
+                state, which is written when done.
+        Raises:
+            ValueError: If some gene ids are not agis, or a motif row has no
+                motif id, since the state stores both as integer codes.
+        Return:
+            The number of motif rows predicted
+        """
+        if not isinstance(self.gene_index, AgiIndex):
+            raise ValueError("Incremental prediction needs agi gene ids")
+
+        # Fingerprint the gene table this run predicts with
+        gff_digest = hash_file(self.gff_file_name)
+        gene_codes = encode_agis(self.indexed_gff.index, ignore_case=False)
+        gene_starts = self.indexed_gff['genestart'].values.astype(np.int64)
+        gene_strands = strand_codes(self.indexed_gff['strand'].values)
+
+        # Only reuse a state whose motif rows are still at the start of the
+        # motif file, ending on a whole line
+        motif_size = os.path.getsize(self.motif_data_file_name)
+        state = load_state(state_file_name)
+        digest = None
+        if state is not None and state.window == self.window and \
+                state.motif_bytes <= motif_size and \
+                ends_line(self.motif_data_file_name, state.motif_bytes):
+            digest = hash_prefix(self.motif_data_file_name,
+                                 state.motif_bytes)
+            if digest.hexdigest() != state.motif_digest:
+                digest = None
+        if digest is None:
+            state = PredictionState(self.window, gff_digest, gene_codes,
+                                    gene_starts, gene_strands)
+        evaluated = 0
+
+        # Predict the stored rows of genes changed in the gff again
+        if state.gff_digest != gff_digest:
+            changed = state.changed_genes(gene_codes, gene_starts,
+                                          gene_strands)
+            rows = np.flatnonzero(np.isin(state.agi_1, changed) |
+                                  np.isin(state.agi_2, changed))
+            state.keep_1[rows], state.keep_2[rows] = self.evaluate_codes(
+                state.agi_1[rows], state.agi_2[rows], state.motif_ends[rows])
+            state.set_genes(gff_digest, gene_codes, gene_starts,
+                            gene_strands)
+            evaluated += len(rows)
+
+        # Predict the rows appended since the state was saved
+        for motif_data in iter_motif_file(
+                self.motif_data_file_name,
+                self.chunksize or INCREMENTAL_CHUNKSIZE, PREDICTOR_COLUMNS,
+                state.motif_bytes):
+            agi_1 = encode_agis(motif_data['agi1'], ignore_case=False)
+            agi_2 = encode_agis(motif_data['agi2'], ignore_case=False)
+            motif_ends = motif_data['motifend'].values.astype(np.int64)
+            keep_1, keep_2 = self.evaluate_codes(agi_1, agi_2, motif_ends)
+            state.add_rows(motif_data['motifid'].values, agi_1, agi_2,
+                           motif_ends, keep_1, keep_2)
+            evaluated += len(motif_data)
+
+        # The state now covers the whole motif file
+        digest = hash_prefix(self.motif_data_file_name, motif_size,
+                             (digest, state.motif_bytes) if digest else None)
+        state.motif_bytes = motif_size
+        state.motif_digest = digest.hexdigest()
+        state.save(state_file_name)
+
+        motifs, genes = state.pairs()
+        self.pair_store.update(zip(motifs.tolist(), genes.tolist()))
+        return evaluated
+
+    def evaluate_codes(self, agi_1, agi_2, motif_ends):
+        """ (BinaryPairPredictor, ndarray, ndarray, ndarray) -> Tuple
+
+        Return two boolean ndarrays marking whether each motif pairs with
+        gene 1 and with gene 2, for motifs with boundary genes given as agi
+        codes. Motifs with a gene missing from the gff pair with neither.
+
+        Args:
+            agi_1 (ndarray): The agi code of gene 1 of each motif
+            agi_2 (ndarray): The agi code of gene 2 of each motif
+            motif_ends (ndarray): The ending index of each motif
+        Return:
+            A tuple of the boolean ndarrays for gene 1 and gene 2
+        """
+        gene_1_rows = self.gene_index.get_indexer(agi_1)
+        gene_2_rows = self.gene_index.get_indexer(agi_2)
+        found = (gene_1_rows >= 0) & (gene_2_rows >= 0)
+
+        # Missing genes look up the last gene, and are masked out after
+        strands = strand_codes(self.indexed_gff['strand'].values)
+        starts = self.indexed_gff['genestart'].values.astype(np.int64)
+        keep_1, keep_2 = evaluate_rules(
+            strands[gene_1_rows], strands[gene_2_rows], starts[gene_1_rows],
+            starts[gene_2_rows], motif_ends, self.window)
+        return keep_1 & found, keep_2 & found
+
+    def execute_by_coordinates(self, window=None):
+        """ (BinaryPairPredictor, int) -> None
+
+        Predicts binary pairs from the position of each motif alone, pairing
+        it with every gene on its chromosome which starts within window
+        bases downstream of it, rather than only the two boundary genes.
+
+        The chromosome of a motif is taken from a chromosome column of the
+        motif data if there is one, and otherwise from the agi of its first
+        boundary gene.
+
+        Args:
+            window (Int): The largest distance from motif to gene start.
+                Defaults to self.window.
+        """
+        if window is None:
+            window = self.window
+        if self.gene_locator is None:
+            self.gene_locator = GeneLocator(self.indexed_gff)
+
+        for motif_data in self.motif_chunks():
+            if 'chromosome' in motif_data.columns:
+                chromosomes = motif_data['chromosome']
+            else:
+                # The chromosome is the third character of an agi
+                chromosomes = motif_data['agi1'].str[2]
+            # Motifs with no known chromosome are skipped
+            found = chromosomes.notna().values
+
+            hits, genes = self.gene_locator.find_pairs(
+                chromosomes.values[found],
+                motif_data['motifend'].values[found], window)
+            motifs = motif_data['motifid'].values[found][hits]
+            self.pair_store.update(zip(motifs.tolist(), genes.tolist()))
+
+    def sweep_windows(self, windows):
+        """ (BinaryPairPredictor, List of int) -> Dict
+
+        Return the binary pairs which would be predicted with each of several
+        windows, in a single pass over the motif data. The distance from each
+        motif to its genes is worked out once, for the largest window.
+
+        Args:
+            windows (List of int): The windows to predict binary pairs for
+        Return:
+            A dictionary of each window to its list of binary pairs, in the
+            order execute would find them with that window.
+        """
+        stores = {window: PairStore() for window in windows}
+        for motif_data in self.motif_chunks():
+            motifs, genes, distances = predict_pair_distances(
+                motif_data, self.indexed_gff, max(windows), self.gene_index)
+            motifs = motifs.tolist()
+            genes = genes.tolist()
+            for window, store in stores.items():
+                kept = np.flatnonzero(distances <= window).tolist()
+                store.update((motifs[i], genes[i]) for i in kept)
+
+        return {window: store.to_list() for window, store in stores.items()}
+
+    def distance_table(self, window=None):
+        """ (BinaryPairPredictor, int) -> DataFrame
+
+        Return a DataFrame of each binary pair predicted within a window,
+        with the smallest distance between its motif and gene. The pairs of
+        any smaller window are those with a distance no larger than it.
+
+        Args:
+            window (Int): The largest distance from motif to gene start.
+                Defaults to self.window.
+        Return:
+            A DataFrame with motifid, geneid and distance columns
+        """
+        if window is None:
+            window = self.window
+
+        tables = []
+        for motif_data in self.motif_chunks():
+            motifs, genes, distances = predict_pair_distances(
+                motif_data, self.indexed_gff, window, self.gene_index)
+            tables.append(pd.DataFrame({'motifid': motifs, 'geneid': genes,
+                                        'distance': distances}))
+
+        table = pd.concat(tables, ignore_index=True)
+        # Only motif and gene combinations which occur are grouped, rather
+        # than every combination of the motif id categories
+        return table.groupby(['motifid', 'geneid'], sort=False,
+                             as_index=False, observed=True)['distance'].min()
 
     def process_same(self, bp1, bp2, strand, g1_start, g2_start, m_end):
-        """ (BinaryPairPredictor, Tuple, Tuple, String, int, int, int) -> None
+        """ (BinaryPairPredictor, Tuple, Tuple, String, int, int, int) -> int
 
         Append binary pair of (motif, gene 1) or (motif, gene 2) if the
         conditions for excepting a predicted binary pair is met. Handles
@@ -92,32 +629,40 @@ class BinaryPairPredictor:
             g1_start (Int): The starting index of gene 1
             g2_start (Int): The starting index of gene 2
             m_end (Int): The ending index of the motif
+        Return:
+            The number of binary pairs emitted, including repeats
         """
+        emitted = 0
         if strand == '+':
             if m_end < g1_start:
                 distance = g1_start - m_end
-                if distance <= 3000 and bp1 not in self.binary_pairs:
+                if distance <= self.window:
                     # Pairs motif to gene which comes after it
-                    self.binary_pairs.append(bp1)
+                    self.pair_store.add(bp1)
+                    emitted += 1
             if m_end < g2_start:
                 distance = g2_start - m_end
-                if distance <= 3000 and bp2 not in self.binary_pairs:
-                    self.binary_pairs.append(bp2)
+                if distance <= self.window:
+                    self.pair_store.add(bp2)
+                    emitted += 1
         elif strand == '-':
             if m_end > g1_start:
                 distance = m_end - g1_start
-                if distance <= 3000 and bp1 not in self.binary_pairs:
+                if distance <= self.window:
                     # Pairs motif to gene which comes after it
-                    self.binary_pairs.append(bp1)
+                    self.pair_store.add(bp1)
+                    emitted += 1
             if m_end > g2_start:
                 distance = m_end - g2_start
-                if distance <= 3000 and bp2 not in self.binary_pairs:
-                    self.binary_pairs.append(bp2)
+                if distance <= self.window:
+                    self.pair_store.add(bp2)
+                    emitted += 1
+        return emitted
 
     def process_diff(self, bp1, bp2, g1_strand, g2_strand, g1_start,
                      g2_start, m_end):
         """ (BinaryPairPredictor, Tuple, Tuple, String, String, int, int,
-        int) -> None
+        int) -> int
 
         Append binary pair of (motif, gene 1) or (motif, gene 2) if the
         conditions for excepting a predicted binary pair is met. Handles
@@ -131,25 +676,33 @@ class BinaryPairPredictor:
             g1_start (Int): The starting index of gene 1
             g2_start (Int): The starting index of gene 2
             m_end (Int): The ending index of the motif
+        Return:
+            The number of binary pairs emitted, including repeats
         """
+        emitted = 0
         if g1_strand == '-' and g2_strand == '+':
             if m_end > g1_start:
                 distance = m_end - g1_start
-                if distance <= 3000 and bp1 not in self.binary_pairs:
-                    self.binary_pairs.append(bp1)
+                if distance <= self.window:
+                    self.pair_store.add(bp1)
+                    emitted += 1
             if m_end < g2_start:
                 distance = g2_start - m_end
-                if distance <= 3000 and bp2 not in self.binary_pairs:
-                    self.binary_pairs.append(bp2)
+                if distance <= self.window:
+                    self.pair_store.add(bp2)
+                    emitted += 1
         elif g1_strand == '+' and g2_strand == '-':
             if m_end < g1_start:
                 distance = g1_start - m_end
-                if distance <= 3000 and bp1 not in self.binary_pairs:
-                    self.binary_pairs.append(bp1)
+                if distance <= self.window:
+                    self.pair_store.add(bp1)
+                    emitted += 1
             if m_end > g2_start:
                 distance = m_end - g2_start
-                if distance <= 3000 and bp2 not in self.binary_pairs:
-                    self.binary_pairs.append(bp2)
+                if distance <= self.window:
+                    self.pair_store.add(bp2)
+                    emitted += 1
+        return emitted
 
     def get_gene_info(self, gene_agi):
         """ (BinaryPairPredictor, String) -> ndarray
@@ -161,23 +714,10 @@ class BinaryPairPredictor:
         Return:
             An ndarray which contains gene data.
         """
-        # Find the target gene, and drop any duplicated isoforms
-        gene_info = self.indexed_gff.loc[gene_agi].drop_duplicates()
-
-        # Check what type/how many data points were found
-        if isinstance(gene_info, pd.Series):
-            # Return values as nd array
-            return gene_info.values
-        elif isinstance(gene_info, pd.DataFrame):
-            # Check if only one element remains
-            if gene_info.size == 4:
-                # Return values as nd array
-                return gene_info.values[0]
-            # Return the smallest isoform to use
-            return get_smallest_isoform(gene_info)
+        return self.gene_values[self.gene_rows[gene_agi]]
 
     def get_gene_start(self, gene):
-        """ (BinaryPairPredictor, String) -> String
+        """ (BinaryPairPredictor, String) -> int
 
         Return the start position of the target gene by querying the indexed
         gff file
@@ -185,9 +725,7 @@ class BinaryPairPredictor:
         Args:
             gene (String): The agi to query
         """
-        gene_start_query = self.indexed_gff.genestart.loc[[gene]]
-        gene_start = int(gene_start_query.drop_duplicates().iloc[0])
-        return gene_start
+        return int(self.gene_values[self.gene_rows[gene]][1])
 
     def get_gene_strand(self, gene):
         """ (BinaryPairPredictor, String) -> String
@@ -197,59 +735,540 @@ class BinaryPairPredictor:
         Args:
             gene (String): The agi to query
         """
-        gene_strand_query = (self.indexed_gff.strand.loc[[gene]])
-        gene_strand = str(gene_strand_query.drop_duplicates()[0])
-        return gene_strand
+        return str(self.gene_values[self.gene_rows[gene]][3])
 
+    def get_gene_rows(self, genes):
+        """ (BinaryPairPredictor, List of String) -> ndarray
 
-def open_gff_file(gff_file_name):
-    """ (String) -> DataFrame
+        Return the rows of the target genes in the indexed gff file.
+
+        Args:
+            genes (List of String): The agis to query
+        Raises:
+            KeyError: If any of the genes are not in the gff data set.
+        """
+        rows = self.indexed_gff.index.get_indexer(genes)
+        if (rows < 0).any():
+            raise KeyError(np.asarray(genes)[rows < 0].tolist())
+        return rows
+
+    def get_gene_infos(self, genes):
+        """ (BinaryPairPredictor, List of String) -> ndarray
+
+        Return a 2D ndarray with the gene data of each target gene.
+
+        Args:
+            genes (List of String): The agis to query
+        """
+        return self.gene_values[self.get_gene_rows(genes)]
+
+    def get_gene_starts(self, genes):
+        """ (BinaryPairPredictor, List of String) -> ndarray
+
+        Return an ndarray with the start position of each target gene.
+
+        Args:
+            genes (List of String): The agis to query
+        """
+        starts = self.indexed_gff['genestart'].values
+        return starts[self.get_gene_rows(genes)]
+
+    def get_gene_strands(self, genes):
+        """ (BinaryPairPredictor, List of String) -> ndarray
+
+        Return an ndarray with the strand of each target gene.
+
+        Args:
+            genes (List of String): The agis to query
+        """
+        strands = self.indexed_gff['strand'].values
+        return strands[self.get_gene_rows(genes)]
+
+
+def open_gff_file(gff_file_name, cache_dir=None):
+    """ (String, String) -> DataFrame
 
     Return a pandas DataFrame containing information from a gff file which
-    has been processed for further analysis
+    has been processed for further analysis, or from a gff3 annotation
+    (.gff, .gff3, optionally gzipped) read by GffParser.read_gff3. Only the
+    shortest isoform of each gene is kept.
+
+    When a cache directory is given, the processed gff is saved there under
+    the hash of the gff file, and loaded from there on later calls. A cache
+    which can not be read is rebuilt.
 
     Args:
         gff_file_name (String): The name of the gff file
+        cache_dir (String): The directory to cache the processed gff in
     """
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, "gff_" +
+                                  hash_file(gff_file_name) + ".npz")
+        if os.path.exists(cache_file):
+            try:
+                return load_gene_index(cache_file)
+            except (OSError, KeyError, ValueError, EOFError,
+                    zipfile.BadZipFile):
+                # A corrupt cache is rebuilt below and written again
+                pass
 
-    # Open gff file using tabs as delimiter
-    gff = pd.read_csv(gff_file_name, delimiter='\t')
-    # Slices the agi from the gene id column
-    gff['geneid'] = gff['geneid'].str[3:12]
-    # Sets column names
-    gff.columns = ['chromonumb', 'genestart', 'geneend', 'strand', 'geneid']
+    if is_gff3(gff_file_name):
+        # Read the gene table straight from the gff3 annotation
+        gff = read_gff3(gff_file_name)
+    else:
+        # Open gff file using tabs as delimiter
+        gff = pd.read_csv(gff_file_name, delimiter='\t')
+        # Slices the agi from the gene id column
+        gff['geneid'] = gff['geneid'].str[3:12]
+        # Sets column names
+        gff.columns = ['chromonumb', 'genestart', 'geneend', 'strand',
+                       'geneid']
     # Creates an indexed gff file
     indexed_gff = gff.set_index('geneid')
+    # Keeps one isoform per gene
+    indexed_gff = build_gene_table(indexed_gff)
+
+    if cache_dir is not None:
+        save_gene_index(indexed_gff, cache_file)
 
     return indexed_gff
 
 
-def open_motif_file(motif_file_name):
+def save_gene_index(indexed_gff, cache_file):
+    """ (DataFrame, String) -> None
+
+    Save an indexed gff DataFrame to a npz file.
+
+    Args:
+        indexed_gff (DataFrame): The gff DataFrame indexed by gene id
+        cache_file (String): The name of the npz file to write
+    """
+    arrays = {'geneid': np.asarray(indexed_gff.index, dtype=str)}
+    for column in indexed_gff.columns:
+        values = np.asarray(indexed_gff[column])
+        # Store text columns as fixed width strings, which need no pickling
+        if values.dtype.kind not in "biuf":
+            values = values.astype(str)
+        arrays[column] = values
+
+    with atomic_write(cache_file) as npz_file:
+        np.savez(npz_file, **arrays)
+
+
+def save_arrays(data_dir, arrays):
+    """ (String, Dict) -> None
+
+    Save each ndarray of a dictionary to its own npy file, named after its
+    key, so that it can be memory-mapped.
+
+    Args:
+        data_dir (String): The directory to write to
+        arrays (Dict): The ndarrays to save, by name
+    """
+    for name, values in arrays.items():
+        np.save(os.path.join(data_dir, name + ".npy"), values)
+
+
+def load_gene_index(cache_file):
     """ (String) -> DataFrame
 
+    Return an indexed gff DataFrame saved by save_gene_index.
+
+    Args:
+        cache_file (String): The name of the npz file to read
+    """
+    with np.load(cache_file) as arrays:
+        columns = [name for name in arrays.files if name != 'geneid']
+        indexed_gff = pd.DataFrame({name: arrays[name] for name in columns},
+                                   index=pd.Index(arrays['geneid'],
+                                                  name='geneid'))
+    return indexed_gff
+
+
+def open_motif_file(motif_file_name, usecols=None):
+    """ (String, List of String) -> DataFrame
+
     Return a pandas DataFrame containing information from a motif data file
     which has been processed for further analysis
 
     Args:
         motif_file_name (String): The name of the motif data file
+        usecols (List of String): The columns to load, out of motifid,
+            strand, motifstart, motifend, agi1 and agi2, such as
+            PREDICTOR_COLUMNS. All columns are loaded if None.
     """
 
     # Open motif file using tabs as delimiter
-    motif_file = pd.read_csv(motif_file_name, delimiter='\t')
-    # Extracts the agi-agi boundary of the motif as two agi
-    motif_file['agi1'] = motif_file['gene ids'].str.extract('(.........-)')
-    motif_file['agi2'] = motif_file['gene ids'].str.extract('(-.........)')
-    # Delete boundary column
-    del motif_file['gene ids']
-    # Create two new columns containing the agi-agi boundaries
-    motif_file['agi1'] = motif_file['agi1'].str[:9]
-    motif_file['agi2'] = motif_file['agi2'].str[1:]
-    # Set column names
-    motif_file.columns = ['motifid', 'strand', 'motifstart', 'motifend',
-                          'agi1', 'agi2']
+    motif_file = pd.read_csv(motif_file_name, delimiter='\t', header=0,
+                             names=MOTIF_COLUMNS, dtype=MOTIF_DTYPES,
+                             usecols=motif_file_columns(usecols))
+    return process_motif_data(motif_file)
+
+
+def iter_motif_file(motif_file_name, chunksize, usecols=None, offset=0):
+    """ (String, int, List of String, int) -> Iterator of DataFrame
+
+    Yield pandas DataFrames of at most chunksize rows each, containing the
+    information of a motif data file processed as by open_motif_file.
+
+    Args:
+        motif_file_name (String): The name of the motif data file
+        chunksize (Int): The number of rows to read at a time
+        usecols (List of String): The columns to load, all if None.
+        offset (Int): The byte to start reading at, which must begin a line
+            after the header. The whole file is read if 0.
+    """
+    with open(motif_file_name, "rb") as motif_file:
+        motif_file.seek(offset)
+        # Nothing is left to read past the end of the file
+        if offset and not motif_file.read(1):
+            return
+        motif_file.seek(offset)
+        with pd.read_csv(motif_file, delimiter='\t',
+                         header=None if offset else 0, names=MOTIF_COLUMNS,
+                         dtype=MOTIF_DTYPES,
+                         usecols=motif_file_columns(usecols),
+                         chunksize=chunksize) as reader:
+            for motif_data in reader:
+                yield process_motif_data(motif_data)
+
+
+def ends_line(file_name, size):
+    """ (String, int) -> boolean
+
+    Return whether the first size bytes of a file end with a whole line.
+
+    Args:
+        file_name (String): The name of the file
+        size (Int): The number of bytes at the start of the file
+    """
+    if size == 0:
+        return True
+    with open(file_name, "rb") as checked_file:
+        checked_file.seek(size - 1)
+        return checked_file.read(1) == b"\n"
+
+
+def motif_file_columns(usecols):
+    """ (List of String) -> List of String
+
+    Return the columns of a motif data file to read for the given columns
+    of the processed motif data, or None to read all of them.
+
+    Args:
+        usecols (List of String): The columns of the processed motif data
+    """
+    if usecols is None:
+        return None
+
+    # Both agi come from the boundary column
+    wanted = set(usecols)
+    if wanted & {'agi1', 'agi2'}:
+        wanted.add('gene ids')
+    return [column for column in MOTIF_COLUMNS if column in wanted]
+
+
+def process_motif_data(motif_file):
+    """ (DataFrame) -> DataFrame
+
+    Return the motif data read from a motif data file, with the agi-agi
+    boundary split into two agi columns.
+
+    Args:
+        motif_file (DataFrame): The motif data as read from the file, with
+            the columns named as in MOTIF_COLUMNS
+    """
+    if 'gene ids' in motif_file.columns:
+        # Split the agi-agi boundary of the motif into two agi at once
+        boundaries = motif_file.pop('gene ids').astype(str)
+        agis = boundaries.str.partition('-')
+        # Boundaries without a separator have no agi
+        has_separator = agis[1] == '-'
+        motif_file['agi1'] = agis[0].where(has_separator)
+        motif_file['agi2'] = agis[2].where(has_separator)
     return motif_file
 
 
+def make_gene_index(agis):
+    """ (ndarray) -> AgiIndex
+
+    Return an AgiIndex of gene agis, which joins by integer agi code, or a
+    pandas Index if some gene ids are not agis.
+
+    Args:
+        agis (ndarray): The gene agis, as strings or codes
+    """
+    try:
+        return AgiIndex(agis)
+    except ValueError:
+        return pd.Index(agis)
+
+
+def build_gene_table(indexed_gff):
+    """ (DataFrame) -> DataFrame
+
+    Return a DataFrame indexed by gene id with one row per gene, holding the
+    shortest isoform of each gene. Ties are broken by the first isoform in
+    the gff, matching get_smallest_isoform.
+
+    Args:
+        indexed_gff (DataFrame): The gff DataFrame indexed by gene id
+    """
+    gff = indexed_gff.reset_index()
+    # Position of the first shortest isoform of every gene
+    lengths = gff['geneend'] - gff['genestart']
+    shortest = lengths.groupby(gff['geneid'], sort=False).idxmin()
+
+    return gff.loc[shortest.values].set_index('geneid')
+
+
+def predict_pairs(motif_data, gene_table, window=3000, gene_index=None,
+                  stats=None):
+    """ (DataFrame, DataFrame, int, AgiIndex, PredictorStats) -> Tuple
+
+    Return the motifs and genes of all binary pairs predicted for the motif
+    data, in the order the loop engine would find them. Pairs may repeat.
+
+    Args:
+        motif_data (DataFrame): The motif DataFrame from open_motif_file
+        gene_table (DataFrame): The one row per gene DataFrame from
+            open_gff_file
+        window (Int): The largest distance from motif to gene start
+        gene_index (AgiIndex): The index of the gene table from
+            make_gene_index, made here if None
+        stats (PredictorStats): Records the lookup and rule timings and
+            row counters, if given
+    Return:
+        An ndarray of motif ids, and an ndarray of gene agis
+    """
+    motifs, genes, distances = predict_pair_distances(motif_data, gene_table,
+                                                      window, gene_index,
+                                                      stats)
+    return motifs, genes
+
+
+def predict_pair_distances(motif_data, gene_table, window=3000,
+                           gene_index=None, stats=None):
+    """ (DataFrame, DataFrame, int, AgiIndex, PredictorStats) -> Tuple
+
+    Return the motifs, genes and distances of all binary pairs predicted for
+    the motif data, in the order the loop engine would find them. Pairs may
+    repeat.
+
+    Args:
+        motif_data (DataFrame): The motif DataFrame from open_motif_file
+        gene_table (DataFrame): The one row per gene DataFrame from
+            open_gff_file
+        window (Int): The largest distance from motif to gene start
+        gene_index (AgiIndex): The index of the gene table from
+            make_gene_index, made here if None
+        stats (PredictorStats): Records the lookup and rule timings and
+            row counters, if given
+    Return:
+        An ndarray of motif ids, an ndarray of gene agis, and an ndarray of
+        the distances from motif end to gene start
+    """
+    if gene_index is None:
+        gene_index = make_gene_index(gene_table.index)
+    motif_rows, gene_rows, distances = predict_row_distances(
+        gene_index, strand_codes(gene_table['strand'].values),
+        gene_table['genestart'].values, motif_data['agi1'].values,
+        motif_data['agi2'].values, motif_data['motifend'].values, window,
+        stats)
+
+    return (motif_data['motifid'].values[motif_rows],
+            gene_table.index.values[gene_rows], distances)
+
+
+def predict_pair_rows(gene_index, gene_strands, gene_starts, agi_1, agi_2,
+                      motif_ends, window=3000, stats=None):
+    """ (Index, ndarray, ndarray, ndarray, ndarray, ndarray, int,
+    PredictorStats) -> Tuple
+
+    Return the motif row and gene row of all binary pairs predicted for
+    motifs with the given boundary genes, in the order the loop engine would
+    find them.
+
+    Args:
+        gene_index (AgiIndex): The index of the genes, from make_gene_index
+        gene_strands (ndarray): The strand code of each gene
+        gene_starts (ndarray): The starting index of each gene
+        agi_1 (ndarray): The agi of gene 1 of each motif
+        agi_2 (ndarray): The agi of gene 2 of each motif
+        motif_ends (ndarray): The ending index of each motif
+        window (Int): The largest distance from motif to gene start
+        stats (PredictorStats): Records the lookup and rule timings and
+            row counters, if given
+    Return:
+        An ndarray of motif rows, and an ndarray of gene rows
+    """
+    motif_rows, gene_rows, distances = predict_row_distances(
+        gene_index, gene_strands, gene_starts, agi_1, agi_2, motif_ends,
+        window, stats)
+    return motif_rows, gene_rows
+
+
+def predict_row_distances(gene_index, gene_strands, gene_starts, agi_1,
+                          agi_2, motif_ends, window=3000, stats=None):
+    """ (Index, ndarray, ndarray, ndarray, ndarray, ndarray, int,
+    PredictorStats) -> Tuple
+
+    Return the motif row, gene row and distance of all binary pairs
+    predicted for motifs with the given boundary genes, in the order the
+    loop engine would find them. The distance from motif to gene is worked
+    out once, so callers can narrow the result down to smaller windows.
+
+    Args:
+        gene_index (AgiIndex): The index of the genes, from make_gene_index
+        gene_strands (ndarray): The strand code of each gene
+        gene_starts (ndarray): The starting index of each gene
+        agi_1 (ndarray): The agi of gene 1 of each motif
+        agi_2 (ndarray): The agi of gene 2 of each motif
+        motif_ends (ndarray): The ending index of each motif
+        window (Int): The largest distance from motif to gene start
+        stats (PredictorStats): Records the lookup and rule timings and
+            row counters, if given
+    Return:
+        An ndarray of motif rows, an ndarray of gene rows, and an ndarray of
+        distances from motif end to gene start
+    """
+    if stats is not None:
+        start = time.perf_counter()
+
+    # Join both boundary genes against the gene table
+    gene_1_rows = gene_index.get_indexer(agi_1)
+    gene_2_rows = gene_index.get_indexer(agi_2)
+    # Rows with a gene missing from the gff are skipped
+    motif_rows = np.flatnonzero((gene_1_rows >= 0) & (gene_2_rows >= 0))
+    if stats is not None:
+        for agis, gene_rows in [(agi_1, gene_1_rows), (agi_2, gene_2_rows)]:
+            missing = np.flatnonzero(gene_rows < 0)[:MISSING_EXAMPLES]
+            stats.add_missing(np.asarray(agis)[missing].tolist())
+    gene_1_rows = gene_1_rows[motif_rows]
+    gene_2_rows = gene_2_rows[motif_rows]
+
+    strand_1 = gene_strands[gene_1_rows]
+    strand_2 = gene_strands[gene_2_rows]
+    if stats is not None:
+        looked_up = time.perf_counter()
+        stats.add_time("lookup", looked_up - start)
+        same = np.count_nonzero(strand_1 == strand_2)
+        stats.count("rows", len(agi_1))
+        stats.count("skipped_missing_gene", len(agi_1) - len(motif_rows))
+        stats.count("same_strand", same)
+        stats.count("opposite_strand", len(motif_rows) - same)
+
+    starts = np.asarray(gene_starts, dtype=np.int64)
+    distance_1, distance_2 = upstream_distances(
+        strand_1, strand_2, starts[gene_1_rows], starts[gene_2_rows],
+        np.asarray(motif_ends, dtype=np.int64)[motif_rows])
+
+    # Interleave gene 1 and gene 2 of every row to keep the loop order
+    motif_rows = interleave(motif_rows, motif_rows)
+    gene_rows = interleave(gene_1_rows, gene_2_rows)
+    distances = interleave(distance_1, distance_2)
+    keep = (distances > 0) & (distances <= window)
+
+    if stats is not None:
+        stats.add_time("rules", time.perf_counter() - looked_up)
+    return motif_rows[keep], gene_rows[keep], distances[keep]
+
+
+def predict_pair_range(data_dir, start, stop, window=3000,
+                       instrumented=False):
+    """ (String, int, int, int, boolean) -> Tuple of (ndarray, int,
+    PredictorStats)
+
+    Return the binary pairs predicted for motif rows start to stop, reading
+    the gene index and motif data from the npy files written by
+    BinaryPairPredictor.execute_parallel. The files are memory-mapped, so
+    worker processes share them instead of copying them.
+
+    Each pair is returned as the integer key motif code * gene count + gene
+    row, and only the first occurrence of each pair is kept, so the parent
+    merges small integer arrays rather than strings.
+
+    Args:
+        data_dir (String): The directory holding the npy files
+        start (Int): The first motif row to predict for
+        stop (Int): The motif row to stop before
+        window (Int): The largest distance from motif to gene start
+        instrumented (boolean): Whether to count the rows of the range
+    Return:
+        An int64 ndarray of the keys of the distinct pairs, in the order
+        they were first found, the number of pairs before removing
+        duplicates, and the row counters and missing genes of the range
+        in a PredictorStats, or None if not instrumented
+    """
+    arrays = {}
+    for name in ['geneid', 'genestart', 'strand', 'motifcode', 'agi1',
+                 'agi2', 'motifend']:
+        arrays[name] = np.load(os.path.join(data_dir, name + ".npy"),
+                               mmap_mode='r')
+
+    # The gene index encodes the boundary genes when joining by code
+    stats = PredictorStats() if instrumented else None
+    motif_rows, gene_rows = predict_pair_rows(
+        make_gene_index(arrays['geneid']), arrays['strand'],
+        arrays['genestart'], arrays['agi1'][start:stop],
+        arrays['agi2'][start:stop], arrays['motifend'][start:stop], window,
+        stats)
+
+    keys = (arrays['motifcode'][start:stop][motif_rows] *
+            len(arrays['geneid']) + gene_rows)
+    return keys[first_occurrences(keys)], len(keys), stats
+
+
+def upstream_distances(strand_1, strand_2, start_1, start_2, motif_end):
+    """ (ndarray, ndarray, ndarray, ndarray, ndarray) -> Tuple
+
+    Return two ndarrays of the distance from the motif end upstream to the
+    start of gene 1 and of gene 2, in the direction of each gene's strand.
+    Distances are 0 or less where the motif can not pair with the gene.
+
+    Args:
+        strand_1 (ndarray): The strand codes of gene 1, from strand_codes
+        strand_2 (ndarray): The strand codes of gene 2, from strand_codes
+        start_1 (ndarray): The starting indexes of gene 1
+        start_2 (ndarray): The starting indexes of gene 2
+        motif_end (ndarray): The ending indexes of the motifs
+    Return:
+        A tuple of the distance ndarrays for gene 1 and gene 2
+    """
+    # Both strands must be known for either gene to be considered
+    valid = (strand_1 != 0) & (strand_2 != 0)
+    # Distance upstream of the gene start, in the direction of the strand
+    distance_1 = np.where(valid, strand_1 * (start_1 - motif_end), 0)
+    distance_2 = np.where(valid, strand_2 * (start_2 - motif_end), 0)
+    return distance_1, distance_2
+
+
+def evaluate_rules(strand_1, strand_2, start_1, start_2, motif_end,
+                   window=3000):
+    """ (ndarray, ndarray, ndarray, ndarray, ndarray, int) -> Tuple
+
+    Return two boolean ndarrays marking whether the motif pairs with gene 1
+    and with gene 2. This is the vectorized form of process_same and
+    process_diff: a gene pairs with a motif which ends upstream of its start,
+    within window bases, as long as both genes have a + or - strand.
+
+    Args:
+        strand_1 (ndarray): The strand codes of gene 1, from strand_codes
+        strand_2 (ndarray): The strand codes of gene 2, from strand_codes
+        start_1 (ndarray): The starting indexes of gene 1
+        start_2 (ndarray): The starting indexes of gene 2
+        motif_end (ndarray): The ending indexes of the motifs
+        window (Int): The largest distance from motif to gene start
+    Return:
+        A tuple of the boolean ndarrays for gene 1 and gene 2
+    """
+    distance_1, distance_2 = upstream_distances(strand_1, strand_2, start_1,
+                                                start_2, motif_end)
+    keep_1 = (distance_1 > 0) & (distance_1 <= window)
+    keep_2 = (distance_2 > 0) & (distance_2 <= window)
+    return keep_1, keep_2
+
+
 def get_smallest_isoform(gene_data_frame):
     """ (DataFrame) -> ndarray
 
@@ -279,5 +1298,4 @@ def get_smallest_isoform(gene_data_frame):
 if __name__ == "__main__":
     bpp = BinaryPairPredictor("gff.csv", "weirauch_2.csv")
     bpp.execute()
-    open("output_data.csv.txt", "w").write("\n".join(("\t".join(item)) for
-                                                     item in bpp.binary_pairs))
\ No newline at end of file
+    ExcelParser.write_rows("output_data.csv.txt", bpp.binary_pairs)
\ No newline at end of file
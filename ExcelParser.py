@@ -1,26 +1,69 @@
 __author__ = 'Ruian'
 
+import gzip
+import zipfile
+from itertools import islice
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+# Characters read from a file at a time by the fast readers
+BLOCK_SIZE = 1 << 22
+
+# Bytes of workbook XML parsed at a time
+XML_BLOCK_SIZE = 1 << 16
+
+# Rows joined per write by the bulk writers
+BLOCK_ROWS = 100000
+
+# Compression level of gzipped output, trading a little size for speed
+GZIP_LEVEL = 6
+
+# Output formats written through pandas
+COLUMNAR_FORMATS = ["parquet", "feather"]
+
+# Tags and attributes of .xlsx workbook parts, as named by ElementTree
+MAIN_NAMESPACE = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+SHEET_TAG = "{" + MAIN_NAMESPACE + "}sheet"
+RELATIONSHIP_ID = ("{http://schemas.openxmlformats.org/officeDocument/2006/"
+                   "relationships}id")
+
+# Elements of .xlsx sheet parts, as named by expat
+ROW_NAME = MAIN_NAMESPACE + " row"
+CELL_NAME = MAIN_NAMESPACE + " c"
+VALUE_NAME = MAIN_NAMESPACE + " v"
+TEXT_NAME = MAIN_NAMESPACE + " t"
+PHONETIC_NAME = MAIN_NAMESPACE + " rPh"
+STRING_ITEM_NAME = MAIN_NAMESPACE + " si"
+
 
 class ExcelParser:
     """
-    Parses Excel files, which have been converted into a tabs delimited format.
+    Parses Excel files, which have been converted into a tabs delimited format,
+    or are .xlsx workbooks.
 
     Attributes:
-        excel_file_name (String): The name of the tabs delimited file
+        excel_file_name (String): The name of the tabs delimited file, or
+            of the .xlsx workbook
+        sheet (String or Int): The name or position of the workbook sheet to
+            read, the first sheet if None.
 
     """
 
-    def __init__(self, excel_file_name):
+    def __init__(self, excel_file_name, sheet=None):
         """ (ExcelParser) -> None
 
         Initialize excel parser object with the target file, and target
         columns.
 
         Args:
-            excel_file_name (String): The name of the tabs delimited file
+            excel_file_name (String): The name of the tabs delimited file, or
+                of the .xlsx workbook
+            sheet (String or Int): The name or position of the workbook
+                sheet to read, the first sheet if None.
         """
 
         self.excel_file_name = excel_file_name
+        self.sheet = sheet
 
     def scrape_columns(self, target_columns, header=0):
         """ (ExcelParser) -> List of List of String
@@ -35,6 +78,10 @@ class ExcelParser:
             The list of list of string
         """
 
+        # Workbooks are streamed from their sheet instead
+        if is_xlsx(self.excel_file_name):
+            return self.scrape_columns_fast(target_columns, header)
+
         # Open tabs delimited file
         excel_file = open(self.excel_file_name, "r")
         # Skip header
@@ -65,6 +112,363 @@ class ExcelParser:
         excel_file.close()
         return results
 
+    def scrape_columns_fast(self, target_columns, header=0, as_arrays=False):
+        """ (ExcelParser, List of int, int, boolean) -> List
+
+        Return the same list of columns as scrape_columns, reading the file
+        in large blocks and splitting each line only as far as the last
+        target column. Lines with too few columns are skipped, and reported
+        once at the end.
+
+        Args:
+            target_columns (List of int): The target columns to extract
+            header (Int): The amount of lines to skip as part of the header.
+            as_arrays (boolean): Whether to return each column as an ndarray
+                of integers, floats or strings, whichever fits all values.
+        Return:
+            The list of list of string, or of ndarrays
+        """
+        results = populate_list(len(target_columns))
+        for batch in self.iter_column_batches(target_columns, header):
+            for i in range(0, len(target_columns)):
+                results[i].extend(batch[i])
+
+        if as_arrays:
+            return [infer_array(column) for column in results]
+        return results
+
+    def iter_column_batches(self, target_columns, header=0,
+                            batch_rows=100000):
+        """ (ExcelParser, List of int, int, int) -> Iterator of List
+
+        Yield the target columns of the file a batch of rows at a time, each
+        batch in the shape returned by scrape_columns, so that memory use is
+        bounded by the batch size rather than the file size.
+
+        Args:
+            target_columns (List of int): The target columns to extract
+            header (Int): The amount of lines to skip as part of the header.
+            batch_rows (Int): The largest number of rows in a batch
+        """
+        if is_xlsx(self.excel_file_name):
+            for batch in self.iter_xlsx_batches(target_columns, header,
+                                                batch_rows):
+                yield batch
+            return
+
+        # Columns after the last target are left unsplit
+        last_column = max(target_columns)
+        skipped = 0
+        batch = populate_list(len(target_columns))
+
+        with open(self.excel_file_name, "r") as excel_file:
+            # Skip header
+            for num in range(0, header):
+                excel_file.readline()
+
+            remainder = ""
+            block = excel_file.read(BLOCK_SIZE)
+            while block:
+                lines = (remainder + block).split("\n")
+                # The last line may continue in the next block
+                remainder = lines.pop()
+                block = excel_file.read(BLOCK_SIZE)
+                if not block and remainder:
+                    lines.append(remainder)
+
+                # Each value goes straight to its column, so split lines
+                # are not kept
+                appends = list(zip(target_columns,
+                                   [column.append for column in batch]))
+                for line in lines:
+                    matches = line.rstrip().split("\t", last_column + 1)
+                    if len(matches) > last_column:
+                        for target, append in appends:
+                            append(matches[target])
+                    else:
+                        skipped += 1
+
+                while len(batch[0]) >= batch_rows:
+                    yield [column[:batch_rows] for column in batch]
+                    batch = [column[batch_rows:] for column in batch]
+
+        if batch[0]:
+            yield batch
+        if skipped:
+            print("Exception: Target_column exceeds number of matched "
+                  "columns in " + str(skipped) + " rows")
+
+    def iter_xlsx_batches(self, target_columns, header=0,
+                          batch_rows=100000):
+        """ (ExcelParser, List of int, int, int) -> Iterator of List
+
+        Yield the target columns of the workbook sheet a batch of rows at a
+        time, in the shape returned by scrape_columns.
+
+        Args:
+            target_columns (List of int): The target columns to extract
+            header (Int): The amount of sheet rows to skip as part of the
+                header.
+            batch_rows (Int): The largest number of rows in a batch
+        """
+        batch = populate_list(len(target_columns))
+        appends = [column.append for column in batch]
+        for row in iter_xlsx_rows(self.excel_file_name, target_columns,
+                                  self.sheet, header):
+            for i in range(0, len(row)):
+                appends[i](row[i])
+
+            if len(batch[0]) >= batch_rows:
+                yield batch
+                batch = populate_list(len(target_columns))
+                appends = [column.append for column in batch]
+
+        if batch[0]:
+            yield batch
+
+
+def is_xlsx(file_name):
+    """ (String) -> boolean
+
+    Return whether a file is an .xlsx workbook rather than tabs delimited
+    text, going by its extension.
+
+    Args:
+        file_name (String): The name of the file
+    """
+    return file_name.lower().endswith((".xlsx", ".xlsm"))
+
+
+def iter_xlsx_rows(file_name, target_columns, sheet=None, header=0):
+    """ (String, List of int, String or Int, Int) -> Iterator of List
+
+    Yield the values of the target columns of each row in a sheet of an
+    .xlsx workbook, as the strings stored in the sheet. The sheet is parsed
+    a block at a time without building a tree, and other columns are
+    dropped as they are read, so memory use does not grow with the number
+    of rows. Missing cells are empty strings, and rows without a cell in
+    any target column are not yielded, as lines too short for the target
+    columns are skipped in tabs delimited files.
+
+    Args:
+        file_name (String): The name of the workbook
+        target_columns (List of int): The target columns to extract
+        sheet (String or Int): The name or position of the sheet, the first
+            sheet if None.
+        header (Int): The amount of sheet rows to skip as part of the header.
+    """
+    # Positions of each target column in the yielded rows
+    positions = {}
+    for i in range(0, len(target_columns)):
+        positions.setdefault(target_columns[i], []).append(i)
+
+    with zipfile.ZipFile(file_name) as workbook:
+        sheet_path = find_sheet_path(workbook, sheet)
+        shared_strings = read_shared_strings(workbook)
+
+        # Parser state, shared by the handlers below
+        rows = []
+        row = None
+        # Whether the current row has a cell in a target column
+        row_found = False
+        row_number = 0
+        column = -1
+        targets = None
+        cell_type = None
+        parts = []
+        collecting = False
+        phonetic = False
+
+        def start_element(name, attributes):
+            nonlocal row, row_found, row_number, column, targets, cell_type
+            nonlocal parts, collecting, phonetic
+            if name == CELL_NAME:
+                # Cells without a reference follow the previous cell
+                if "r" in attributes:
+                    column = column_index(attributes["r"])
+                else:
+                    column += 1
+                if row is not None:
+                    targets = positions.get(column)
+                    if targets is not None:
+                        row_found = True
+                    cell_type = attributes.get("t")
+                    parts = []
+            elif name == ROW_NAME:
+                # Rows without a reference follow the previous row
+                row_number = int(attributes.get("r", row_number + 1))
+                column = -1
+                row = None
+                row_found = False
+                if row_number > header:
+                    row = [""] * len(target_columns)
+            elif targets is not None:
+                if name == VALUE_NAME or (name == TEXT_NAME and
+                                          not phonetic):
+                    collecting = True
+                elif name == PHONETIC_NAME:
+                    phonetic = True
+
+        def end_element(name):
+            nonlocal targets, collecting, phonetic
+            if name == CELL_NAME:
+                if targets is not None:
+                    value = "".join(parts)
+                    if cell_type == "s":
+                        value = shared_strings[int(value)]
+                    for i in targets:
+                        row[i] = value
+                    targets = None
+            elif name == ROW_NAME:
+                if row is not None and row_found:
+                    rows.append(row)
+            elif name == PHONETIC_NAME:
+                phonetic = False
+            else:
+                collecting = False
+
+        def character_data(data):
+            if collecting:
+                parts.append(data)
+
+        parser = make_xml_parser(start_element, end_element, character_data)
+        with workbook.open(sheet_path) as sheet_file:
+            # Yield the rows completed by each block
+            block = sheet_file.read(XML_BLOCK_SIZE)
+            while block:
+                parser.Parse(block, False)
+                for completed in rows:
+                    yield completed
+                del rows[:]
+                block = sheet_file.read(XML_BLOCK_SIZE)
+            parser.Parse(b"", True)
+            for completed in rows:
+                yield completed
+
+
+def find_sheet_path(workbook, sheet=None):
+    """ (ZipFile, String or Int) -> String
+
+    Return the path within an .xlsx workbook of the sheet with the given
+    name or position.
+
+    Args:
+        workbook (ZipFile): The opened workbook
+        sheet (String or Int): The name or position of the sheet, the first
+            sheet if None.
+    """
+    # Sheets in workbook order, with the relationship id of their part
+    sheets = []
+    with workbook.open("xl/workbook.xml") as workbook_file:
+        for event, element in ElementTree.iterparse(workbook_file):
+            if element.tag == SHEET_TAG:
+                sheets.append((element.get("name"),
+                               element.get(RELATIONSHIP_ID)))
+
+    if sheet is None:
+        sheet = 0
+    if isinstance(sheet, int):
+        if not 0 <= sheet < len(sheets):
+            raise ValueError("Workbook has no sheet " + str(sheet))
+        relationship = sheets[sheet][1]
+    else:
+        relationships = dict(sheets)
+        if sheet not in relationships:
+            raise ValueError("Workbook has no sheet named " + sheet)
+        relationship = relationships[sheet]
+
+    # Targets are relative to the xl folder unless absolute
+    with workbook.open("xl/_rels/workbook.xml.rels") as relationship_file:
+        for event, element in ElementTree.iterparse(relationship_file):
+            if element.get("Id") == relationship:
+                target = element.get("Target")
+                if target.startswith("/"):
+                    return target[1:]
+                return "xl/" + target
+    raise ValueError("Workbook has no part for sheet " + str(sheet))
+
+
+def read_shared_strings(workbook):
+    """ (ZipFile) -> List of String
+
+    Return the shared strings of an .xlsx workbook, which cells of string
+    type refer to by position. The text of formatted runs is joined, and
+    phonetic hints are left out.
+
+    Args:
+        workbook (ZipFile): The opened workbook
+    """
+    shared_strings = []
+    if "xl/sharedStrings.xml" not in workbook.namelist():
+        return shared_strings
+
+    # Parser state, shared by the handlers below
+    parts = []
+    collecting = False
+    phonetic = False
+
+    def start_element(name, attributes):
+        nonlocal collecting, phonetic
+        if name == TEXT_NAME and not phonetic:
+            collecting = True
+        elif name == PHONETIC_NAME:
+            phonetic = True
+
+    def end_element(name):
+        nonlocal collecting, phonetic
+        if name == STRING_ITEM_NAME:
+            shared_strings.append("".join(parts))
+            del parts[:]
+        elif name == PHONETIC_NAME:
+            phonetic = False
+        collecting = False
+
+    def character_data(data):
+        if collecting:
+            parts.append(data)
+
+    parser = make_xml_parser(start_element, end_element, character_data)
+    with workbook.open("xl/sharedStrings.xml") as strings_file:
+        parser.ParseFile(strings_file)
+    return shared_strings
+
+
+def make_xml_parser(start_element, end_element, character_data):
+    """ (Function, Function, Function) -> xmlparser
+
+    Return an expat parser calling the given handlers, which gets element
+    names as the namespace and local name separated by a space.
+
+    Args:
+        start_element (Function): Called with the name and attributes of
+            each element as it opens.
+        end_element (Function): Called with the name of each element as it
+            closes.
+        character_data (Function): Called with the text in elements.
+    """
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.buffer_text = True
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    return parser
+
+
+def column_index(reference):
+    """ (String) -> Int
+
+    Return the zero based column of a cell reference such as "AB12".
+
+    Args:
+        reference (String): The cell reference
+    """
+    index = 0
+    for character in reference:
+        if not character.isalpha():
+            break
+        index = index * 26 + ord(character.upper()) - 64
+    return index - 1
+
 
 def validate_column_number(target_columns, num_matches):
     """ (List of Int) -> boolean
@@ -81,6 +485,26 @@ def validate_column_number(target_columns, num_matches):
     return True
 
 
+def infer_array(values):
+    """ (List of String) -> ndarray
+
+    Return an ndarray of a column's values, as integers if they all are
+    integers, as floats if they all are numbers, and as strings otherwise.
+
+    Args:
+        values (List of String): The values of the column
+    """
+    # Imported here so that numpy is only needed for array results
+    import numpy as np
+
+    for dtype in [np.int64, np.float64]:
+        try:
+            return np.array(values, dtype=dtype)
+        except ValueError:
+            continue
+    return np.array(values, dtype=str)
+
+
 def write_to_file(output_file_name, parsing_result):
     """ (String, List of List of String) -> None
 
@@ -92,22 +516,129 @@ def write_to_file(output_file_name, parsing_result):
         parsing_result (List of List of String): The result from this
             classes parsing methods to be written to a file.
     """
-    # Open file for writing
-    output_file = open(output_file_name, "w")
-
     # Check if parsing result is valid
     if validate_result(parsing_result):
         # Write to file in tabs delimited
-        for i in range(0, len(parsing_result[0])):
-            output_line = parsing_result[0][i]
-            for j in range(1, len(parsing_result)):
-                output_line += ("\t" + parsing_result[j][i])
-            output_file.write(output_line + "\n")
+        write_columns(output_file_name, parsing_result, file_format="tsv")
 
     else:
         print("Parsing results may contain errors. Check again.")
 
 
+def write_columns(output_file_name, columns, column_names=None,
+                  file_format=None, block_rows=BLOCK_ROWS):
+    """ (String, List of List, List of String, String, Int) -> Int
+
+    Write a file with the given columns and return the number of rows
+    written. Tabs delimited output is written a block of rows at a time.
+
+    Args:
+        output_file_name (String): The name of the file to write to.
+        columns (List of List): The values of each column, such as the
+            result of this classes parsing methods, or ndarrays.
+        column_names (List of String): The names of the columns, written as
+            a header line. Columnar formats name columns "column0", ...
+            when none are given.
+        file_format (String): One of "tsv", "tsv.gz", "parquet" or
+            "feather". Inferred from the file extension when None.
+        block_rows (Int): The number of rows joined per write.
+    Return:
+        The number of rows written
+    """
+    file_format = file_format or infer_format(output_file_name)
+
+    # Columnar formats are written by pandas, which needs pyarrow for them
+    if file_format in COLUMNAR_FORMATS:
+        import pandas as pd
+
+        if column_names is None:
+            column_names = ["column" + str(i) for i in range(len(columns))]
+        frame = pd.DataFrame(dict(zip(column_names, columns)),
+                             columns=column_names)
+        if file_format == "parquet":
+            frame.to_parquet(output_file_name, index=False)
+        else:
+            frame.to_feather(output_file_name)
+        return len(frame)
+
+    return write_rows(output_file_name, zip(*columns), column_names,
+                      file_format, block_rows)
+
+
+def write_rows(output_file_name, rows, column_names=None, file_format=None,
+               block_rows=BLOCK_ROWS):
+    """ (String, Iterable of Tuple, List of String, String, Int) -> Int
+
+    Write a file with the given rows and return the number of rows written.
+    Takes the same formats as write_columns, which is useful for results
+    held row by row such as binary pairs.
+
+    Args:
+        output_file_name (String): The name of the file to write to.
+        rows (Iterable of Tuple): The values of each row.
+        column_names (List of String): The names of the columns, written as
+            a header line.
+        file_format (String): One of "tsv", "tsv.gz", "parquet" or
+            "feather". Inferred from the file extension when None.
+        block_rows (Int): The number of rows joined per write.
+    Return:
+        The number of rows written
+    """
+    file_format = file_format or infer_format(output_file_name)
+
+    # Columnar formats need the values column by column
+    if file_format in COLUMNAR_FORMATS:
+        rows = list(rows)
+        if rows:
+            columns = [list(column) for column in zip(*rows)]
+        else:
+            columns = [[] for name in column_names or []]
+        return write_columns(output_file_name, columns, column_names,
+                             file_format)
+
+    if file_format == "tsv.gz":
+        output_file = gzip.open(output_file_name, "wt",
+                                compresslevel=GZIP_LEVEL)
+    elif file_format == "tsv":
+        output_file = open(output_file_name, "w")
+    else:
+        raise ValueError("Unknown output format: " + str(file_format))
+
+    count = 0
+    with output_file:
+        if column_names is not None:
+            output_file.write("\t".join(column_names) + "\n")
+
+        # Join and write a block of rows at a time
+        rows = iter(rows)
+        while True:
+            block = ["\t".join(map(str, row))
+                     for row in islice(rows, block_rows)]
+            if not block:
+                break
+            output_file.write("\n".join(block) + "\n")
+            count += len(block)
+    return count
+
+
+def infer_format(output_file_name):
+    """ (String) -> String
+
+    Return the output format matching the extension of a file name,
+    defaulting to tabs delimited text.
+
+    Args:
+        output_file_name (String): The name of the file to write to.
+    """
+    name = output_file_name.lower()
+    if name.endswith(".gz"):
+        return "tsv.gz"
+    for file_format in COLUMNAR_FORMATS:
+        if name.endswith("." + file_format):
+            return file_format
+    return "tsv"
+
+
 def validate_result(parsing_result):
     """ (List of List of String) -> boolean
 
@@ -0,0 +1,98 @@
+import threading
+import time
+import urllib.parse
+from html import escape
+
+from LocalServer import LocalHandler, start_server
+
+
+class FakeBarServer:
+    """
+    The FakeBarServer class serves a local stand-in for the BAR agi
+    converter form, answering posted aliases from a dictionary, so that
+    alias resolution can be run and timed without network access.
+
+    Attributes:
+        agis (Dict): The agi of each alias known to the server
+        latency (Float): The seconds each request is delayed by, to mimic
+            the remote tool
+        requests (Int): The number of requests answered
+        server (ThreadingHTTPServer): The running HTTP server
+    """
+
+    def __init__(self, agis, latency=0.0):
+        """ (FakeBarServer, Dict, float) -> None
+
+        Initialize the server with the aliases it knows.
+
+        Args:
+            agis (Dict): The agi of each alias known to the server
+            latency (Float): The seconds each request is delayed by
+        """
+        self.agis = {alias.upper(): agi for alias, agi in agis.items()}
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def url(self):
+        """ (FakeBarServer) -> String
+
+        Return the url of the converter form on the running server.
+        """
+        host, port = self.server.server_address[:2]
+        return "http://%s:%d/ntools_agi_converter.cgi" % (host, port)
+
+    def start(self):
+        """ (FakeBarServer) -> FakeBarServer
+
+        Start serving on a free localhost port, in a background thread.
+        """
+        fake = self
+
+        class Handler(LocalHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                fields = urllib.parse.parse_qs(
+                    self.rfile.read(length).decode())
+                aliases = fields.get("input", [""])[0].split("\n")
+                body = fake.result_page(aliases).encode()
+                # Requests are answered on several threads at once
+                with fake.lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                self.send_body(200, "text/html", body)
+
+        self.server = start_server(Handler)
+        return self
+
+    def stop(self):
+        """ (FakeBarServer) -> None
+
+        Stop the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def result_page(self, aliases):
+        """ (FakeBarServer, List of String) -> String
+
+        Return a result page like the converter's, with a row for each
+        alias it knows.
+
+        Args:
+            aliases (List of String): The aliases posted
+        """
+        rows = ["<tr><td>%s</td><td>%s</td></tr>" % (
+            escape(alias), escape(self.agis[alias.strip().upper()]))
+            for alias in aliases if alias.strip().upper() in self.agis]
+        return ("<html><body><table id='table_id'><thead><tr><th>Alias</th>"
+                "<th>AGI</th></tr></thead><tbody>" + "".join(rows) +
+                "</tbody></table></body></html>")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
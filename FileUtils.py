@@ -0,0 +1,56 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def hash_file(file_name):
+    """ (String) -> String
+
+    Return the hex sha1 digest of the contents of a file.
+
+    Args:
+        file_name (String): The name of the file to hash
+    """
+    digest = hashlib.sha1()
+    with open(file_name, "rb") as hashed_file:
+        for block in iter(lambda: hashed_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_write(file_name):
+    """ (String) -> Iterator of File
+
+    Open a binary file to write in place of a file, which replaces it only
+    once it has been written in full. Readers see either the old file or
+    the new one, never a partial file.
+
+    The file is written under a temporary name of its own in the same
+    directory, so that concurrent writers do not clash, and is removed if
+    writing fails.
+
+    Args:
+        file_name (String): The name of the file to write
+    Raises:
+        OSError: If the file can not be written
+    """
+    directory = os.path.dirname(file_name) or "."
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_file = tempfile.mkstemp(
+        prefix=os.path.basename(file_name) + ".", suffix=".tmp",
+        dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as written_file:
+            yield written_file
+        os.replace(temp_file, file_name)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+if __name__ == "__main__":
+    file_name = input("Select file to hash:\n")
+    print(hash_file(file_name))
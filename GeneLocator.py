@@ -0,0 +1,129 @@
+import numpy as np
+
+from AgiCodec import strand_codes
+
+
+class GeneLocator:
+    """
+    GeneLocator finds the genes which a motif could regulate from the
+    motif's chromosome and position alone, using the start positions of the
+    genes of each chromosome sorted into an array.
+
+    Attributes:
+        chromosomes (Dict): For each chromosome name, a tuple of the sorted
+            gene starts, their strand codes and their agis as ndarrays.
+    """
+
+    def __init__(self, indexed_gff):
+        """ (GeneLocator, DataFrame) -> None
+
+        Initialize the gene locator by sorting the genes of each chromosome
+        by their start position.
+
+        Args:
+            indexed_gff (DataFrame): The one row per gene DataFrame from
+                BinaryPairPredictor.open_gff_file
+        """
+        chromosomes = normalize_chromosomes(indexed_gff['chromonumb'].values)
+        starts = indexed_gff['genestart'].values.astype(np.int64)
+        codes = strand_codes(np.asarray(indexed_gff['strand']))
+        genes = np.asarray(indexed_gff.index, dtype=object)
+
+        self.chromosomes = {}
+        for chromosome in np.unique(chromosomes):
+            rows = np.flatnonzero(chromosomes == chromosome)
+            rows = rows[np.argsort(starts[rows], kind='stable')]
+            self.chromosomes[chromosome] = (starts[rows], codes[rows],
+                                            genes[rows])
+
+    def find_genes(self, chromosome, motif_end, window=3000):
+        """ (GeneLocator, String, int, int) -> List of String
+
+        Return the agis of all genes on a chromosome which start within
+        window bases downstream of a motif, in the direction of their strand.
+
+        Args:
+            chromosome (String): The chromosome of the motif
+            motif_end (Int): The ending index of the motif
+            window (Int): The largest distance from motif to gene start
+        """
+        hits, genes = self.find_pairs([chromosome], [motif_end], window)
+        return genes.tolist()
+
+    def find_pairs(self, chromosomes, motif_ends, window=3000):
+        """ (GeneLocator, List of String, List of int, int) -> Tuple
+
+        Return every pairing of a motif hit with a gene which starts within
+        window bases downstream of the hit, in the direction of the gene's
+        strand. Each hit takes a binary search per chromosome, rather than a
+        scan of all genes.
+
+        Args:
+            chromosomes (List of String): The chromosome of each motif hit
+            motif_ends (List of int): The ending index of each motif hit
+            window (Int): The largest distance from motif to gene start
+        Return:
+            An ndarray of the positions of the hits, and an ndarray of the
+            agis they pair with, ordered by hit and then gene start.
+        """
+        chromosomes = normalize_chromosomes(np.asarray(chromosomes))
+        motif_ends = np.asarray(motif_ends, dtype=np.int64)
+
+        all_hits = []
+        all_genes = []
+        for chromosome, (starts, codes, genes) in self.chromosomes.items():
+            hits = np.flatnonzero(chromosomes == chromosome)
+            if len(hits) == 0:
+                continue
+            ends = motif_ends[hits]
+            # Genes starting within the window on either side of each hit
+            low = np.searchsorted(starts, ends - window, side='left')
+            high = np.searchsorted(starts, ends + window, side='right')
+            hit_rows, gene_rows = expand_ranges(low, high)
+
+            distance = codes[gene_rows] * (starts[gene_rows] - ends[hit_rows])
+            keep = (distance > 0) & (distance <= window)
+            all_hits.append(hits[hit_rows[keep]])
+            all_genes.append(genes[gene_rows[keep]])
+
+        if not all_hits:
+            return np.array([], dtype=np.int64), np.array([], dtype=object)
+        hits = np.concatenate(all_hits)
+        genes = np.concatenate(all_genes)
+        # Chromosomes were searched one at a time, so restore the hit order
+        order = np.argsort(hits, kind='stable')
+        return hits[order], genes[order]
+
+
+def expand_ranges(low, high):
+    """ (ndarray, ndarray) -> Tuple of (ndarray, ndarray)
+
+    Return the index of each range, and each position within the ranges
+    [low, high), for all ranges at once.
+
+    Args:
+        low (ndarray): The first position of each range
+        high (ndarray): The position after the last of each range
+    """
+    counts = high - low
+    range_rows = np.repeat(np.arange(len(low)), counts)
+    # Offset of each position from the start of its own range
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+    return range_rows, np.repeat(low, counts) + offsets
+
+
+def normalize_chromosomes(chromosomes):
+    """ (ndarray) -> ndarray
+
+    Return chromosome names in one form, so that Chr1, chr1 and 1 all
+    become 1, and ChrC becomes C.
+
+    Args:
+        chromosomes (ndarray): The chromosome names to normalize
+    """
+    names = np.char.upper(np.asarray(chromosomes).astype(str))
+    if len(names) == 0:
+        return names
+    has_prefix = np.char.startswith(names, "CHR")
+    return np.where(has_prefix, np.char.replace(names, "CHR", "", 1), names)
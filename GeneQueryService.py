@@ -0,0 +1,405 @@
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+import numpy as np
+
+from AgiCodec import strand_codes
+from BinaryPairPredictor import (make_gene_index, open_gff_file,
+                                 predict_row_distances)
+from GeneLocator import GeneLocator
+from LocalServer import LocalHandler, start_server
+
+# The most recent request latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+# The latency percentiles reported
+PERCENTILES = [50, 90, 99]
+
+# The largest request body accepted, in bytes
+MAX_BODY = 1 << 24
+
+# The largest motif_end or window accepted, as gene starts are int32
+MAX_POSITION = int(np.iinfo(np.int32).max)
+
+
+class GeneQueryService:
+    """
+    The GeneQueryService class loads a gff file once and keeps its gene
+    index in memory, answering which genes a motif would regulate over a
+    local HTTP server, so that interactive questions do not pay for reading
+    and indexing the gff each time.
+
+    A query is a JSON object giving the motif_end of a motif and either:
+
+    - agi1 and agi2, the genes either side of the motif, which are paired
+      with it by the rules of BinaryPairPredictor.process_same and
+      process_diff; or
+    - chromosome, pairing the motif with every gene on the chromosome which
+      starts within the window downstream of it, as by
+      BinaryPairPredictor.execute_by_coordinates.
+
+    An optional motif id is passed back with the answer. The server answers:
+
+    - GET /query?motif_end=...&agi1=...&agi2=... or
+      GET /query?motif_end=...&chromosome=... for a single query;
+    - POST /query with a query, or {"queries": [...], "window": ...} for a
+      batch, which is answered with one vectorized lookup per query type;
+    - GET /stats with the request latency percentiles;
+    - GET /health.
+
+    Attributes:
+        indexed_gff (DataFrame): The one row per gene DataFrame from
+            BinaryPairPredictor.open_gff_file
+        gene_index (AgiIndex): The index of the genes, from make_gene_index
+        gene_strands (ndarray): The strand code of each gene
+        gene_starts (ndarray): The starting index of each gene
+        gene_locator (GeneLocator): The genes sorted by position on each
+            chromosome
+        window (Int): The default largest distance from motif to gene start
+        load_seconds (Float): The seconds taken to load and index the gff
+        latencies (deque): The seconds taken by the most recent requests
+        requests (Int): The number of requests answered
+        server (ThreadingHTTPServer): The running HTTP server
+    """
+
+    def __init__(self, gff_file_name, cache_dir=None, window=3000):
+        """ (GeneQueryService, String, String, int) -> None
+
+        Initialize the service by loading and indexing a gff file.
+
+        Args:
+            gff_file_name (String): The name of the gff file, read by
+                BinaryPairPredictor.open_gff_file
+            cache_dir (String): The directory to cache the gene table in,
+                no cache is used if None
+            window (Int): The default largest distance from motif to gene
+                start
+        """
+        start = time.perf_counter()
+        self.indexed_gff = open_gff_file(gff_file_name, cache_dir)
+        self.gene_index = make_gene_index(self.indexed_gff.index)
+        self.gene_strands = strand_codes(self.indexed_gff['strand'].values)
+        self.gene_starts = self.indexed_gff['genestart'].values.astype(
+            np.int64)
+        self.gene_locator = GeneLocator(self.indexed_gff)
+        self.window = window
+        self.load_seconds = time.perf_counter() - start
+
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def url(self):
+        """ (GeneQueryService) -> String
+
+        Return the base url of the running server.
+        """
+        host, port = self.server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def answer(self, queries, window=None):
+        """ (GeneQueryService, List of Dict, int) -> List of Dict
+
+        Return the answer to each query: the genes the motif pairs with and
+        their distance from the motif, in the order the predictor would find
+        them.
+
+        Args:
+            queries (List of Dict): The queries, as described by the class
+            window (Int): The largest distance from motif to gene start.
+                Defaults to self.window.
+        Raises:
+            ValueError: If a query has neither boundary genes nor a
+                chromosome, or no integer motif_end, or if a motif_end or
+                the window is out of range
+        """
+        if window is None:
+            window = self.window
+        try:
+            window = int(window)
+        except OverflowError:
+            window = -1
+        if not 0 <= window <= MAX_POSITION:
+            raise ValueError("window must be from 0 to %d" % MAX_POSITION)
+
+        answers = [{'genes': [], 'distances': []} for query in queries]
+        boundary = []
+        located = []
+        for i, query in enumerate(queries):
+            if not isinstance(query, dict):
+                raise ValueError("Query %d is not an object" % i)
+            if 'motif' in query:
+                answers[i]['motif'] = query['motif']
+            if 'agi1' in query and 'agi2' in query:
+                boundary.append(i)
+            elif 'chromosome' in query:
+                located.append(i)
+            else:
+                raise ValueError("Query %d needs agi1 and agi2, or a "
+                                 "chromosome" % i)
+
+        # Answer the queries of each type with one lookup
+        if boundary:
+            self.answer_boundaries(queries, boundary, window, answers)
+        if located:
+            self.answer_locations(queries, located, window, answers)
+        return answers
+
+    def answer_boundaries(self, queries, positions, window, answers):
+        """ (GeneQueryService, List of Dict, List of int, int,
+        List of Dict) -> None
+
+        Add the genes paired with each of the queries at the given positions
+        by their boundary genes to their answers.
+
+        Args:
+            queries (List of Dict): All the queries
+            positions (List of int): The positions of the boundary queries
+            window (Int): The largest distance from motif to gene start
+            answers (List of Dict): The answers to add to
+        """
+        agi_1 = np.array([str(queries[i]['agi1']) for i in positions],
+                         dtype=object)
+        agi_2 = np.array([str(queries[i]['agi2']) for i in positions],
+                         dtype=object)
+        motif_ends = motif_end_array(queries, positions)
+
+        motif_rows, gene_rows, distances = predict_row_distances(
+            self.gene_index, self.gene_strands, self.gene_starts, agi_1,
+            agi_2, motif_ends, window)
+        self.add_answers(np.asarray(positions)[motif_rows], gene_rows,
+                         distances, answers)
+
+    def answer_locations(self, queries, positions, window, answers):
+        """ (GeneQueryService, List of Dict, List of int, int,
+        List of Dict) -> None
+
+        Add the genes paired with each of the queries at the given positions
+        by their chromosome to their answers.
+
+        Args:
+            queries (List of Dict): All the queries
+            positions (List of int): The positions of the chromosome queries
+            window (Int): The largest distance from motif to gene start
+            answers (List of Dict): The answers to add to
+        """
+        chromosomes = [str(queries[i]['chromosome']) for i in positions]
+        motif_ends = motif_end_array(queries, positions)
+
+        hits, genes = self.gene_locator.find_pairs(chromosomes, motif_ends,
+                                                   window)
+        gene_rows = self.gene_index.get_indexer(genes)
+        distances = self.gene_strands[gene_rows] * (
+            self.gene_starts[gene_rows] - motif_ends[hits])
+        self.add_answers(np.asarray(positions)[hits], gene_rows, distances,
+                         answers)
+
+    def add_answers(self, positions, gene_rows, distances, answers):
+        """ (GeneQueryService, ndarray, ndarray, ndarray, List of Dict)
+        -> None
+
+        Add each gene and its distance to the answer of its query.
+
+        Args:
+            positions (ndarray): The query position of each pair
+            gene_rows (ndarray): The gene row of each pair
+            distances (ndarray): The distance of each pair
+            answers (List of Dict): The answers to add to
+        """
+        genes = self.indexed_gff.index.values[gene_rows].tolist()
+        for i, gene, distance in zip(positions.tolist(), genes,
+                                     distances.tolist()):
+            answers[i]['genes'].append(gene)
+            answers[i]['distances'].append(distance)
+
+    def record_latency(self, seconds):
+        """ (GeneQueryService, float) -> None
+
+        Record the time taken to answer a request.
+
+        Args:
+            seconds (Float): The seconds taken
+        """
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+
+    def latency_report(self):
+        """ (GeneQueryService) -> Dict
+
+        Return the number of requests answered, and the mean, percentiles
+        and maximum of the latency of the most recent requests in
+        milliseconds.
+        """
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000.0
+            report = {'requests': self.requests,
+                      'load_seconds': self.load_seconds,
+                      'genes': len(self.indexed_gff)}
+        if len(latencies):
+            report['mean_ms'] = float(latencies.mean())
+            for percentile, value in zip(
+                    PERCENTILES, np.percentile(latencies, PERCENTILES)):
+                report['p%d_ms' % percentile] = float(value)
+            report['max_ms'] = float(latencies.max())
+        return report
+
+    def start(self, host="127.0.0.1", port=0):
+        """ (GeneQueryService, String, int) -> GeneQueryService
+
+        Start serving in a background thread.
+
+        Args:
+            host (String): The address to listen on
+            port (Int): The port to listen on, a free port if 0
+        """
+        self.server = start_server(make_handler(self), host, port)
+        return self
+
+    def stop(self):
+        """ (GeneQueryService) -> None
+
+        Stop the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def make_handler(service):
+    """ (GeneQueryService) -> type
+
+    Return a request handler class answering requests from a service.
+
+    Args:
+        service (GeneQueryService): The service to answer from
+    """
+
+    class Handler(LocalHandler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path == "/query":
+                fields = dict(urllib.parse.parse_qsl(url.query))
+                self.respond_query(lambda: service.answer(
+                    [fields], fields.get('window'))[0])
+            elif url.path == "/stats":
+                self.send_json(200, service.latency_report())
+            elif url.path == "/health":
+                self.send_json(200, {'status': 'ok'})
+            else:
+                self.send_json(404, {'error': "Unknown path: " + url.path})
+
+        def do_POST(self):
+            if urllib.parse.urlsplit(self.path).path != "/query":
+                self.send_json(404, {'error': "Unknown path: " + self.path})
+                return
+            # Check the length before reading, since a bad length would
+            # leave the read waiting on the client
+            length = self.headers.get("Content-Length")
+            if length is None:
+                self.send_json(411, {'error': "Content-Length required"})
+                return
+            try:
+                length = int(length)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.send_json(400, {'error': "Invalid Content-Length"})
+                return
+            if length > MAX_BODY:
+                self.send_json(413, {'error': "Request body too large"})
+                return
+            body = self.rfile.read(length)
+            self.respond_query(lambda: answer_body(service, body))
+
+        def respond_query(self, answer):
+            # Time the request from parsing to the answer being sent
+            start = time.perf_counter()
+            try:
+                status, result = 200, answer()
+            except (ValueError, TypeError, KeyError, OverflowError) as error:
+                status, result = 400, {'error': str(error)}
+            self.send_json(status, result)
+            service.record_latency(time.perf_counter() - start)
+
+        def send_json(self, status, result):
+            self.send_body(status, "application/json",
+                           json.dumps(result).encode())
+
+    return Handler
+
+
+def answer_body(service, body):
+    """ (GeneQueryService, bytes) -> Object
+
+    Return the answer to the JSON body of a posted query: a single answer
+    for a single query, or a list of answers under "answers" for a batch.
+
+    Args:
+        service (GeneQueryService): The service to answer from
+        body (bytes): The JSON request body
+    Raises:
+        ValueError: If the body is not a query or a batch of queries
+    """
+    request = json.loads(body.decode() or "null")
+    if not isinstance(request, dict):
+        raise ValueError("The body must be a JSON object")
+    if 'queries' in request:
+        if not isinstance(request['queries'], list):
+            raise ValueError("queries must be a list")
+        return {'answers': service.answer(request['queries'],
+                                          request.get('window'))}
+    return service.answer([request], request.get('window'))[0]
+
+
+def motif_end_array(queries, positions):
+    """ (List of Dict, List of int) -> ndarray
+
+    Return the motif_end of each of the queries at the given positions.
+
+    Args:
+        queries (List of Dict): All the queries
+        positions (List of int): The positions of the queries to read
+    Raises:
+        ValueError: If a query has no integer motif_end, or one out of range
+    """
+    try:
+        motif_ends = [int(queries[i]['motif_end']) for i in positions]
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise ValueError("Every query needs an integer motif_end")
+    # Larger values would overflow the distances to gene starts
+    if any(abs(motif_end) > MAX_POSITION for motif_end in motif_ends):
+        raise ValueError("motif_end must be from -%d to %d" % (
+            MAX_POSITION, MAX_POSITION))
+    return np.array(motif_ends, dtype=np.int64)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Answer motif to gene queries over a hot gene index.")
+    parser.add_argument("gff_file", help="the gff file to index")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--window", type=int, default=3000)
+    args = parser.parse_args()
+
+    service = GeneQueryService(args.gff_file, args.cache_dir, args.window)
+    service.start(args.host, args.port)
+    print("Loaded %d genes in %.2f s, serving on %s" % (
+        len(service.indexed_gff), service.load_seconds, service.url))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        service.stop()
@@ -0,0 +1,172 @@
+import gzip
+import re
+
+import numpy as np
+import pandas as pd
+
+# Bytes read from a gff3 file at a time
+BLOCK_SIZE = 1 << 24
+
+# The features making up the gene table by default, genes cover the genes
+# without transcripts and transcripts give the isoforms of the rest
+FEATURE_TYPES = ("gene", "mRNA")
+
+# A feature line of one of the given types, after the newline ending the
+# line before it. The groups are its chromosome, start, end, strand and
+# attributes, and comment lines never match as the chromosome can not hold
+# a "#". Anchoring on the newline rather than on a line start lets the
+# regex engine skip ahead to each newline
+FEATURE_PATTERN = (rb"\n([^\t\n#]*)\t[^\t\n]*\t(?:%s)\t(\d+)\t(\d+)\t"
+                   rb"[^\t\n]*\t([^\t\n]*)\t[^\t\n]*\t([^\r\n]*)")
+
+
+def is_gff3(file_name):
+    """ (String) -> boolean
+
+    Return whether a file is a gff3 annotation rather than a processed gff
+    table, going by its extension.
+
+    Args:
+        file_name (String): The name of the file
+    """
+    name = file_name.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return name.endswith((".gff", ".gff3"))
+
+
+def read_gff3(file_name, feature_types=FEATURE_TYPES):
+    """ (String, Tuple of String) -> DataFrame
+
+    Return a DataFrame of the features of the given types in a gff3 file,
+    with the columns of a processed gff file: chromonumb, genestart,
+    geneend, strand and geneid. The gene id of a feature is the AGI of the
+    gene it belongs to, taken from its Parent attribute, or from its ID
+    for features without a parent.
+
+    The file is streamed in blocks of whole lines, decompressing it on the
+    way when it is gzipped, and the features of the given types are found
+    in each block by a single compiled regex, so other lines are never
+    split or copied. Coordinates are stored as int32, and chromosomes and
+    strands as categories.
+
+    Reading a gff3 file directly saves writing and keeping a processed gff
+    file, but it is not faster: for 28000 genes (Benchmarks.bench_gff3) it
+    takes 0.34-0.42 s, or 0.35-0.49 s gzipped, against 0.20-0.35 s to
+    preprocess the gff3 into a gff file and read that. Memory use is
+    bounded by BLOCK_SIZE and the features kept, gzipped or not.
+
+    Args:
+        file_name (String): The name of the gff3 file, optionally gzipped
+        feature_types (Tuple of String): The feature types to keep
+    """
+    regex = re.compile(FEATURE_PATTERN % b"|".join(
+        re.escape(feature_type.encode()) for feature_type in feature_types))
+
+    opener = gzip.open if file_name.lower().endswith(".gz") else open
+    features = []
+    with opener(file_name, "rb") as gff_file:
+        for block in iter_blocks(gff_file):
+            features.extend(find_features(regex, block))
+
+    if features:
+        chromosomes, starts, ends, strands, attributes = zip(*features)
+    else:
+        chromosomes = starts = ends = strands = attributes = ()
+
+    gff = pd.DataFrame({
+        'chromonumb': decode_categorical(chromosomes),
+        'genestart': np.array(starts, dtype=bytes).astype(np.int32),
+        'geneend': np.array(ends, dtype=bytes).astype(np.int32),
+        'strand': decode_categorical(strands),
+        'geneid': feature_genes(attributes)})
+    return gff
+
+
+def iter_blocks(gff_file, block_size=BLOCK_SIZE):
+    """ (File, int) -> Iterator of bytes
+
+    Yield the contents of a file in blocks of whole lines, of about
+    block_size bytes each.
+
+    Args:
+        gff_file (File): The file to read, opened in binary mode
+        block_size (Int): The number of bytes to read at a time
+    """
+    rest = b""
+    for block in iter(lambda: gff_file.read(block_size), b""):
+        block = rest + block
+        # The last partial line is carried over to the next block
+        end = block.rfind(b"\n") + 1
+        rest = block[end:]
+        if end:
+            yield block[:end]
+    if rest:
+        yield rest
+
+
+def find_features(regex, data):
+    """ (Pattern, bytes) -> List of Tuple
+
+    Return the groups of every match of a feature regex in whole lines of
+    a gff3 file, including a feature on the first line, which has no
+    newline before it.
+
+    Args:
+        regex (Pattern): The compiled FEATURE_PATTERN
+        data (bytes): Whole lines of the file
+    """
+    first_end = data.find(b"\n")
+    if first_end < 0:
+        return regex.findall(b"\n" + data)
+    return (regex.findall(b"\n" + data[:first_end]) +
+            regex.findall(data, first_end))
+
+
+def feature_genes(attributes):
+    """ (List of bytes) -> ndarray
+
+    Return the AGI of the gene each feature belongs to from its attributes,
+    being its first Parent, or its ID if it has no parent. Prefixes such as
+    "gene:" are dropped, and features with neither have an empty AGI.
+
+    Args:
+        attributes (List of bytes): The attributes column of each feature
+    """
+    # Attributes are key=value pairs separated by semicolons
+    attributes = np.strings.add(b";", np.array(attributes, dtype=bytes))
+    lengths = np.strings.str_len(attributes)
+    start = np.strings.find(attributes, b";Parent=") + 8
+    no_parent = start < 8
+    start[no_parent] = np.strings.find(attributes[no_parent], b";ID=") + 4
+    found = start >= 4
+
+    # The value ends at the next attribute, or the next of several values
+    end = lengths
+    for separator in [b";", b","]:
+        position = np.strings.find(attributes, separator, start)
+        end = np.where((position >= 0) & (position < end), position, end)
+    prefix = np.strings.rfind(attributes, b":", start, end)
+    start = np.where(prefix >= 0, prefix + 1, start)
+
+    genes = np.strings.slice(attributes, start, end)
+    genes[~found] = b""
+    return genes.astype(str)
+
+
+def decode_categorical(values):
+    """ (List of bytes) -> Categorical
+
+    Return a Categorical of the decoded values, decoding each distinct value
+    once.
+
+    Args:
+        values (List of bytes): The values to convert
+    """
+    categorical = pd.Categorical(values)
+    return categorical.rename_categories(
+        [category.decode() for category in categorical.categories])
+
+
+if __name__ == "__main__":
+    print(read_gff3("TAIR10_GFF3_genes.gff"))
@@ -1,6 +1,18 @@
 __author__ = 'Ruian'
 
+import mmap
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import AgiCodec
+
+# Regex to find JASPAR and AGI at the start of each line of a file
+INTERACTION_REGEX = re.compile(rb"^(MA\d\d\d\d\.1).(AT\dG\d\d\d\d\d)",
+                               re.MULTILINE)
+
 
 class Parser:
     """
@@ -59,6 +71,133 @@ class Parser:
                     new_dictionary[name_jas] = [name_agi]
         return new_dictionary
 
+
+class InteractionTable:
+    """
+    The InteractionTable class stores the AGI targets of each JASPAR name
+    compactly, as a sorted array of distinct integer AGI codes from
+    AgiCodec.
+
+    Attributes:
+        targets (Dict): The sorted distinct target codes of each JASPAR name
+    """
+
+    def __init__(self, jas_names, agis):
+        """ (InteractionTable, ndarray, ndarray) -> None
+
+        Initialize the table from the JASPAR name and AGI of each
+        interaction.
+
+        Args:
+            jas_names (ndarray): The JASPAR name of each interaction, as
+                strings or bytes
+            agis (ndarray): The AGI target of each interaction, as strings,
+                bytes or codes. Interactions whose target is not an AGI are
+                skipped.
+        """
+        agi_codes = AgiCodec.encode_agis(agis)
+        # Targets which are not AGIs have no code to store
+        kept = agi_codes != AgiCodec.MISSING
+        names, name_codes = np.unique(np.asarray(jas_names)[kept],
+                                      return_inverse=True)
+
+        # Sort and deduplicate interactions by name, then target
+        keys = np.unique(name_codes.astype(np.int64) * AgiCodec.CODE_LIMIT +
+                         agi_codes[kept])
+        key_names = keys // AgiCodec.CODE_LIMIT
+        bounds = np.searchsorted(key_names, np.arange(len(names) + 1))
+
+        self.targets = {}
+        for i, name in enumerate(names.astype(str).tolist()):
+            self.targets[name] = (keys[bounds[i]:bounds[i + 1]] %
+                                  AgiCodec.CODE_LIMIT).astype(np.int32)
+
+    def get_targets(self, jas_name):
+        """ (InteractionTable, String) -> List of String
+
+        Return the distinct AGI targets of a JASPAR name.
+
+        Args:
+            jas_name (String): The JASPAR name
+        """
+        return AgiCodec.decode_agis(self.targets[jas_name]).tolist()
+
+    def to_dictionary(self):
+        """ (InteractionTable) -> Dictionary
+
+        Return a dictionary of JASPAR names and lists of their distinct AGI
+        targets, like Parser.interaction_dictionary without repeats.
+        """
+        return {name: self.get_targets(name) for name in self.targets}
+
+
+def iter_interactions(*file_names):
+    """ (String, ...) -> Iterator of Tuple
+
+    Yield the (JASPAR name, AGI) of each interaction in one or more files,
+    in order. Each file is memory-mapped and scanned as bytes, rather than
+    read line by line.
+
+    Args:
+        file_names (String): The names of the files to parse
+    """
+    for file_name in file_names:
+        with open(file_name, "rb") as text_file:
+            # Empty files can not be memory-mapped
+            if os.fstat(text_file.fileno()).st_size == 0:
+                continue
+            with mmap.mmap(text_file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as data:
+                for result in INTERACTION_REGEX.finditer(data):
+                    yield (result.group(1).decode(),
+                           result.group(2).decode())
+
+
+def parse_file_arrays(file_name):
+    """ (String) -> Tuple of (ndarray, ndarray)
+
+    Return ndarrays of the JASPAR name and AGI of each interaction in a
+    file, as bytes.
+
+    Args:
+        file_name (String): The name of the file to parse
+    """
+    interactions = []
+    with open(file_name, "rb") as text_file:
+        if os.fstat(text_file.fileno()).st_size > 0:
+            with mmap.mmap(text_file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as data:
+                interactions = INTERACTION_REGEX.findall(data)
+
+    jas_names = np.array([result[0] for result in interactions], dtype="S8")
+    agis = np.array([result[1] for result in interactions], dtype="S9")
+    return jas_names, agis
+
+
+def parse_files(file_names, processes=None):
+    """ (List of String, int) -> InteractionTable
+
+    Return an InteractionTable of the interactions in several files. With
+    more than one process, the files are parsed in parallel by a pool of
+    worker processes.
+
+    Args:
+        file_names (List of String): The names of the files to parse
+        processes (Int): The number of worker processes, or None to parse
+            the files in this process
+    """
+    if processes is not None and processes > 1 and len(file_names) > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(parse_file_arrays, file_names))
+    else:
+        results = [parse_file_arrays(file_name) for file_name in file_names]
+
+    if not results:
+        return InteractionTable([], [])
+    return InteractionTable(np.concatenate([result[0] for result in results]),
+                            np.concatenate([result[1] for result in results]))
+
+
 if __name__ == "__main__":
     user_input = input("Select file to parse:\n")
 
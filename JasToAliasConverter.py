@@ -1,7 +1,7 @@
 __author__ = 'Ruian'
 
 import JasAgiParser
-import re
+import PfmStore
 
 class JasToAliasConverter:
     """
@@ -46,20 +46,15 @@ class JasToAliasConverter:
         Return:
             A dictionary of aliases with their agi targets
         """
-        # Read data from JASPAR database
-        jas_file = open("pfm_plants.txt")
-        jas_data = jas_file.read()
+        # Parsed JASPAR database, loaded once per process
+        pfm_store = PfmStore.get_pfm_store("pfm_plants.txt")
 
         new_dict = {}
 
         for jas_key in self.interaction_dictionary_jas.keys():
-            # Regex to find jaspar name, and capture alias
-            regex = re.compile(">MA" + jas_key[2:6] + "\.\d (\\b\S+)")
-            result = regex.search(jas_data)
+            alias = pfm_store.get_alias(jas_key)
             # Check if result was found
-            if result:
-                # Get captured alias
-                alias = result.group(1)
+            if alias:
                 # Add as key in new dictionary, with same AGI targets
                 new_dict[alias] = self.interaction_dictionary_jas[jas_key]
 
@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+    """
+    The LocalHandler class is the base of the request handlers of the local
+    servers, GeneQueryService and FakeBarServer. It keeps connections open
+    between requests, writes each response with its length, and does not
+    log requests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # A response is written as headers then body, and with Nagle's
+    # algorithm the body of a kept-alive connection waits on the ack of the
+    # headers, adding tens of milliseconds to every request
+    disable_nagle_algorithm = True
+
+    def send_body(self, status, content_type, body):
+        """ (LocalHandler, int, String, bytes) -> None
+
+        Send a response with a body.
+
+        Args:
+            status (Int): The HTTP status code
+            content_type (String): The content type of the body
+            body (bytes): The body to send
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(handler, host="127.0.0.1", port=0):
+    """ (type, String, int) -> ThreadingHTTPServer
+
+    Return a server answering requests with a handler class, serving in a
+    background thread.
+
+    Args:
+        handler (type): The request handler class
+        host (String): The address to listen on
+        port (Int): The port to listen on, a free port if 0
+    """
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    class HealthHandler(LocalHandler):
+        def do_GET(self):
+            self.send_body(200, "text/plain", b"ok")
+
+    server = start_server(HealthHandler)
+    print("Serving on http://%s:%d" % server.server_address[:2])
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,29 +1,238 @@
 __author__ = 'Ruian'
 
+import argparse
+import json
+import os
+
 import JasAgiParser
 import JasToAliasConverter
-import AliasToAgiConverter
+
+
+def make_resolver(args):
+    """ (Namespace) -> Object
+
+    Return the alias resolver chosen on the command line. Resolvers are
+    imported only when chosen, so that splinter is not needed unless the
+    browser based web tool is used.
+
+    Args:
+        args (Namespace): The parsed command line arguments
+    """
+    if args.resolver != "offline":
+        return make_web_resolver(args.resolver)
+
+    import OfflineAliasResolver
+    fallback = None
+    if args.fallback != "none":
+        fallback = make_web_resolver(args.fallback)
+    return OfflineAliasResolver.OfflineAliasResolver(args.alias_table,
+                                                     fallback)
+
+
+def make_web_resolver(name):
+    """ (String) -> Object
+
+    Return the remote alias resolver of a name, either "batch" for the
+    batched HTTP resolver or "web" for the browser based web tool.
+
+    Args:
+        name (String): The name of the resolver
+    """
+    if name == "batch":
+        import BatchAliasResolver
+        return BatchAliasResolver.BatchAliasResolver()
+    import AliasToAgiConverter
+    return AliasToAgiConverter
+
+
+def read_checkpoint(checkpoint_file_name):
+    """ (String) -> Tuple of (Dict, Set, int)
+
+    Return the aliases resolved, the aliases whose rows were written, and
+    the size of the output file after the last written alias, as recorded
+    in a checkpoint file. Rows written before the output file was started
+    over are not counted as written.
+
+    Args:
+        checkpoint_file_name (String): The name of the checkpoint file
+    """
+    resolved = {}
+    written = set()
+    offset = 0
+    if not os.path.exists(checkpoint_file_name):
+        return resolved, written, offset
+
+    with open(checkpoint_file_name) as checkpoint_file:
+        for line in checkpoint_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last record may be cut short by a crash
+                continue
+            if 'agi' in record:
+                resolved[record['alias']] = record['agi']
+            elif 'alias' in record:
+                written.add(record['alias'])
+                offset = record['offset']
+            else:
+                # The output file was started over
+                written.clear()
+                offset = record['offset']
+    return resolved, written, offset
+
+
+def append_records(checkpoint_file, records):
+    """ (File, List of Dict) -> None
+
+    Append records to the checkpoint file, and make sure they reach the disk.
+
+    Args:
+        checkpoint_file (File): The checkpoint file, opened for appending
+        records (List of Dict): The records to append
+    """
+    checkpoint_file.writelines(json.dumps(record) + "\n"
+                               for record in records)
+    checkpoint_file.flush()
+    os.fsync(checkpoint_file.fileno())
+
+
+def resolve_aliases(aliases, resolver, cache, resolved, checkpoint_file,
+                    batch_size):
+    """ (List of String, Object, AliasCache, Dict, File, int) -> None
+
+    Resolve the aliases not resolved already, a batch at a time, recording
+    each batch in the checkpoint file. Aliases with no agi are retried
+    without their AT prefix.
+
+    Args:
+        aliases (List of String): The aliases to resolve
+        resolver (Object): The resolver, with a convert_aliases method
+        cache (AliasCache): The cache of earlier conversions
+        resolved (Dict): The agi of each alias resolved so far, updated
+        checkpoint_file (File): The checkpoint file, opened for appending
+        batch_size (Int): The number of aliases resolved between checkpoints
+    """
+    missing = [alias for alias in aliases if alias not in resolved]
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i:i + batch_size]
+        agis = resolver.convert_aliases(batch, cache)
+
+        retry_keys = [key for key in batch
+                      if agis[key] == "" and key[0:2].upper() == "AT"]
+        if retry_keys:
+            retry_agi = resolver.convert_aliases(
+                [key[2:] for key in retry_keys], cache)
+            for key in retry_keys:
+                agis[key] = retry_agi[key[2:]]
+
+        resolved.update(agis)
+        append_records(checkpoint_file, [{'alias': key, 'agi': agis[key]}
+                                         for key in batch])
+
+
+def write_rows(interactions, resolved, written, output_file,
+               checkpoint_file):
+    """ (Dict, Dict, Set, File, File) -> None
+
+    Write the agi and target of each interaction whose alias has not been
+    written already, recording each alias in the checkpoint file once its
+    rows are written.
+
+    Args:
+        interactions (Dict): The agi targets of each alias
+        resolved (Dict): The agi of each alias
+        written (Set): The aliases whose rows were written already
+        output_file (File): The output file, opened for appending
+        checkpoint_file (File): The checkpoint file, opened for appending
+    """
+    for key in interactions.keys():
+        if key in written:
+            continue
+        for value in interactions[key]:
+            output_file.write(resolved[key].upper() + "\t" + value + "\n")
+        output_file.flush()
+        append_records(checkpoint_file, [{'alias': key,
+                                          'offset': output_file.tell()}])
+
+
+def main(argv=None):
+    """ (List of String) -> None
+
+    Convert the JASPAR names of an interaction file to agis, and write the
+    agi and target of each interaction to a tabs delimited file. Progress is
+    recorded in a checkpoint file, so that a run which stops part way is
+    resumed by running it again.
+
+    Args:
+        argv (List of String): The command line arguments
+    """
+    arg_parser = argparse.ArgumentParser(
+        description="Convert JASPAR interactions to agi interactions.")
+    arg_parser.add_argument("data_file",
+                            help="file of JASPAR names and agi targets")
+    arg_parser.add_argument("output_file", help="file to write to")
+    arg_parser.add_argument("--resolver", default="web",
+                            choices=["web", "batch", "offline"],
+                            help="how to convert aliases to agis")
+    arg_parser.add_argument("--alias-table",
+                            help="local gene alias table, for --resolver "
+                                 "offline")
+    arg_parser.add_argument("--fallback", default="none",
+                            choices=["web", "batch", "none"],
+                            help="resolver for aliases missing from the "
+                                 "alias table, none by default so that "
+                                 "offline runs stay offline")
+    arg_parser.add_argument("--cache", default="alias_cache.sqlite",
+                            help="cache of earlier alias conversions")
+    arg_parser.add_argument("--checkpoint",
+                            help="checkpoint file, by default the output "
+                                 "file followed by .checkpoint")
+    arg_parser.add_argument("--batch-size", type=int, default=20,
+                            help="aliases resolved between checkpoints")
+    arg_parser.add_argument("--restart", action="store_true",
+                            help="ignore any checkpoint and start over")
+    args = arg_parser.parse_args(argv)
+    if args.resolver == "offline" and not args.alias_table:
+        arg_parser.error("--resolver offline needs --alias-table")
+
+    checkpoint_file_name = args.checkpoint or args.output_file + ".checkpoint"
+    if args.restart and os.path.exists(checkpoint_file_name):
+        os.remove(checkpoint_file_name)
+    resolved, written, offset = read_checkpoint(checkpoint_file_name)
+
+    parser = JasAgiParser.Parser(args.data_file)
+    jas_convert = JasToAliasConverter.JasToAliasConverter(
+        parser.interaction_dictionary)
+    interactions = jas_convert.interaction_dictionary_alias
+
+    import AliasCache
+    cache = AliasCache.AliasCache(args.cache)
+    with open(checkpoint_file_name, "a") as checkpoint_file:
+        if any(key not in resolved for key in interactions):
+            resolve_aliases(list(interactions.keys()), make_resolver(args),
+                            cache, resolved, checkpoint_file,
+                            args.batch_size)
+        cache.close()
+
+        # Rows recorded as written are lost if the output file is gone or
+        # cut short, so write them all again
+        if written and (not os.path.exists(args.output_file) or
+                        os.path.getsize(args.output_file) < offset):
+            written.clear()
+            offset = 0
+            append_records(checkpoint_file, [{'offset': 0}])
+
+        # Drop rows written after the last checkpoint, then carry on
+        mode = "r+" if written else "w"
+        with open(args.output_file, mode) as output_file:
+            output_file.seek(offset)
+            output_file.truncate()
+            write_rows(interactions, resolved, written, output_file,
+                       checkpoint_file)
+
+    # The run is complete, so the next one starts over
+    os.remove(checkpoint_file_name)
 
 
 if __name__ == "__main__":
-    data_file = input("Enter data file:\n")
-    parser = JasAgiParser.Parser(data_file)
-    parser_output = parser.interaction_dictionary
-    jas_convert = JasToAliasConverter.JasToAliasConverter(parser_output)
-    jas_convert_output = jas_convert.interaction_dictionary_alias
-
-    dict_agi = {}
-    for key in jas_convert_output.keys():
-        if key not in dict_agi.keys():
-            agi = AliasToAgiConverter.convert_alias_to_agi(key)
-            if agi == "" and key[0:2].upper() == "AT":
-                agi = AliasToAgiConverter.convert_alias_to_agi(key[2:])
-            dict_agi[key] = agi
-
-    output_filename = input("Enter output file name:\n")
-    output_file = open(output_filename, "w")
-
-    for key in jas_convert_output.keys():
-        for value in jas_convert_output[key]:
-            output_file.write(dict_agi[key].upper() + "\t" + value + "\n")
-    output_file.close()
\ No newline at end of file
+    main()
@@ -0,0 +1,107 @@
+import time
+
+
+class OfflineAliasResolver:
+    """
+    The OfflineAliasResolver class converts aliases to AGIs from a local
+    TAIR style gene alias table, with columns of locus name, symbol and full
+    name, held in a dictionary. Lookups ignore case, and an alias with an AT
+    prefix which is not found is looked up again without it.
+
+    Aliases not in the table can optionally be passed on to a remote
+    resolver, such as BatchAliasResolver or AliasToAgiConverter.
+
+    Attributes:
+        agis (Dict): The agi of each upper case alias
+        fallback (Object): The resolver for aliases not in the table, with a
+            convert_aliases method, or None
+        build_seconds (Float): The seconds taken to build the index
+        lookups (Int): The number of aliases looked up
+        hits (Int): The number of aliases found in the table
+        lookup_seconds (Float): The seconds spent looking up aliases
+    """
+
+    def __init__(self, alias_file_name, fallback=None):
+        """ (OfflineAliasResolver, String, Object) -> None
+
+        Initialize the resolver by indexing a gene alias table. The first
+        line is skipped if it is a header.
+
+        Args:
+            alias_file_name (String): The name of the tabs delimited gene
+                alias table
+            fallback (Object): The resolver for aliases not in the table
+        """
+        self.fallback = fallback
+        self.agis = {}
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+
+        start = time.perf_counter()
+        with open(alias_file_name) as alias_file:
+            for line in alias_file:
+                columns = line.rstrip("\n").split("\t")
+                if len(columns) < 2 or columns[0].lower() == "locus_name":
+                    continue
+                agi = columns[0].strip().upper()
+                # Loci are also their own aliases
+                self.agis.setdefault(agi, agi)
+                # The first locus of a symbol shared by several is kept
+                self.agis.setdefault(columns[1].strip().upper(), agi)
+        self.build_seconds = time.perf_counter() - start
+
+    def convert_alias_to_agi(self, alias):
+        """ (OfflineAliasResolver, String) -> String
+
+        Return the agi of an alias from the table, which is empty if it is
+        not in the table.
+
+        Args:
+            alias (String): The alias to convert
+        """
+        key = alias.strip().upper()
+        agi = self.agis.get(key, "")
+        if agi == "" and key[0:2] == "AT":
+            agi = self.agis.get(key[2:], "")
+        return agi
+
+    def convert_aliases(self, aliases, cache=None):
+        """ (OfflineAliasResolver, List of String, AliasCache) -> Dict
+
+        Return a dictionary of the agi of each alias, which is empty if the
+        alias has no agi. Aliases not in the table are passed on to the
+        fallback resolver, along with the cache, if there is one.
+
+        Args:
+            aliases (List of String): The aliases to convert
+            cache (AliasCache): The cache used by the fallback resolver
+        """
+        start = time.perf_counter()
+        results = {alias: self.convert_alias_to_agi(alias)
+                   for alias in aliases}
+        self.lookup_seconds += time.perf_counter() - start
+        self.lookups += len(aliases)
+        self.hits += sum(1 for alias in aliases if results[alias])
+
+        missing = [alias for alias, agi in results.items() if agi == ""]
+        if missing and self.fallback is not None:
+            results.update(self.fallback.convert_aliases(missing, cache))
+
+        return {alias: results[alias] for alias in aliases}
+
+    def report(self):
+        """ (OfflineAliasResolver) -> Dict
+
+        Return a dictionary of the size of the index, the time taken to
+        build it, and the number and rate of lookups so far.
+        """
+        rate = None
+        if self.lookup_seconds > 0:
+            rate = self.lookups / self.lookup_seconds
+        return {'entries': len(self.agis),
+                'build_seconds': self.build_seconds,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'lookup_seconds': self.lookup_seconds,
+                'lookups_per_second': rate}
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class PairStore:
+    """
+    PairStore stores binary pairs without duplicates, in the order they
+    were first added. Membership tests and insertions take constant time,
+    unlike the list membership scans they replace.
+
+    Attributes:
+        pairs (Dict): The stored pairs as keys, in insertion order.
+    """
+
+    def __init__(self, pairs=()):
+        """ (PairStore, Iterable of Tuple) -> None
+
+        Initialize the pair store, with any initial pairs.
+
+        Args:
+            pairs (Iterable of Tuple): The pairs to store first
+        """
+        self.pairs = dict.fromkeys(pairs)
+
+    def add(self, pair):
+        """ (PairStore, Tuple) -> boolean
+
+        Add a pair to the store if it is not stored already.
+
+        Args:
+            pair (Tuple): The pair of (motif, gene) to add
+        Return:
+            True if the pair was new
+        """
+        if pair in self.pairs:
+            return False
+        self.pairs[pair] = None
+        return True
+
+    def update(self, pairs):
+        """ (PairStore, Iterable of Tuple) -> List of Tuple
+
+        Add each pair not stored already, keeping their order.
+
+        Args:
+            pairs (Iterable of Tuple): The pairs to add
+        Return:
+            The pairs which were new, in the order they were added
+        """
+        new_pairs = [pair for pair in dict.fromkeys(pairs)
+                     if pair not in self.pairs]
+        self.pairs.update(dict.fromkeys(new_pairs))
+        return new_pairs
+
+    def to_list(self):
+        """ (PairStore) -> List of Tuple
+
+        Return the stored pairs as a list, in the order they were added.
+        """
+        return list(self.pairs)
+
+    def __contains__(self, pair):
+        return pair in self.pairs
+
+    def __iter__(self):
+        return iter(self.pairs)
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+def interleave(first, second):
+    """ (ndarray, ndarray) -> ndarray
+
+    Return an ndarray of the elements of two ndarrays of the same length,
+    alternating between them, such as the gene 1 and gene 2 of each motif
+    row in the order the loop engine tests them.
+
+    Args:
+        first (ndarray): The elements to put first
+        second (ndarray): The elements to put second
+    """
+    return np.column_stack((first, second)).ravel()
+
+
+def first_occurrences(keys):
+    """ (ndarray) -> ndarray
+
+    Return the positions of the first occurrence of each distinct key, in
+    order, so that pairs encoded as integer keys can be deduplicated as a
+    PairStore would, without building them.
+
+    Args:
+        keys (ndarray): The integer key of each pair
+    """
+    return np.sort(np.unique(keys, return_index=True)[1])
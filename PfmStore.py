@@ -0,0 +1,191 @@
+import os
+import zipfile
+
+import numpy as np
+
+from FileUtils import atomic_write, hash_file
+
+# Stores already loaded in this process, by file name
+loaded_stores = {}
+
+
+class PfmStore:
+    """
+    The PfmStore class holds the position frequency matrices of a JASPAR pfm
+    file, such as pfm_plants.txt, parsed once and indexed by JASPAR name.
+    The parsed matrices are cached in a npz file next to the pfm file, which
+    is rebuilt when the pfm file changes.
+
+    Attributes:
+        file_name (String): The name of the pfm file
+        aliases (Dict): The alias of each JASPAR name
+        matrices (Dict): The 4 row (A, C, G, T) count matrix of each JASPAR
+            name, as an ndarray
+        base_names (Dict): The first JASPAR name found for each JASPAR name
+            without its version, such as MA0001 for MA0001.1
+    """
+
+    def __init__(self, file_name="pfm_plants.txt", cache_file_name=None):
+        """ (PfmStore, String, String) -> None
+
+        Initialize the store from its cache file if it is still valid, and
+        from the pfm file otherwise.
+
+        Args:
+            file_name (String): The name of the pfm file
+            cache_file_name (String): The name of the npz cache file.
+                Defaults to the pfm file name followed by .npz
+        """
+        self.file_name = file_name
+        if cache_file_name is None:
+            cache_file_name = file_name + ".npz"
+
+        stat = os.stat(file_name)
+        cached = read_cache(cache_file_name, stat)
+        if cached is None:
+            # Only hash the file when its modification time has changed
+            digest = hash_file(file_name)
+            cached = read_cache(cache_file_name, stat, digest)
+            if cached is None:
+                cached = parse_pfm_file(file_name)
+            # Record the modification time, so later runs need not hash
+            write_cache(cache_file_name, cached, stat, digest)
+
+        names, aliases, matrices = cached
+        self.aliases = dict(zip(names, aliases))
+        self.matrices = dict(zip(names, matrices))
+        self.base_names = {}
+        for name in names:
+            self.base_names.setdefault(name.split(".")[0], name)
+
+    def get_alias(self, jas_name):
+        """ (PfmStore, String) -> String
+
+        Return the alias of a JASPAR name, matching any version of the name.
+        Returns None if the name is not in the pfm file.
+
+        Args:
+            jas_name (String): The JASPAR name, such as MA0001.1
+        """
+        name = self.base_names.get("MA" + jas_name[2:6])
+        if name is None:
+            return None
+        return self.aliases[name]
+
+    def get_matrix(self, jas_name):
+        """ (PfmStore, String) -> ndarray
+
+        Return the count matrix of a JASPAR name, with rows for A, C, G and
+        T. Raises KeyError if the name is not in the pfm file.
+
+        Args:
+            jas_name (String): The JASPAR name, such as MA0001.1
+        """
+        return self.matrices[jas_name]
+
+
+def get_pfm_store(file_name="pfm_plants.txt"):
+    """ (String) -> PfmStore
+
+    Return the PfmStore of a pfm file, loading it only the first time it is
+    asked for in this process.
+
+    Args:
+        file_name (String): The name of the pfm file
+    """
+    key = os.path.abspath(file_name)
+    if key not in loaded_stores:
+        loaded_stores[key] = PfmStore(file_name)
+    return loaded_stores[key]
+
+
+def parse_pfm_file(file_name):
+    """ (String) -> Tuple of (List, List, List)
+
+    Return the JASPAR names, aliases and count matrices of a pfm file, in
+    the order they appear.
+
+    Args:
+        file_name (String): The name of the pfm file
+    """
+    names = []
+    aliases = []
+    rows = []
+    matrices = []
+    with open(file_name) as pfm_file:
+        for line in pfm_file:
+            line = line.strip()
+            if line.startswith(">"):
+                if rows:
+                    matrices.append(np.array(rows))
+                    rows = []
+                # Header lines hold the JASPAR name then the alias
+                header = line[1:].split()
+                names.append(header[0])
+                aliases.append(header[1] if len(header) > 1 else "")
+            elif line:
+                rows.append([float(count) for count in line.split()])
+    if rows:
+        matrices.append(np.array(rows))
+    return names, aliases, matrices
+
+
+def read_cache(cache_file_name, stat, digest=None):
+    """ (String, stat_result, String) -> Tuple of (List, List, List)
+
+    Return the names, aliases and matrices stored in a cache file, or None
+    if there is no cache file or it is out of date. Without a digest, the
+    cache is only valid if the pfm file's size and modification time are
+    unchanged; with one, it is valid if the pfm file's contents are.
+
+    Args:
+        cache_file_name (String): The name of the npz cache file
+        stat (stat_result): The os.stat of the pfm file
+        digest (String): The sha1 digest of the pfm file
+    """
+    if not os.path.exists(cache_file_name):
+        return None
+    try:
+        with np.load(cache_file_name) as cache:
+            if digest is None:
+                valid = (int(cache['size']) == stat.st_size and
+                         int(cache['mtime']) == stat.st_mtime_ns)
+            else:
+                valid = str(cache['digest']) == digest
+            if not valid:
+                return None
+            # Matrices are stored side by side, and split by their widths
+            bounds = np.cumsum(cache['widths'])[:-1]
+            matrices = np.split(cache['counts'], bounds, axis=1)
+            return (cache['names'].tolist(), cache['aliases'].tolist(),
+                    matrices)
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def write_cache(cache_file_name, cached, stat, digest):
+    """ (String, Tuple, stat_result, String) -> None
+
+    Write the names, aliases and matrices of a pfm file to a cache file,
+    along with the pfm file's size, modification time and digest. A cache
+    which can not be written is skipped.
+
+    Args:
+        cache_file_name (String): The name of the npz cache file
+        cached (Tuple): The names, aliases and matrices to store
+        stat (stat_result): The os.stat of the pfm file
+        digest (String): The sha1 digest of the pfm file
+    """
+    names, aliases, matrices = cached
+    try:
+        with atomic_write(cache_file_name) as cache_file:
+            np.savez(cache_file, names=np.array(names, dtype=str),
+                     aliases=np.array(aliases, dtype=str),
+                     widths=np.array([matrix.shape[1] for matrix in matrices],
+                                     dtype=np.int64),
+                     counts=np.concatenate(matrices, axis=1),
+                     size=stat.st_size, mtime=stat.st_mtime_ns,
+                     digest=digest)
+    except OSError:
+        # The pfm file is parsed again next time instead
+        pass
@@ -0,0 +1,265 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+import AgiCodec
+from FileUtils import atomic_write
+from PairStore import first_occurrences, interleave
+
+# Version of the saved layout, saved states of other versions are ignored
+STATE_VERSION = 1
+
+# The arrays of a state with one entry per motif row, and their types
+ROW_ARRAYS = {'motif_codes': np.int32, 'agi_1': np.int32, 'agi_2': np.int32,
+              'motif_ends': np.int64, 'keep_1': bool, 'keep_2': bool}
+
+# The arrays of a state with one entry per gene, and their types
+GENE_ARRAYS = {'gene_codes': np.int32, 'gene_starts': np.int64,
+               'gene_strands': np.int8}
+
+
+class PredictionState:
+    """
+    The PredictionState class holds what a BinaryPairPredictor run needs to
+    bring its results up to date without predicting every motif row again:
+    fingerprints of the gff and motif files, the gene table it used, and for
+    every motif row its boundary genes, end and whether it pairs with either
+    gene.
+
+    Attributes:
+        window (Int): The largest distance from motif to gene start
+        gff_digest (String): The sha1 digest of the gff file
+        motif_bytes (Int): The length of the motif file prefix whose rows
+            are held
+        motif_digest (String): The sha1 digest of that prefix
+        motif_names (List of String): The motif id of each motif code
+        motif_lookup (Dict): The motif code of each motif id
+        gene_codes (ndarray): The AgiCodec code of each gene
+        gene_starts (ndarray): The starting index of each gene
+        gene_strands (ndarray): The strand code of each gene
+        motif_codes (ndarray): The motif code of each row
+        agi_1 (ndarray): The code of gene 1 of each row
+        agi_2 (ndarray): The code of gene 2 of each row
+        motif_ends (ndarray): The ending index of each row
+        keep_1 (ndarray): Whether each row pairs with gene 1
+        keep_2 (ndarray): Whether each row pairs with gene 2
+    """
+
+    def __init__(self, window, gff_digest, gene_codes, gene_starts,
+                 gene_strands):
+        """ (PredictionState, int, String, ndarray, ndarray, ndarray) -> None
+
+        Initialize a state without motif rows for a gene table.
+
+        Args:
+            window (Int): The largest distance from motif to gene start
+            gff_digest (String): The sha1 digest of the gff file
+            gene_codes (ndarray): The AgiCodec code of each gene
+            gene_starts (ndarray): The starting index of each gene
+            gene_strands (ndarray): The strand code of each gene
+        """
+        self.window = window
+        self.motif_bytes = 0
+        self.motif_digest = hashlib.sha1().hexdigest()
+        self.motif_names = []
+        self.motif_lookup = {}
+        self.set_genes(gff_digest, gene_codes, gene_starts, gene_strands)
+        for name, dtype in ROW_ARRAYS.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+
+    def __len__(self):
+        """ (PredictionState) -> int
+
+        Return the number of motif rows held.
+        """
+        return len(self.motif_codes)
+
+    def set_genes(self, gff_digest, gene_codes, gene_starts, gene_strands):
+        """ (PredictionState, String, ndarray, ndarray, ndarray) -> None
+
+        Replace the gene table of the state.
+
+        Args:
+            gff_digest (String): The sha1 digest of the gff file
+            gene_codes (ndarray): The AgiCodec code of each gene
+            gene_starts (ndarray): The starting index of each gene
+            gene_strands (ndarray): The strand code of each gene
+        """
+        self.gff_digest = gff_digest
+        self.gene_codes = np.asarray(gene_codes, dtype=np.int32)
+        self.gene_starts = np.asarray(gene_starts, dtype=np.int64)
+        self.gene_strands = np.asarray(gene_strands, dtype=np.int8)
+
+    def changed_genes(self, gene_codes, gene_starts, gene_strands):
+        """ (PredictionState, ndarray, ndarray, ndarray) -> ndarray
+
+        Return the codes of the genes which were added, removed, moved or
+        turned to another strand in a new gene table.
+
+        Args:
+            gene_codes (ndarray): The AgiCodec code of each new gene
+            gene_starts (ndarray): The starting index of each new gene
+            gene_strands (ndarray): The strand code of each new gene
+        """
+        old_genes = set(zip(self.gene_codes.tolist(),
+                            self.gene_starts.tolist(),
+                            self.gene_strands.tolist()))
+        new_genes = set(zip(np.asarray(gene_codes).tolist(),
+                            np.asarray(gene_starts).tolist(),
+                            np.asarray(gene_strands).tolist()))
+        changed = set(gene[0] for gene in old_genes ^ new_genes)
+        return np.array(sorted(changed), dtype=np.int32)
+
+    def add_rows(self, motif_ids, agi_1, agi_2, motif_ends, keep_1, keep_2):
+        """ (PredictionState, ndarray, ndarray, ndarray, ndarray, ndarray,
+        ndarray) -> None
+
+        Append motif rows to the state.
+
+        Args:
+            motif_ids (ndarray): The motif id of each row
+            agi_1 (ndarray): The code of gene 1 of each row
+            agi_2 (ndarray): The code of gene 2 of each row
+            motif_ends (ndarray): The ending index of each row
+            keep_1 (ndarray): Whether each row pairs with gene 1
+            keep_2 (ndarray): Whether each row pairs with gene 2
+        """
+        rows = {'motif_codes': self.encode_motifs(motif_ids),
+                'agi_1': agi_1, 'agi_2': agi_2, 'motif_ends': motif_ends,
+                'keep_1': keep_1, 'keep_2': keep_2}
+        for name, dtype in ROW_ARRAYS.items():
+            setattr(self, name, np.concatenate((
+                getattr(self, name), np.asarray(rows[name], dtype=dtype))))
+
+    def encode_motifs(self, motif_ids):
+        """ (PredictionState, ndarray) -> ndarray
+
+        Return the motif code of each motif id, giving new ids the next
+        codes.
+
+        Args:
+            motif_ids (ndarray): The motif ids to encode
+        Raises:
+            ValueError: If a motif id is missing
+        """
+        categorical = pd.Categorical(motif_ids)
+        if (categorical.codes < 0).any():
+            raise ValueError("Motif rows without a motif id can not be "
+                             "predicted incrementally")
+
+        codes = []
+        for name in categorical.categories.astype(str):
+            if name not in self.motif_lookup:
+                self.motif_lookup[name] = len(self.motif_names)
+                self.motif_names.append(name)
+            codes.append(self.motif_lookup[name])
+        return np.array(codes, dtype=np.int32)[categorical.codes]
+
+    def pairs(self):
+        """ (PredictionState) -> Tuple of (ndarray, ndarray)
+
+        Return the motif ids and gene agis of the distinct binary pairs of
+        all rows, in the order the loop engine would first find them.
+        """
+        # Interleave gene 1 and gene 2 of every row to keep the loop order
+        motifs = interleave(self.motif_codes, self.motif_codes)
+        agis = interleave(self.agi_1, self.agi_2)
+        keep = interleave(self.keep_1, self.keep_2)
+        motifs = motifs[keep]
+        agis = agis[keep]
+
+        # Keep the first of each repeated pair
+        keys = motifs.astype(np.int64) * AgiCodec.CODE_LIMIT + agis
+        first = first_occurrences(keys)
+        names = np.array(self.motif_names + [""], dtype=object)
+        return names[motifs[first]], AgiCodec.decode_agis(agis[first])
+
+    def save(self, file_name):
+        """ (PredictionState, String) -> None
+
+        Save the state to a npz file, replacing any earlier state.
+
+        Args:
+            file_name (String): The name of the npz file to write
+        """
+        arrays = {'version': STATE_VERSION, 'window': self.window,
+                  'gff_digest': self.gff_digest,
+                  'motif_bytes': self.motif_bytes,
+                  'motif_digest': self.motif_digest,
+                  'motif_names': np.array(self.motif_names, dtype=str)}
+        for name in list(GENE_ARRAYS) + list(ROW_ARRAYS):
+            arrays[name] = getattr(self, name)
+
+        with atomic_write(file_name) as npz_file:
+            np.savez(npz_file, **arrays)
+
+
+def load_state(file_name):
+    """ (String) -> PredictionState
+
+    Return the state saved in a npz file, or None if there is no file or it
+    was saved in another layout.
+
+    Args:
+        file_name (String): The name of the npz file to read
+    """
+    if not os.path.exists(file_name):
+        return None
+    try:
+        with np.load(file_name) as arrays:
+            if int(arrays['version']) != STATE_VERSION:
+                return None
+            state = PredictionState(
+                int(arrays['window']), str(arrays['gff_digest']),
+                arrays['gene_codes'], arrays['gene_starts'],
+                arrays['gene_strands'])
+            state.motif_bytes = int(arrays['motif_bytes'])
+            state.motif_digest = str(arrays['motif_digest'])
+            state.motif_names = arrays['motif_names'].tolist()
+            state.motif_lookup = {name: code for code, name
+                                  in enumerate(state.motif_names)}
+            for name in ROW_ARRAYS:
+                setattr(state, name, arrays[name])
+    except (OSError, KeyError, ValueError):
+        return None
+    return state
+
+
+def hash_prefix(file_name, size, digest=None):
+    """ (String, int, hash) -> hash
+
+    Return a sha1 hash object updated with the first size bytes of a file,
+    or with the bytes after those already hashed when given a hash object
+    and its length.
+
+    Args:
+        file_name (String): The name of the file to hash
+        size (Int): The number of bytes to hash, counted from the start of
+            the file
+        digest (Tuple of (hash, int)): A hash object, and the number of
+            bytes at the start of the file it has been updated with
+    """
+    if digest is None:
+        digest = (hashlib.sha1(), 0)
+    digest, position = digest
+
+    with open(file_name, "rb") as hashed_file:
+        hashed_file.seek(position)
+        remaining = size - position
+        while remaining > 0:
+            block = hashed_file.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+if __name__ == "__main__":
+    state = load_state("prediction_state.npz")
+    if state is None:
+        print("No saved prediction state")
+    else:
+        print(len(state), "motif rows,", len(state.pairs()[0]), "pairs")
@@ -0,0 +1,177 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+# The counters every report has, in the order they are reported
+COUNTERS = ["rows", "skipped_missing_gene", "same_strand", "opposite_strand",
+            "pairs_emitted", "pairs_new", "pairs_duplicate"]
+
+# The most missing genes kept as examples for the report
+MISSING_EXAMPLES = 10
+
+
+class PredictorStats:
+    """
+    The PredictorStats class collects the wall time of each stage of a
+    BinaryPairPredictor run and counters of the rows and pairs it handled.
+    It is only used when passed to a predictor, so runs without it pay no
+    cost beyond a check per chunk of motif data.
+
+    Attributes:
+        timings (Dict): The seconds spent in each stage, such as gff_load,
+            motif_load, lookup and rules.
+        counters (Dict): The count of motif rows processed, rows skipped
+            for a gene missing from the gff, rows with both genes on the
+            same or on opposite strands, and pairs emitted by the rules,
+            new to the results or duplicates of earlier pairs.
+        missing_genes (List of String): The first genes found missing from
+            the gff, as examples.
+        progress_interval (Float): The seconds between progress log
+            messages, or None to log no progress.
+        logger (Logger): The logger progress messages are written to.
+        started (Float): The perf_counter time the stats were created at.
+    """
+
+    def __init__(self, progress_interval=None, logger=None):
+        """ (PredictorStats, float, Logger) -> None
+
+        Initialize empty timings and counters.
+
+        Args:
+            progress_interval (Float): The seconds between progress log
+                messages, or None to log no progress.
+            logger (Logger): The logger to write progress to. Defaults to
+                the BinaryPairPredictor logger.
+        """
+        self.timings = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.missing_genes = []
+        self.progress_interval = progress_interval
+        self.logger = logger or logging.getLogger("BinaryPairPredictor")
+        self.started = time.perf_counter()
+        self.next_progress = self.started
+        if progress_interval is not None:
+            self.next_progress += progress_interval
+
+    @contextmanager
+    def timer(self, stage):
+        """ (PredictorStats, String) -> Context manager
+
+        Add the wall time of the enclosed block to a stage.
+
+        Args:
+            stage (String): The name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds):
+        """ (PredictorStats, String, float) -> None
+
+        Add seconds to the wall time of a stage.
+
+        Args:
+            stage (String): The name of the stage
+            seconds (Float): The seconds to add
+        """
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def count(self, counter, amount=1):
+        """ (PredictorStats, String, int) -> None
+
+        Add to a counter.
+
+        Args:
+            counter (String): The name of the counter
+            amount (Int): The amount to add
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + int(amount)
+
+    def add_missing(self, genes):
+        """ (PredictorStats, Iterable of String) -> None
+
+        Keep genes missing from the gff as examples, up to
+        MISSING_EXAMPLES distinct genes.
+
+        Args:
+            genes (Iterable of String): The missing genes
+        """
+        for gene in genes:
+            if len(self.missing_genes) >= MISSING_EXAMPLES:
+                return
+            gene = str(gene)
+            if gene not in self.missing_genes:
+                self.missing_genes.append(gene)
+
+    def progress(self, rows=None, done=None, pairs=None):
+        """ (PredictorStats, int, int, int) -> None
+
+        Log the rows processed and pairs found so far, if progress_interval
+        seconds have passed since the last message.
+
+        Args:
+            rows (Int): The total number of motif rows, if known
+            done (Int): The number of motif rows processed so far, for
+                callers which count rows only at the end of a chunk.
+                Defaults to the rows counter.
+            pairs (Int): The number of new pairs found so far. Defaults to
+                the pairs_new counter.
+        """
+        if self.progress_interval is None:
+            return
+        now = time.perf_counter()
+        if now < self.next_progress:
+            return
+        self.next_progress = now + self.progress_interval
+
+        if done is None:
+            done = self.counters["rows"]
+        if pairs is None:
+            pairs = self.counters["pairs_new"]
+        elapsed = now - self.started
+        message = "%d rows" % done
+        if rows:
+            message += " of %d (%.1f%%)" % (rows, 100.0 * done / rows)
+        self.logger.info("%s, %d pairs, %.0f rows/s", message, pairs,
+                         done / elapsed if elapsed > 0 else 0.0)
+
+    def report(self):
+        """ (PredictorStats) -> Dict
+
+        Return the timings, counters and missing gene examples collected so
+        far, with the elapsed time and processing rate.
+        """
+        elapsed = time.perf_counter() - self.started
+        return {
+            "elapsed_seconds": elapsed,
+            "rows_per_second": (self.counters["rows"] / elapsed
+                                if elapsed > 0 else 0.0),
+            "timings": dict(self.timings),
+            "counters": dict(self.counters),
+            "missing_genes": list(self.missing_genes)}
+
+    def to_json(self, file_name=None):
+        """ (PredictorStats, String) -> String
+
+        Return the report as JSON, also writing it to a file if a name is
+        given.
+
+        Args:
+            file_name (String): The name of the file to write to
+        """
+        text = json.dumps(self.report(), indent=2)
+        if file_name is not None:
+            with open(file_name, "w") as report_file:
+                report_file.write(text + "\n")
+        return text
+
+
+if __name__ == "__main__":
+    stats = PredictorStats()
+    with stats.timer("example"):
+        stats.count("rows", 10)
+    print(stats.to_json())
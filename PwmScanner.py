@@ -0,0 +1,247 @@
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import PfmStore
+
+# Code of each base in a sequence, with 4 for any base other than ACGT
+BASE_CODES = np.full(256, 4, dtype=np.int8)
+for code, base in enumerate(b"ACGT"):
+    BASE_CODES[base] = code
+    BASE_CODES[base + 32] = code
+
+# Score given to a position holding an unknown base, so no hit covers it
+UNKNOWN_SCORE = -1e6
+
+OUTPUT_HEADER = "motifid\tstrand\tmotifstart\tmotifend\tgene ids\n"
+
+
+class PwmScanner:
+    """
+    The PwmScanner class scores promoter sequences with the log-odds
+    position weight matrices of a JASPAR pfm file, and writes the motif hits
+    in the format read by BinaryPairPredictor.open_motif_file.
+
+    All matrices are stacked into a single weight matrix, so that each
+    sequence is scored against every matrix, on both strands, with one
+    matrix product of the sequence's one-hot encoding.
+
+    Attributes:
+        names (List of String): The JASPAR name of each matrix
+        widths (ndarray): The width of each matrix
+        weights (ndarray): The 5 row weight matrix holding the forward
+            matrices side by side, then the reverse complement matrices.
+            The fifth row scores unknown bases.
+        thresholds (ndarray): The smallest score of a hit for each matrix
+    """
+
+    def __init__(self, pfm_store, threshold=0.85, pseudocount=1.0):
+        """ (PwmScanner, PfmStore, float, float) -> None
+
+        Initialize the scanner with the matrices of a pfm store.
+
+        Args:
+            pfm_store (PfmStore): The position frequency matrices to use
+            threshold (Float): The smallest relative score of a hit, between
+                the lowest (0) and highest (1) score a matrix can give
+            pseudocount (Float): The count added to each column of a
+                matrix, spread over the four bases
+        """
+        self.names = list(pfm_store.matrices.keys())
+        pwms = [pfm_to_pwm(pfm_store.matrices[name], pseudocount)
+                for name in self.names]
+        self.widths = np.array([pwm.shape[1] for pwm in pwms])
+
+        # Reverse complement by reversing both the bases and the columns
+        forward = np.concatenate(pwms, axis=1)
+        reverse = np.concatenate([pwm[::-1, ::-1] for pwm in pwms], axis=1)
+        weights = np.concatenate((forward, reverse), axis=1)
+        unknown = np.full((1, weights.shape[1]), UNKNOWN_SCORE)
+        self.weights = np.vstack((weights, unknown))
+
+        lowest = np.array([pwm.min(axis=0).sum() for pwm in pwms])
+        highest = np.array([pwm.max(axis=0).sum() for pwm in pwms])
+        self.thresholds = lowest + threshold * (highest - lowest)
+
+    def scan_sequence(self, codes):
+        """ (PwmScanner, ndarray) -> List of Tuple
+
+        Return the hits of every matrix on a sequence, as tuples of the
+        matrix index, strand, and 0 based start of the hit.
+
+        Args:
+            codes (ndarray): The sequence as base codes, from BASE_CODES
+        """
+        # Score of each base at each column of every matrix
+        one_hot = np.eye(5)[codes]
+        column_scores = one_hot @ self.weights
+
+        hits = []
+        offset = 0
+        for strand in "+-":
+            for matrix, width in enumerate(self.widths):
+                count = len(codes) - width + 1
+                if count > 0:
+                    # Sum each diagonal of width columns into window scores
+                    scores = column_scores[0:count, offset].copy()
+                    for column in range(1, width):
+                        scores += column_scores[column:column + count,
+                                                offset + column]
+                    for start in np.flatnonzero(
+                            scores >= self.thresholds[matrix]):
+                        hits.append((matrix, strand, int(start)))
+                offset += width
+        return hits
+
+    def scan_records(self, fasta_file_name, records):
+        """ (PwmScanner, String, List of Tuple) -> List of String
+
+        Return the output lines of the hits on a batch of FASTA records.
+
+        Args:
+            fasta_file_name (String): The name of the FASTA file
+            records (List of Tuple): The records to scan, from index_fasta
+        """
+        lines = []
+        with open(fasta_file_name, "rb") as fasta_file, \
+                mmap.mmap(fasta_file.fileno(), 0,
+                          access=mmap.ACCESS_READ) as fasta:
+            for name, position, start, end in records:
+                codes = read_sequence(fasta, start, end)
+                for matrix, strand, hit in self.scan_sequence(codes):
+                    # Hits are written 1 based, in genomic coordinates
+                    hit_start = position + hit
+                    hit_end = hit_start + self.widths[matrix] - 1
+                    lines.append("%s\t%s\t%d\t%d\t%s\n" % (
+                        self.names[matrix], strand, hit_start, hit_end,
+                        name))
+        return lines
+
+    def scan_fasta(self, fasta_file_name, output_file_name, workers=None,
+                   batch_size=64):
+        """ (PwmScanner, String, String, int, int) -> int
+
+        Scan every record of a FASTA file of promoter sequences, and write
+        the hits to a tabs delimited motif data file. Batches of records are
+        scanned by a pool of worker processes, which each memory-map the
+        FASTA file, and written in the order of the FASTA file.
+
+        The first word of each record's header is written as the gene ids
+        of its hits, so it should be the agi-agi boundary of the promoter.
+        A second word such as 1:3631 or Chr1:3631-5928 gives the genomic
+        position of the first base; otherwise positions start at 1.
+
+        Args:
+            fasta_file_name (String): The name of the FASTA file
+            output_file_name (String): The name of the file to write to
+            workers (Int): The number of worker processes. Defaults to the
+                number of cores, and 1 scans in this process.
+            batch_size (Int): The number of records scanned at a time
+        Return:
+            The number of hits written
+        """
+        records = index_fasta(fasta_file_name)
+        batches = [records[i:i + batch_size]
+                   for i in range(0, len(records), batch_size)]
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        written = 0
+        with open(output_file_name, "w") as output_file:
+            output_file.write(OUTPUT_HEADER)
+            if workers <= 1:
+                results = (self.scan_records(fasta_file_name, batch)
+                           for batch in batches)
+                for lines in results:
+                    output_file.writelines(lines)
+                    written += len(lines)
+            else:
+                with ProcessPoolExecutor(workers) as executor:
+                    results = executor.map(self.scan_records,
+                                           [fasta_file_name] * len(batches),
+                                           batches)
+                    for lines in results:
+                        output_file.writelines(lines)
+                        written += len(lines)
+        return written
+
+
+def pfm_to_pwm(counts, pseudocount=1.0):
+    """ (ndarray, float) -> ndarray
+
+    Return the log2-odds position weight matrix of a count matrix, against
+    a uniform background.
+
+    Args:
+        counts (ndarray): The 4 row (A, C, G, T) count matrix
+        pseudocount (Float): The count added to each column, spread over the
+            four bases
+    """
+    totals = counts.sum(axis=0)
+    frequencies = (counts + pseudocount / 4) / (totals + pseudocount)
+    return np.log2(frequencies / 0.25)
+
+
+def index_fasta(fasta_file_name):
+    """ (String) -> List of Tuple
+
+    Return a tuple for each record of a FASTA file, holding its name, the
+    genomic position of its first base, and the byte offsets of the start
+    and end of its sequence.
+
+    Args:
+        fasta_file_name (String): The name of the FASTA file
+    """
+    records = []
+    with open(fasta_file_name, "rb") as fasta_file:
+        if os.fstat(fasta_file.fileno()).st_size == 0:
+            return records
+        with mmap.mmap(fasta_file.fileno(), 0,
+                       access=mmap.ACCESS_READ) as fasta:
+            header = fasta.find(b">")
+            while header != -1:
+                start = fasta.find(b"\n", header)
+                if start == -1:
+                    start = len(fasta)
+                end = fasta.find(b"\n>", start)
+                next_header = end + 1
+                if end == -1:
+                    end = len(fasta)
+                    next_header = -1
+
+                words = fasta[header + 1:start].decode().split()
+                name = words[0] if words else ""
+                position = 1
+                if len(words) > 1 and ":" in words[1]:
+                    # Genomic location such as Chr1:3631-5928
+                    location = words[1].split(":")[1]
+                    position = int(location.split("-")[0].replace(",", ""))
+                records.append((name, position, start + 1, end))
+                header = next_header
+    return records
+
+
+def read_sequence(fasta, start, end):
+    """ (mmap, int, int) -> ndarray
+
+    Return the base codes of the sequence between two byte offsets of a
+    memory-mapped FASTA file, skipping line breaks.
+
+    Args:
+        fasta (mmap): The memory-mapped FASTA file
+        start (Int): The byte offset of the sequence
+        end (Int): The byte offset after the sequence
+    """
+    data = np.frombuffer(fasta, dtype=np.uint8, count=max(end - start, 0),
+                         offset=min(start, len(fasta)))
+    data = data[(data != ord("\n")) & (data != ord("\r"))]
+    return BASE_CODES[data]
+
+
+if __name__ == "__main__":
+    fasta_name = input("Enter promoter FASTA file:\n")
+    output_name = input("Enter output file name:\n")
+    scanner = PwmScanner(PfmStore.get_pfm_store("pfm_plants.txt"))
+    print(scanner.scan_fasta(fasta_name, output_name), "hits written")
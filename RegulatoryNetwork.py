@@ -0,0 +1,447 @@
+import numpy as np
+import pandas as pd
+
+import AgiCodec
+from FileUtils import atomic_write
+from GeneLocator import expand_ranges
+
+
+class RegulatoryNetwork:
+    """
+    The RegulatoryNetwork class stores regulator to target gene relations,
+    such as the binary pairs of BinaryPairPredictor or the interactions of
+    JasAgiParser, as a sparse adjacency matrix of integer codes. Rows are
+    regulators and columns are target agis. The matrix is held both in
+    compressed sparse row form, for the targets of a regulator, and in
+    compressed sparse column form, for the regulators of a target, so both
+    are found by slicing rather than by scanning every relation.
+
+    Attributes:
+        regulators (ndarray): The sorted distinct regulator names
+        targets (ndarray): The sorted distinct AgiCodec codes of the targets
+        indptr (ndarray): Where the targets of each regulator start and end
+            in indices
+        indices (ndarray): The target position of each relation, sorted by
+            regulator and then target
+        column_indptr (ndarray): Where the regulators of each target start
+            and end in column_indices
+        column_indices (ndarray): The regulator position of each relation,
+            sorted by target and then regulator
+        regulator_rows (Dict): The position of each regulator name
+    """
+
+    def __init__(self, regulators, agis):
+        """ (RegulatoryNetwork, ndarray, ndarray) -> None
+
+        Initialize the network from the regulator and target agi of each
+        relation. Repeated relations are kept once, and relations with a
+        target which is not an agi are dropped.
+
+        Args:
+            regulators (ndarray): The regulator name of each relation
+            agis (ndarray): The target agi of each relation, as strings,
+                bytes or codes
+        """
+        agi_codes = AgiCodec.encode_agis(agis)
+        kept = agi_codes != AgiCodec.MISSING
+        # Hash the regulator names rather than sorting them all
+        name_codes, names = pd.factorize(np.asarray(regulators)[kept],
+                                         sort=True)
+
+        # Sort and deduplicate relations by regulator, then target
+        keys = np.sort(name_codes.astype(np.int64) * AgiCodec.CODE_LIMIT +
+                       agi_codes[kept])
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = keys[1:] != keys[:-1]
+        keys = keys[distinct]
+        rows = keys // AgiCodec.CODE_LIMIT
+        codes = (keys % AgiCodec.CODE_LIMIT).astype(np.int32)
+        # Codes are bounded, so the distinct targets are found by counting
+        found = np.bincount(codes, minlength=AgiCodec.CODE_LIMIT) > 0
+        columns = np.cumsum(found) - 1
+        self.set_matrix(np.asarray(names, dtype=str), np.flatnonzero(found),
+                        rows, columns[codes])
+
+    def set_matrix(self, regulators, targets, rows, indices):
+        """ (RegulatoryNetwork, ndarray, ndarray, ndarray, ndarray) -> None
+
+        Build the row and column forms of the matrix from relations sorted
+        by regulator and then target.
+
+        Args:
+            regulators (ndarray): The sorted distinct regulator names
+            targets (ndarray): The sorted distinct target codes
+            rows (ndarray): The regulator position of each relation
+            indices (ndarray): The target position of each relation
+        """
+        self.regulators = np.asarray(regulators).astype(str)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.indptr = np.searchsorted(
+            rows, np.arange(len(self.regulators) + 1)).astype(np.int64)
+
+        # A stable sort by target keeps the regulators of each target sorted
+        order = np.argsort(self.indices, kind='stable')
+        rows = np.asarray(rows)
+        self.column_indices = rows[order].astype(np.int32)
+        self.column_indptr = np.concatenate((
+            [0], np.cumsum(np.bincount(self.indices,
+                                       minlength=len(self.targets)))))
+        self.regulator_rows = {name: row for row, name
+                               in enumerate(self.regulators.tolist())}
+
+    def __len__(self):
+        """ (RegulatoryNetwork) -> int
+
+        Return the number of distinct relations.
+        """
+        return len(self.indices)
+
+    @property
+    def out_degrees(self):
+        """ (RegulatoryNetwork) -> ndarray
+
+        Return the number of targets of each regulator.
+        """
+        return np.diff(self.indptr)
+
+    @property
+    def in_degrees(self):
+        """ (RegulatoryNetwork) -> ndarray
+
+        Return the number of regulators of each target.
+        """
+        return np.diff(self.column_indptr)
+
+    def get_targets(self, regulator):
+        """ (RegulatoryNetwork, String) -> List of String
+
+        Return the target agis of a regulator, or an empty list if it is not
+        in the network.
+
+        Args:
+            regulator (String): The regulator name
+        """
+        queries, agis = self.find_targets([regulator])
+        return agis.tolist()
+
+    def get_regulators(self, agi):
+        """ (RegulatoryNetwork, String) -> List of String
+
+        Return the regulators of a target agi, or an empty list if it is not
+        in the network.
+
+        Args:
+            agi (String): The target agi
+        """
+        queries, regulators = self.find_regulators([agi])
+        return regulators.tolist()
+
+    def find_targets(self, regulators):
+        """ (RegulatoryNetwork, List of String) -> Tuple
+
+        Return the targets of several regulators at once.
+
+        Args:
+            regulators (List of String): The regulator names
+        Return:
+            An ndarray of the position of the regulator each target belongs
+            to, and an ndarray of the target agis, ordered by regulator and
+            then agi
+        """
+        rows = np.array([self.regulator_rows.get(name, -1)
+                         for name in regulators], dtype=np.int64)
+        low = np.where(rows >= 0, self.indptr[rows], 0)
+        high = np.where(rows >= 0, self.indptr[rows + 1], 0)
+        queries, positions = expand_ranges(low, high)
+        return queries, AgiCodec.decode_agis(
+            self.targets[self.indices[positions]])
+
+    def find_regulators(self, agis):
+        """ (RegulatoryNetwork, List of String) -> Tuple
+
+        Return the regulators of several target agis at once.
+
+        Args:
+            agis (List of String): The target agis, as strings or codes
+        Return:
+            An ndarray of the position of the agi each regulator belongs to,
+            and an ndarray of the regulator names, ordered by agi and then
+            name
+        """
+        columns = self.target_columns(agis)
+        found = columns >= 0
+        low = np.where(found, self.column_indptr[columns], 0)
+        high = np.where(found, self.column_indptr[columns + 1], 0)
+        queries, positions = expand_ranges(low, high)
+        return queries, self.regulators[self.column_indices[positions]]
+
+    def has_relations(self, regulators, agis):
+        """ (RegulatoryNetwork, ndarray, ndarray) -> ndarray
+
+        Return whether each regulator and agi pair is a relation of the
+        network.
+
+        Args:
+            regulators (ndarray): The regulator name of each pair
+            agis (ndarray): The target agi of each pair, as strings or codes
+        """
+        rows = np.array([self.regulator_rows.get(name, -1)
+                         for name in np.asarray(regulators).tolist()],
+                        dtype=np.int64)
+        columns = self.target_columns(agis)
+        wanted = rows * len(self.targets) + columns
+
+        # Find each pair among the sorted relation keys
+        keys = self.relation_keys()
+        found = np.searchsorted(keys, wanted)
+        inside = found < len(keys)
+        matched = np.zeros(len(wanted), dtype=bool)
+        matched[inside] = keys[found[inside]] == wanted[inside]
+        return matched & (rows >= 0) & (columns >= 0)
+
+    def target_columns(self, agis):
+        """ (RegulatoryNetwork, ndarray) -> ndarray
+
+        Return the column of each agi, or -1 for agis not in the network.
+
+        Args:
+            agis (ndarray): The agis, as strings or codes
+        """
+        codes = AgiCodec.encode_agis(agis)
+        if len(self.targets) == 0:
+            return np.full(len(codes), -1, dtype=np.int64)
+        columns = np.minimum(np.searchsorted(self.targets, codes),
+                             len(self.targets) - 1)
+        return np.where(self.targets[columns] == codes, columns, -1)
+
+    def relation_keys(self):
+        """ (RegulatoryNetwork) -> ndarray
+
+        Return the sorted key of each relation, its regulator position times
+        the number of targets plus its target position.
+        """
+        rows = np.repeat(np.arange(len(self.regulators), dtype=np.int64),
+                         self.out_degrees)
+        return rows * len(self.targets) + self.indices
+
+    def relations(self):
+        """ (RegulatoryNetwork) -> Tuple of (ndarray, ndarray)
+
+        Return the regulator name and target agi of every relation, ordered
+        by regulator and then agi.
+        """
+        rows = np.repeat(np.arange(len(self.regulators)), self.out_degrees)
+        return (self.regulators[rows],
+                AgiCodec.decode_agis(self.targets[self.indices]))
+
+    def rename(self, names):
+        """ (RegulatoryNetwork, Dict) -> RegulatoryNetwork
+
+        Return a network with regulators renamed, such as motif ids to
+        JASPAR names or JASPAR names to aliases, so that it can be compared
+        with a network which names them another way. Regulators not in the
+        dictionary keep their name, and regulators given the same name are
+        merged.
+
+        Args:
+            names (Dict): The new name of each regulator
+        """
+        renamed = np.array([names.get(name, name)
+                            for name in self.regulators.tolist()],
+                           dtype=object)
+        rows = np.repeat(np.arange(len(self.regulators)), self.out_degrees)
+        return RegulatoryNetwork(renamed[rows].astype(str),
+                                 self.targets[self.indices])
+
+    def save(self, file_name, compress=True):
+        """ (RegulatoryNetwork, String, boolean) -> None
+
+        Save the network to a npz file. Only the row form is saved, the
+        column form is rebuilt when loading.
+
+        Args:
+            file_name (String): The name of the npz file to write
+            compress (boolean): Whether to compress the arrays
+        """
+        with atomic_write(file_name) as npz_file:
+            (np.savez_compressed if compress else np.savez)(
+                npz_file, regulators=self.regulators, targets=self.targets,
+                indptr=self.indptr, indices=self.indices)
+
+
+def load_network(file_name):
+    """ (String) -> RegulatoryNetwork
+
+    Return a network saved by RegulatoryNetwork.save.
+
+    Args:
+        file_name (String): The name of the npz file to read
+    """
+    with np.load(file_name) as arrays:
+        indptr = arrays['indptr']
+        network = RegulatoryNetwork.__new__(RegulatoryNetwork)
+        network.set_matrix(
+            arrays['regulators'], arrays['targets'],
+            np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)),
+            arrays['indices'])
+    return network
+
+
+def from_pairs(pairs):
+    """ (List of Tuple) -> RegulatoryNetwork
+
+    Return the network of a list of (regulator, agi) pairs, such as
+    BinaryPairPredictor.binary_pairs.
+
+    Args:
+        pairs (List of Tuple): The (regulator, agi) pairs
+    """
+    if not pairs:
+        return RegulatoryNetwork([], [])
+    regulators, agis = zip(*pairs)
+    return RegulatoryNetwork(np.array(regulators, dtype=str),
+                             np.array(agis, dtype=str))
+
+
+def from_dictionary(dictionary):
+    """ (Dict) -> RegulatoryNetwork
+
+    Return the network of a dictionary of regulators and lists of their
+    target agis, such as Parser.interaction_dictionary or
+    JasToAliasConverter.interaction_dictionary_alias.
+
+    Args:
+        dictionary (Dict): The target agis of each regulator
+    """
+    regulators = np.repeat(np.array(list(dictionary), dtype=str),
+                           [len(agis) for agis in dictionary.values()])
+    agis = [agi for targets in dictionary.values() for agi in targets]
+    return RegulatoryNetwork(regulators, np.array(agis, dtype=str))
+
+
+def from_interaction_table(table):
+    """ (InteractionTable) -> RegulatoryNetwork
+
+    Return the network of an InteractionTable, using its target codes
+    without decoding them.
+
+    Args:
+        table (InteractionTable): The table from JasAgiParser.parse_files
+    """
+    names = list(table.targets)
+    regulators = np.repeat(np.array(names, dtype=str),
+                           [len(table.targets[name]) for name in names])
+    codes = [table.targets[name] for name in names]
+    return RegulatoryNetwork(regulators, np.concatenate(
+        codes) if codes else np.zeros(0, dtype=np.int32))
+
+
+def compare_networks(predicted, curated, common_only=True):
+    """ (RegulatoryNetwork, RegulatoryNetwork, boolean) -> Tuple
+
+    Return how well the relations of a predicted network agree with those of
+    a curated one, overall and for each regulator. Relations are compared as
+    integer keys, so no relation is looked up one at a time.
+
+    Args:
+        predicted (RegulatoryNetwork): The predicted relations
+        curated (RegulatoryNetwork): The curated relations, taken as true
+        common_only (boolean): Whether to compare only the regulators found
+            in both networks, so regulators without curated relations do not
+            count against precision
+    Return:
+        A dictionary of the number of predicted, curated and shared
+        relations and regulators, with precision, recall and jaccard index,
+        and a DataFrame of the same counts and ratios for each regulator
+    """
+    names = np.union1d(predicted.regulators, curated.regulators)
+    predicted_keys = union_keys(predicted, names)
+    curated_keys = union_keys(curated, names)
+    if common_only:
+        common = np.intersect1d(predicted.regulators, curated.regulators)
+        common_rows = np.searchsorted(names, common)
+        predicted_keys = predicted_keys[np.isin(
+            predicted_keys // AgiCodec.CODE_LIMIT, common_rows)]
+        curated_keys = curated_keys[np.isin(
+            curated_keys // AgiCodec.CODE_LIMIT, common_rows)]
+    shared_keys = np.intersect1d(predicted_keys, curated_keys,
+                                 assume_unique=True)
+
+    # Count relations of each regulator in one pass per set
+    counts = {}
+    for label, keys in [('predicted', predicted_keys),
+                        ('curated', curated_keys), ('shared', shared_keys)]:
+        counts[label] = np.bincount(keys // AgiCodec.CODE_LIMIT,
+                                    minlength=len(names))
+    table = pd.DataFrame({'regulator': names, **counts})
+    table = table[(table['predicted'] > 0) | (table['curated'] > 0)]
+    table = table.assign(
+        precision=ratio(table['shared'].values, table['predicted'].values),
+        recall=ratio(table['shared'].values, table['curated'].values))
+
+    predicted_count = len(predicted_keys)
+    curated_count = len(curated_keys)
+    shared_count = len(shared_keys)
+    summary = {
+        'predicted_relations': predicted_count,
+        'curated_relations': curated_count,
+        'shared_relations': shared_count,
+        'predicted_regulators': int((table['predicted'] > 0).sum()),
+        'curated_regulators': int((table['curated'] > 0).sum()),
+        'shared_regulators': int(((table['predicted'] > 0) &
+                                  (table['curated'] > 0)).sum()),
+        'precision': float(ratio(shared_count, predicted_count)),
+        'recall': float(ratio(shared_count, curated_count)),
+        'jaccard': float(ratio(shared_count, predicted_count +
+                               curated_count - shared_count))}
+    return summary, table.reset_index(drop=True)
+
+
+def union_keys(network, names):
+    """ (RegulatoryNetwork, ndarray) -> ndarray
+
+    Return the sorted key of each relation of a network, its regulator
+    position in a sorted array of names holding all its regulators, times
+    AgiCodec.CODE_LIMIT, plus its target code.
+
+    Args:
+        network (RegulatoryNetwork): The network
+        names (ndarray): The sorted regulator names of all networks compared
+    """
+    rows = np.searchsorted(names, network.regulators).astype(np.int64)
+    rows = np.repeat(rows, network.out_degrees)
+    return rows * AgiCodec.CODE_LIMIT + network.targets[network.indices]
+
+
+def ratio(numerator, denominator):
+    """ (ndarray, ndarray) -> ndarray
+
+    Return numerator over denominator, or NaN where the denominator is 0.
+
+    Args:
+        numerator (ndarray): The numerators
+        denominator (ndarray): The denominators
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator,
+                     out=np.full(np.shape(numerator), np.nan),
+                     where=denominator > 0)
+
+
+if __name__ == "__main__":
+    import BinaryPairPredictor
+    import JasAgiParser
+
+    bpp = BinaryPairPredictor.BinaryPairPredictor("gff.csv",
+                                                  "weirauch_2.csv")
+    bpp.execute("vectorized")
+    predicted = from_pairs(bpp.binary_pairs)
+    curated = from_interaction_table(
+        JasAgiParser.parse_files(["interactions.txt"]))
+    predicted.save("predicted_network.npz")
+
+    summary, table = compare_networks(predicted, curated)
+    print(summary)
+    print(table.sort_values('shared', ascending=False).head(20))
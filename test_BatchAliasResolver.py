@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from AliasCache import AliasCache
+from BatchAliasResolver import BatchAliasResolver
+from FakeBarServer import FakeBarServer
+
+
+class BatchAliasResolverTest(unittest.TestCase):
+    """
+    Tests of BatchAliasResolver against a FakeBarServer on a free localhost
+    port.
+    """
+
+    def setUp(self):
+        """ (BatchAliasResolverTest) -> None
+
+        Start a fake converter knowing every even numbered alias.
+        """
+        self.agis = {"ALIAS%d" % i: "AT1G%05d" % i for i in range(0, 10, 2)}
+        self.server = FakeBarServer(self.agis).start()
+        self.resolver = BatchAliasResolver(self.server.url, batch_size=3,
+                                           max_workers=2)
+
+    def tearDown(self):
+        """ (BatchAliasResolverTest) -> None
+
+        Close the resolver's connections and stop the fake converter.
+        """
+        self.resolver.close()
+        self.server.stop()
+
+    def test_batches(self):
+        # Seven distinct aliases in batches of three take three requests
+        aliases = ["ALIAS%d" % i for i in range(7)] + ["ALIAS0"]
+        results = self.resolver.convert_aliases(aliases)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(results["ALIAS4"], "AT1G00004")
+        self.assertEqual(list(results), list(dict.fromkeys(aliases)))
+
+    def test_case(self):
+        # Aliases match whatever their case, and keep the case given
+        results = self.resolver.convert_aliases(["alias2", "Alias4"])
+        self.assertEqual(results, {"alias2": "AT1G00002",
+                                   "Alias4": "AT1G00004"})
+
+    def test_unresolved(self):
+        # Aliases the converter does not know have an empty agi
+        results = self.resolver.convert_aliases(["ALIAS1", "UNKNOWN",
+                                                 "ALIAS2"])
+        self.assertEqual(results, {"ALIAS1": "", "UNKNOWN": "",
+                                   "ALIAS2": "AT1G00002"})
+
+    def test_cache(self):
+        # A second run is answered from the cache without any requests
+        aliases = ["ALIAS%d" % i for i in range(7)]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = AliasCache(os.path.join(cache_dir, "cache.sqlite"))
+            first = self.resolver.convert_aliases(aliases, cache)
+            requests = self.server.requests
+            second = self.resolver.convert_aliases(aliases, cache)
+            cache.close()
+        self.assertEqual(self.server.requests, requests)
+        self.assertEqual(second, first)
+        self.assertEqual(second["ALIAS3"], "")
+
+
+if __name__ == "__main__":
+    unittest.main()
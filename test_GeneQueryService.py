@@ -0,0 +1,119 @@
+import http.client
+import json
+import os
+import tempfile
+import unittest
+
+from GeneQueryService import GeneQueryService
+
+
+class GeneQueryServiceTest(unittest.TestCase):
+    """
+    Round-trip tests of GeneQueryService over a localhost connection, on a
+    gff file of two genes either side of a motif.
+    """
+
+    def setUp(self):
+        """ (GeneQueryServiceTest) -> None
+
+        Write a small gff file, start a service on it and connect to it.
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        gff_file_name = os.path.join(self.temp_dir.name, "gff.csv")
+        with open(gff_file_name, "w") as gff_file:
+            gff_file.write("chr\tstart\tend\tstrand\tgeneid\n"
+                           "Chr1\t2000\t2900\t+\tID=AT1G01010.1\n"
+                           "Chr1\t1000\t1400\t-\tID=AT1G01020.1\n")
+        self.service = GeneQueryService(gff_file_name).start()
+        host, port = self.service.server.server_address[:2]
+        self.connection = http.client.HTTPConnection(host, port, timeout=10)
+
+    def tearDown(self):
+        """ (GeneQueryServiceTest) -> None
+
+        Close the connection and stop the service.
+        """
+        self.connection.close()
+        self.service.stop()
+        self.temp_dir.cleanup()
+
+    def post(self, body, headers=None):
+        """ (GeneQueryServiceTest, bytes, Dict) -> Tuple of (int, Object)
+
+        Return the status and decoded JSON answer of a posted query body.
+
+        Args:
+            body (bytes): The request body
+            headers (Dict): The request headers. Defaults to the
+                Content-Length of the body.
+        """
+        if headers is None:
+            headers = {"Content-Length": str(len(body))}
+        self.connection.putrequest("POST", "/query")
+        for name, value in headers.items():
+            self.connection.putheader(name, value)
+        self.connection.endheaders(body)
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_query(self):
+        # Both genes start 500 upstream of the motif in their own direction
+        expected = {'genes': ["AT1G01010", "AT1G01020"],
+                    'distances': [500, 500], 'motif': "M1"}
+        status, answer = self.post(json.dumps({
+            'motif': "M1", 'motif_end': 1500, 'agi1': "AT1G01010",
+            'agi2': "AT1G01020"}).encode())
+        self.assertEqual((status, answer), (200, expected))
+
+        status, answer = self.post(json.dumps({
+            'queries': [{'motif': "M1", 'motif_end': 1500,
+                         'chromosome': "Chr1"}], 'window': 400}).encode())
+        self.assertEqual(status, 200)
+        self.assertEqual(answer['answers'][0]['genes'], [])
+
+        self.connection.request("GET", "/query?motif_end=1500&agi1=AT1G01010"
+                                       "&agi2=AT1G01020&motif=M1")
+        response = self.connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(response.read()), expected)
+
+    def test_malformed_json(self):
+        for body in [b'{"motif_end": ', b'[1, 2]', b'{"motif_end": 1}',
+                     b'{"queries": 5}']:
+            status, answer = self.post(body)
+            self.assertEqual(status, 400, body)
+            self.assertIn('error', answer)
+
+    def test_content_length(self):
+        # The connection is closed after each refusal, and reopened
+        body = b'{"motif_end": 1500, "chromosome": "Chr1"}'
+        for headers, expected in [({}, 411),
+                                  ({"Content-Length": "abc"}, 400),
+                                  ({"Content-Length": "-5"}, 400),
+                                  ({"Content-Length": str(1 << 30)}, 413)]:
+            status, answer = self.post(body, headers)
+            self.assertEqual(status, expected, headers)
+            self.connection.close()
+
+    def test_out_of_range(self):
+        for body in [b'{"motif_end": 1e400, "chromosome": "1"}',
+                     b'{"motif_end": 1000000000000000000000000000000, '
+                     b'"chromosome": "1"}',
+                     b'{"motif_end": -1e30, "agi1": "AT1G01010", '
+                     b'"agi2": "AT1G01020"}',
+                     b'{"motif_end": 1500, "chromosome": "1", '
+                     b'"window": 1000000000000000000000000000000}',
+                     b'{"motif_end": 1500, "chromosome": "1", '
+                     b'"window": 1e400}']:
+            status, answer = self.post(body)
+            self.assertEqual(status, 400, body)
+            self.assertIn('error', answer)
+
+        # The service keeps answering afterwards
+        status, answer = self.post(b'{"motif_end": 1500, "chromosome": '
+                                   b'"Chr1"}')
+        self.assertEqual(status, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
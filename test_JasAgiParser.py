@@ -0,0 +1,33 @@
+import unittest
+
+from JasAgiParser import InteractionTable
+
+
+class InteractionTableTest(unittest.TestCase):
+    """
+    Tests of the distinct AGI targets kept by InteractionTable.
+    """
+
+    def test_targets(self):
+        # Targets are sorted and repeats are dropped
+        table = InteractionTable(
+            ['MA0002.1', 'MA0001.1', 'MA0002.1', 'MA0002.1'],
+            ['AT1G01020', 'AT1G01010', 'AT1G01020', 'AT1G01010'])
+        self.assertEqual(table.to_dictionary(),
+                         {'MA0001.1': ['AT1G01010'],
+                          'MA0002.1': ['AT1G01010', 'AT1G01020']})
+
+    def test_not_agi(self):
+        # A target which is not an AGI is skipped, rather than stored under
+        # the JASPAR name before it
+        table = InteractionTable(['MA0001.1', 'MA0002.1', 'MA0002.1',
+                                  'MA0003.1'],
+                                 ['AT1G01010', 'AT1G01020', 'bogus',
+                                  'bogus'])
+        self.assertEqual(table.to_dictionary(),
+                         {'MA0001.1': ['AT1G01010'],
+                          'MA0002.1': ['AT1G01020']})
+
+
+if __name__ == "__main__":
+    unittest.main()